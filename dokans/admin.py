@@ -29,7 +29,9 @@ class UserAdmin(BaseUserAdmin):
 class StoreAdmin(admin.ModelAdmin):
     list_display = ('store_name', 'subdomain', 'owner', 'status', 'trial_end', 'is_trial_active', 'created_at')
     list_filter = ('status', 'created_at', 'trial_end')
+    list_select_related = ('owner',)
     search_fields = ('store_name', 'subdomain', 'owner__email', 'owner__username')
+    autocomplete_fields = ('owner',)
     readonly_fields = ('created_at',)
     ordering = ('-created_at',)
 
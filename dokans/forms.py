@@ -7,7 +7,7 @@ class StoreSettingsForm(forms.ModelForm):
 
     class Meta:
         model = Store
-        fields = ['store_name', 'status']
+        fields = ['store_name', 'status', 'waiting_room_enabled', 'waiting_room_rate']
         widgets = {
             'store_name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -16,16 +16,33 @@ class StoreSettingsForm(forms.ModelForm):
             'status': forms.Select(attrs={
                 'class': 'form-select'
             }),
+            'waiting_room_enabled': forms.CheckboxInput(attrs={
+                'class': 'form-check-input'
+            }),
+            'waiting_room_rate': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': 1
+            }),
         }
         labels = {
             'store_name': 'Store Name',
             'status': 'Store Status',
+            'waiting_room_enabled': 'Checkout Waiting Room',
+            'waiting_room_rate': 'Checkouts per Minute',
         }
         help_texts = {
             'store_name': 'This is the name that will be displayed on your storefront',
             'status': 'Active stores are visible to customers, Draft stores are hidden',
+            'waiting_room_enabled': 'Turn on for flash sales: shoppers wait in line and enter checkout a few at a time',
+            'waiting_room_rate': 'How many shoppers are let into checkout each minute while the waiting room is on',
         }
 
+    def clean_waiting_room_rate(self):
+        rate = self.cleaned_data['waiting_room_rate']
+        if not rate:
+            raise forms.ValidationError('Let at least one shopper in per minute')
+        return rate
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Make subdomain readonly by excluding 'expired' status if not already expired
@@ -33,6 +33,10 @@ class Store(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     trial_days = 7
     trial_end = models.DateField(default=get_default_trial_end)
+    waiting_room_enabled = models.BooleanField(default=False, help_text="Queue shoppers before checkout during sales")
+    waiting_room_rate = models.PositiveIntegerField(default=60, help_text="Shoppers let into checkout per minute while the waiting room is on")
+    db_shard = models.CharField(max_length=30, default='default', help_text="Database alias holding this store's catalog and orders")
+    shard_locked = models.BooleanField(default=False, help_text="Writes are paused while the store moves between shards")
     
     def is_trial_active(self):
         return timezone.now().date() <= self.trial_end
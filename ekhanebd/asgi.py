@@ -3,6 +3,10 @@ ASGI config for ekhanebd project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The dashboard's live order feed (/dashboard/orders/events/) is a long-lived
+Server-Sent Events stream and is only served when running under ASGI; route
+that path to an ASGI server using this module.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
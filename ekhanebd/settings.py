@@ -94,6 +94,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'main.middleware.RateLimitMiddleware',  # Per-IP budgets for auth endpoints
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -103,6 +104,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'main.middleware.SubdomainMiddleware',  # Multi-tenant subdomain routing
     'main.middleware.StoreAccessMiddleware',  # Store access control
+    'main.middleware.ReplicaRoutingMiddleware',  # Storefront catalog reads go to replicas
+    'main.middleware.ProfilingMiddleware',  # On-demand cProfile + SQL timeline per request
+    'main.middleware.MemoryProfilingMiddleware',  # Per-request tracemalloc samples when MEMORY_PROFILING is on
 ]
 
 ROOT_URLCONF = 'ekhanebd.urls'
@@ -133,12 +137,60 @@ WSGI_APPLICATION = 'ekhanebd.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite for development; set DATABASE_ENGINE=postgresql for the production profile
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    def postgres_database(host, **extra):
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DATABASE_NAME', 'ekhanebd'),
+            'USER': os.getenv('DATABASE_USER', 'postgres'),
+            'PASSWORD': os.getenv('DATABASE_PASSWORD', ''),
+            'HOST': host,
+            'PORT': os.getenv('DATABASE_PORT', '5432'),
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'application_name': 'ekhanebd',
+            },
+        }
+        if os.getenv('DATABASE_POOL', 'True') == 'True':
+            # psycopg 3 pool inside each worker process (Django requires CONN_MAX_AGE = 0 with it)
+            database['OPTIONS']['pool'] = {
+                'min_size': int(os.getenv('DATABASE_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.getenv('DATABASE_POOL_MAX_SIZE', '10')),
+                'timeout': int(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+            }
+        else:
+            # Behind PgBouncer: keep connections open and check them before reuse
+            database['CONN_MAX_AGE'] = int(os.getenv('DATABASE_CONN_MAX_AGE', '60'))
+            database['CONN_HEALTH_CHECKS'] = True
+        database.update(extra)
+        return database
+
+    DATABASES = {
+        'default': postgres_database(os.getenv('DATABASE_HOST', 'localhost')),
+    }
+    # Streaming replicas for storefront catalog reads (see main/db_router.py)
+    for index, host in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(',')), 1):
+        DATABASES[f'replica{index}'] = postgres_database(host.strip(), TEST={'MIRROR': 'default'})
+    # Tenant shards as name=host pairs, e.g. "shard1=db-shard1,shard2=db-shard2" (see main/sharding.py)
+    for shard in filter(None, os.getenv('DATABASE_SHARDS', '').split(',')):
+        alias, host = shard.strip().split('=', 1)
+        DATABASES[alias] = postgres_database(host)
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
-}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica')]
+DATABASE_SHARDS = [alias for alias in DATABASES if alias != 'default' and alias not in DATABASE_REPLICAS]
+DATABASE_ROUTERS = ['main.db_router.TenantShardRouter', 'main.db_router.PrimaryReplicaRouter']
+# After a write, the client reads from the primary for this long so it sees its own changes
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))
 
 
 # Password validation
@@ -204,6 +256,47 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'assets')  # This is where static files wil
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Dashboard exports (private, served through the export_download view)
+EXPORT_ROOT = os.getenv('EXPORT_ROOT', os.path.join(BASE_DIR, 'exports'))
+# Larger exports are queued for the process_export_jobs command instead of streamed
+EXPORT_STREAM_MAX_ROWS = int(os.getenv('EXPORT_STREAM_MAX_ROWS', '100000'))
+# Jobs still running after this many seconds belong to a crashed worker and are failed
+EXPORT_JOB_TIMEOUT = int(os.getenv('EXPORT_JOB_TIMEOUT', '3600'))
+
+# Columnar order snapshots written by build_analytics_snapshots
+ANALYTICS_ROOT = os.getenv('ANALYTICS_ROOT', os.path.join(BASE_DIR, 'analytics'))
+
+# Finished orders older than this many days are moved to ORDER_ARCHIVE_ROOT by archive_orders
+ORDER_ARCHIVE_ROOT = os.getenv('ORDER_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'archive'))
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '365'))
+
+# One JSON line per run_benchmarks run, read by compare_benchmarks
+BENCHMARK_HISTORY = os.getenv('BENCHMARK_HISTORY', os.path.join(BASE_DIR, 'benchmarks', 'history.jsonl'))
+
+# Request profiles (ProfilingMiddleware): pstats files, the fraction of requests profiled
+# at random, and how long the signed tokens handed out in the admin stay valid
+PROFILE_ROOT = os.getenv('PROFILE_ROOT', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN_MAX_AGE = int(os.getenv('PROFILE_TOKEN_MAX_AGE', '3600'))
+# Days prune_request_profiles keeps profiles and their files by default
+PROFILE_RETENTION_DAYS = int(os.getenv('PROFILE_RETENTION_DAYS', '14'))
+
+# Per-request memory sampling (MemoryProfilingMiddleware): off by default, it slows every request.
+# Frames kept per allocation; a view whose peak grows with store size at this log-log slope or more
+# is flagged, as is one whose requests leave this many bytes behind (median)
+MEMORY_PROFILING = os.getenv('MEMORY_PROFILING', 'False') == 'True'
+MEMORY_TRACE_FRAMES = int(os.getenv('MEMORY_TRACE_FRAMES', '25'))
+MEMORY_SCALING_SLOPE = float(os.getenv('MEMORY_SCALING_SLOPE', '0.5'))
+MEMORY_GROWTH_FLAG_BYTES = int(os.getenv('MEMORY_GROWTH_FLAG_BYTES', str(256 * 1024)))
+
+# Number of our own proxies that append to X-Forwarded-For (0 = use REMOTE_ADDR)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '0'))
+
+# Per-store storefront budget shared by all app servers (see main/utils/tenant_throttle.py)
+STORE_RATE_LIMIT = float(os.getenv('STORE_RATE_LIMIT', '20'))  # requests per second
+STORE_BURST = int(os.getenv('STORE_BURST', '100'))
+STORE_MAX_CONCURRENT = int(os.getenv('STORE_MAX_CONCURRENT', '8'))  # in-flight requests
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,37 @@
+"""
+Settings for the test suite.
+
+manage.py test picks this module unless DJANGO_SETTINGS_MODULE is set; other
+runners (pytest-django, IDEs) should point DJANGO_SETTINGS_MODULE here.
+Tables are built straight from the models (the apps keep no migrations).
+Redis is replaced by fakeredis, an in-process stand-in that also runs the
+Lua scripts, so OTPs, rate limits, the store throttle and the waiting room
+behave as in production without a server. Keys live for the whole test run;
+tests that depend on Redis state call cache.clear() first.
+
+'replica1' mirrors the primary and 'shard1' is a second SQLite database.
+Both stay out of DATABASE_REPLICAS/DATABASE_SHARDS, so routing is the single
+database one; the routing and shard tests switch them on with
+override_settings and list them in their databases.
+"""
+import copy
+import fakeredis
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, LOGGING
+
+MIGRATION_MODULES = {app: None for app in ['main', 'dokans', 'accounts', 'products', 'orders']}
+DATABASES = {
+    **DATABASES,
+    'replica1': {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}},
+    'shard1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'shard1.sqlite3'},
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://fakeredis:6379/0',
+        'OPTIONS': {'CONNECTION_POOL_KWARGS': {'connection_class': fakeredis.FakeConnection}},
+    }
+}
+
+LOGGING = copy.deepcopy(LOGGING)
+LOGGING['loggers']['ekhanebd']['level'] = 'ERROR'
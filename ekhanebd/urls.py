@@ -35,8 +35,13 @@ urlpatterns = [
     path('dashboard/', public_views.dashboard, name='dashboard'),
     path('dashboard/products/', include('products.urls')),
     path('dashboard/orders/', public_views.order_list, name='order_list'),
+    path('dashboard/orders/events/', public_views.order_events, name='order_events'),
     path('dashboard/orders/<int:order_id>/', public_views.order_detail, name='order_detail'),
     path('dashboard/customers/', public_views.customer_list, name='customer_list'),
+    path('dashboard/exports/', public_views.export_jobs, name='export_jobs'),
+    path('dashboard/exports/<int:job_id>/download/', public_views.export_download, name='export_download'),
+    path('dashboard/export/<str:kind>/', public_views.export_data, name='export_data'),
+    path('dashboard/analytics/', public_views.analytics, name='analytics'),
     path('dashboard/settings/', public_views.store_settings, name='store_settings'),
 
     # Storefront URLs (work on subdomains via middleware)
@@ -52,6 +57,8 @@ urlpatterns = [
 
     # Checkout URLs
     path('checkout/', public_views.checkout, name='checkout'),
+    path('checkout/waiting-room/', public_views.waiting_room, name='waiting_room'),
+    path('checkout/waiting-room/status/', public_views.waiting_room_status, name='waiting_room_status'),
     path('order/<str:order_number>/', public_views.order_confirmation, name='order_confirmation'),
 ]
 
@@ -1,3 +1,118 @@
+from django.conf import settings
 from django.contrib import admin
+from django.utils.html import format_html, format_html_join
+from .models import ExportJob, MemoryProfile, RequestProfile
+from .utils.request_profiler import TOKEN_PARAM, make_profile_token, profile_report
+from .utils.admin_tools import LargeTableAdminMixin, StoreAutocompleteFilter
 
-# Register your models here.
+
+@admin.register(ExportJob)
+class ExportJobAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'store', 'kind', 'status', 'row_count', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', StoreAutocompleteFilter, 'created_at')
+    list_select_related = ('store',)
+    autocomplete_fields = ('store',)
+    search_fields = ('store__store_name', 'store__subdomain')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'row_count', 'error')
+    ordering = ('-created_at',)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    change_list_template = 'admin/main/requestprofile/change_list.html'
+    list_display = ('created_at', 'store', 'view_name', 'method', 'path', 'status_code',
+                    'duration_ms', 'query_count', 'sql_ms', 'trigger')
+    list_filter = (StoreAutocompleteFilter, 'trigger', 'method', 'created_at')
+    list_select_related = ('store',)
+    search_fields = ('view_name', 'path')
+    ordering = ('-created_at',)
+    fields = ('store', 'view_name', 'method', 'path', 'status_code', 'trigger', 'created_at',
+              'duration_ms', 'query_count', 'sql_ms', 'file', 'call_profile', 'timeline')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Call profile (cumulative time)')
+    def call_profile(self, obj):
+        try:
+            report = profile_report(obj)
+        except (OSError, ValueError, EOFError):
+            return 'Profile file is missing or unreadable'
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', report)
+
+    @admin.display(description='SQL timeline')
+    def timeline(self, obj):
+        if not obj.sql_timeline:
+            return 'No queries'
+        rows = format_html_join(
+            '\n', '<tr><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+            ((query['at_ms'], query['ms'], query['db'], query['sql']) for query in obj.sql_timeline),
+        )
+        note = ''
+        if obj.query_count > len(obj.sql_timeline):
+            note = f'First {len(obj.sql_timeline)} of {obj.query_count} queries'
+        return format_html(
+            '<p>{}</p><table><thead><tr><th>at ms</th><th>ms</th><th>db</th><th>SQL</th></tr></thead>'
+            '<tbody>{}</tbody></table>',
+            note, rows,
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            'profile_token': make_profile_token(request.user),
+            'profile_token_param': TOKEN_PARAM,
+            'profile_token_hours': settings.PROFILE_TOKEN_MAX_AGE / 3600,
+            **(extra_context or {}),
+        }
+        return super().changelist_view(request, extra_context)
+
+    def delete_model(self, request, obj):
+        obj.file.delete(save=False)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for profile in queryset:
+            profile.file.delete(save=False)
+        super().delete_queryset(request, queryset)
+
+
+@admin.register(MemoryProfile)
+class MemoryProfileAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('created_at', 'store', 'view_name', 'method', 'path', 'peak_kib', 'growth_kib', 'tenant_size')
+    list_filter = (StoreAutocompleteFilter, 'method', 'created_at')
+    list_select_related = ('store',)
+    search_fields = ('view_name', 'path')
+    ordering = ('-created_at',)
+    fields = ('store', 'view_name', 'method', 'path', 'status_code', 'created_at', 'peak_bytes', 'growth_bytes',
+              'tenant_size', 'allocations')
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Peak KiB', ordering='peak_bytes')
+    def peak_kib(self, obj):
+        return f'{obj.peak_bytes / 1024:,.0f}'
+
+    @admin.display(description='Kept KiB', ordering='growth_bytes')
+    def growth_kib(self, obj):
+        return f'{obj.growth_bytes / 1024:,.0f}'
+
+    @admin.display(description='Top allocation sites (held after the view)')
+    def allocations(self, obj):
+        if not obj.top_allocations:
+            return 'None'
+        rows = format_html_join(
+            '\n', '<tr><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+            ((f"{site['bytes'] / 1024:,.1f}", site['count'], site['site']) for site in obj.top_allocations),
+        )
+        return format_html(
+            '<table><thead><tr><th>KiB</th><th>blocks</th><th>site</th></tr></thead><tbody>{}</tbody></table>', rows
+        )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # Registers the Store save/delete receivers that keep the set current
+        from .utils import subdomain_registry  # noqa: F401
@@ -0,0 +1,93 @@
+"""
+Database routing: tenant shards first, then primary/replica.
+
+TenantShardRouter sends tenant models to the shard of the store in scope
+(see main/sharding.py) and leaves everything on 'default' to the next
+router.
+
+Writes and most reads go to the primary ('default'). Reads are sent to a
+replica only inside replica_reads(), which ReplicaRoutingMiddleware enters
+for GET requests to the storefront catalog views. Clients that have just
+written (checkout, cart, dashboard saves) carry a short-lived cookie that
+keeps them on the primary so they always read their own writes.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from .sharding import current_shard, is_tenant_model, shard_for_store
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def start_replica_reads():
+    return _use_replica.set(True)
+
+
+def stop_replica_reads(token):
+    _use_replica.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    token = start_replica_reads()
+    try:
+        yield
+    finally:
+        stop_replica_reads(token)
+
+
+def replica_alias():
+    """A replica to read from, or None when reads must stay on the primary"""
+    if not settings.DATABASE_REPLICAS or not _use_replica.get():
+        return None
+    # Reads inside a transaction on the primary must see that transaction
+    if connections['default'].in_atomic_block:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class TenantShardRouter:
+    def _shard(self, model, hints):
+        if not is_tenant_model(model):
+            return None
+
+        alias = current_shard()
+        instance = hints.get('instance')
+        if instance is not None:
+            if instance._meta.label_lower == 'dokans.store':
+                # e.g. Product(store=store): the new row belongs on that store's shard
+                alias = instance.db_shard
+            elif is_tenant_model(type(instance)) and instance._state.db:
+                # Related lookups stay on the database the instance came from
+                alias = instance._state.db
+            elif getattr(instance, 'store_id', None):
+                alias = shard_for_store(instance.store_id)
+
+        # 'default' and replicas are left to PrimaryReplicaRouter
+        if alias is None or alias == 'default' or alias in settings.DATABASE_REPLICAS:
+            return None
+        return alias
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return replica_alias() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards carry the full schema; replicas get theirs through replication
+        return db not in settings.DATABASE_REPLICAS
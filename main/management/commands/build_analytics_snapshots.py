@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from dokans.models import Store
+from main.sharding import store_shard
+from main.utils.analytics import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Export each store's orders into the columnar snapshots read by the analytics page (run from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', help='Only rebuild the snapshot of the store with this subdomain')
+
+    def handle(self, *args, **options):
+        stores = Store.objects.exclude(status='expired')
+
+        if options['store']:
+            stores = Store.objects.filter(subdomain=options['store'])
+            if not stores.exists():
+                raise CommandError(f"Store '{options['store']}' does not exist")
+
+        for store in stores.iterator():
+            with store_shard(store):
+                path = build_snapshot(store)
+            self.stdout.write(f'{store.subdomain}: {path}')
+
+        self.stdout.write(self.style.SUCCESS('Analytics snapshots rebuilt'))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.utils.benchmarks import compare, load_history
+
+
+def find_run(history, ref):
+    """Latest run whose commit starts with ref"""
+    for entry in reversed(history):
+        if entry['commit'] and entry['commit'].startswith(ref):
+            return entry
+    raise CommandError(f"No benchmark run recorded for commit '{ref}'")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare two recorded benchmark runs (default: the last two) and flag regressions. "
+        "Exits with an error when any benchmark regressed, so CI can fail on it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', nargs='?', help='Commit of the baseline run (default: the run before head)')
+        parser.add_argument('head', nargs='?', help='Commit of the run to check (default: the latest run)')
+        parser.add_argument('--threshold', type=float, default=10,
+                            help='Percent slower that counts as a regression (default 10)')
+        parser.add_argument('--history', help='History file (default BENCHMARK_HISTORY)')
+
+    def handle(self, *args, **options):
+        history = load_history(options['history'])
+        if options['head']:
+            head = find_run(history, options['head'])
+        elif history:
+            head = history[-1]
+        else:
+            raise CommandError('No benchmark runs recorded; run run_benchmarks first')
+
+        if options['base']:
+            base = find_run(history, options['base'])
+        else:
+            earlier = history[:history.index(head)]
+            if not earlier:
+                raise CommandError('Only one benchmark run recorded; nothing to compare against')
+            base = earlier[-1]
+
+        self.stdout.write(f"base {base['commit']} ({base['timestamp']})  head {head['commit']} ({head['timestamp']})")
+        if base['machine'] != head['machine'] or base['python'] != head['python']:
+            self.stdout.write(self.style.WARNING(
+                f"Runs come from different machines or Pythons ({base['machine']} {base['python']} vs "
+                f"{head['machine']} {head['python']}); timings are not comparable"
+            ))
+
+        rows = compare(base, head, threshold=options['threshold'] / 100)
+        regressions = [row for row in rows if row[4] == 'regression']
+        for name, old, new, change, verdict in rows:
+            line = f'{name:<32}{old / 1000:>12.2f}{new / 1000:>12.2f} µs{change:>+9.1%}  {verdict}'.rstrip()
+            if verdict == 'regression':
+                line = self.style.ERROR(line)
+            elif verdict == 'improvement':
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark(s) regressed by more than {options["threshold"]:g}%')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dokans.models import Store
+from main.utils.synthetic_data import generate_store, synthetic_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Create synthetic stores with catalogs, images, customers, carts and orders for local "
+        "load tests. The same --seed always generates the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stores', type=int, default=1, help='Number of stores (default 1)')
+        parser.add_argument('--start', type=int, default=1, help='Number of the first store (default 1)')
+        parser.add_argument('--prefix', default='loadshop',
+                            help="Subdomains are the prefix and the store's number (default 'loadshop')")
+        parser.add_argument('--products', type=int, default=200, help='Products per store (default 200)')
+        parser.add_argument('--customers', type=int, default=100, help='Customers per store (default 100)')
+        parser.add_argument('--orders', type=int, default=500, help='Orders per store (default 500)')
+        parser.add_argument('--carts', type=int, default=50, help='Abandoned carts per store (default 50)')
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many days (default 365)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default 0)')
+        parser.add_argument('--password', default='password', help="Store owners' password (default 'password')")
+
+    def handle(self, *args, **options):
+        if options['stores'] < 1:
+            raise CommandError('--stores must be at least 1')
+
+        images = synthetic_images(options['seed'])
+        created = 0
+        for index in range(options['start'], options['start'] + options['stores']):
+            subdomain = f"{options['prefix']}{index}"
+            if Store.objects.filter(subdomain=subdomain).exists():
+                self.stdout.write(f'{subdomain}: already exists, skipped')
+                continue
+
+            started = time.monotonic()
+            generate_store(
+                index,
+                seed=options['seed'],
+                prefix=options['prefix'],
+                products=options['products'],
+                customers=options['customers'],
+                orders=options['orders'],
+                carts=options['carts'],
+                days=options['days'],
+                password=options['password'],
+                images=images,
+            )
+            created += 1
+            self.stdout.write(f'{subdomain}: generated in {time.monotonic() - started:.1f}s')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {created} store(s); owners log in as <subdomain>@example.com / {options['password']}"
+        ))
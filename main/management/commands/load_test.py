@@ -0,0 +1,77 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from dokans.models import Store
+from main.utils.load_driver import SCENARIOS, run_load, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay weighted storefront, cart, checkout and dashboard traffic against a running server "
+        "and report throughput and p50/p95/p99 latency per endpoint. Use stores made by "
+        "generate_tenant_data; checkouts create real orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Server to load (default http://127.0.0.1:8000)')
+        parser.add_argument('--prefix', default='loadshop',
+                            help="Load stores whose subdomain starts with this (default 'loadshop')")
+        parser.add_argument('--store', action='append', help='Load this subdomain (repeatable; overrides --prefix)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run (default 30)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent shoppers (default 8)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the traffic mix (default 0)')
+        parser.add_argument('--password', default='password', help="Store owners' password (default 'password')")
+        parser.add_argument('--domain', help='Main domain the stores are subdomains of (default MAIN_DOMAIN)')
+        parser.add_argument('--only', action='append', choices=[name for name, _weight, _scenario in SCENARIOS],
+                            help='Only run this endpoint (repeatable)')
+        parser.add_argument('--json', help='Also write the report to this file')
+
+    def handle(self, *args, **options):
+        stores = Store.objects.select_related('owner').filter(status='active').order_by('id')
+        if options['store']:
+            stores = stores.filter(subdomain__in=options['store'])
+        else:
+            stores = stores.filter(subdomain__startswith=options['prefix'])
+        stores = list(stores)
+        if not stores:
+            raise CommandError('No active stores to load; run generate_tenant_data first')
+
+        self.stdout.write(
+            f"Loading {len(stores)} store(s) at {options['url']} with {options['concurrency']} shoppers "
+            f"for {options['duration']:g}s"
+        )
+        try:
+            results, elapsed = run_load(
+                stores,
+                options['url'],
+                duration=options['duration'],
+                concurrency=options['concurrency'],
+                seed=options['seed'],
+                password=options['password'],
+                domain=options['domain'],
+                scenarios=options['only'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        rows = summarize(results, elapsed)
+
+        self.stdout.write(
+            f"{'endpoint':<28}{'requests':>9}{'errors':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        for row in rows:
+            line = (
+                f"{row['endpoint']:<28}{row['requests']:>9}{row['errors']:>8}{row['rps']:>8}"
+                f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}"
+            )
+            self.stdout.write(self.style.WARNING(line) if row['errors'] else line)
+
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump({
+                    'url': options['url'],
+                    'stores': [store.subdomain for store in stores],
+                    'concurrency': options['concurrency'],
+                    'seconds': round(elapsed, 2),
+                    'endpoints': rows,
+                }, fh, indent=2)
+            self.stdout.write(f"Report written to {options['json']}")
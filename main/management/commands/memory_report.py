@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dokans.models import Store
+from main.models import MemoryProfile
+from main.utils.memory_profiler import view_report, view_sites
+
+# Samples per view whose allocation sites are summed for --sites
+SITE_SAMPLES = 200
+
+
+def kib(value):
+    return f'{value / 1024:,.0f}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the memory samples recorded with MEMORY_PROFILING on: peak and retained memory per "
+        "view, flagging views whose memory grows with tenant size or stays after the request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Only samples from the last this many days (default 7)')
+        parser.add_argument('--store', help='Only samples of the store with this subdomain')
+        parser.add_argument('--view', help='Only this view name')
+        parser.add_argument('--sites', action='store_true',
+                            help='List the top allocation sites of flagged views (of every view with --view)')
+
+    def handle(self, *args, **options):
+        profiles = MemoryProfile.objects.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        if options['store']:
+            store = Store.objects.filter(subdomain=options['store']).first()
+            if store is None:
+                raise CommandError(f"Store '{options['store']}' does not exist")
+            profiles = profiles.filter(store=store)
+        if options['view']:
+            profiles = profiles.filter(view_name=options['view'])
+
+        rows = view_report(
+            profiles.order_by().values_list('view_name', 'store_id', 'tenant_size', 'peak_bytes', 'growth_bytes')
+            .iterator()
+        )
+        if not rows:
+            self.stdout.write('No memory samples recorded; set MEMORY_PROFILING=True on a worker first')
+            return
+
+        self.stdout.write(
+            f"{'view':<32}{'requests':>9}{'stores':>7}{'peak KiB':>10}{'max KiB':>10}{'kept KiB':>10}"
+            f"{'slope':>7}  flags"
+        )
+        for row in rows:
+            slope = f"{row['slope']:.2f}" if row['slope'] is not None else '-'
+            line = (
+                f"{row['view']:<32}{row['requests']:>9}{row['stores']:>7}{kib(row['median_peak']):>10}"
+                f"{kib(row['max_peak']):>10}{kib(row['median_growth']):>10}{slope:>7}  {', '.join(row['flags'])}"
+            ).rstrip()
+            self.stdout.write(self.style.WARNING(line) if row['flags'] else line)
+
+        if options['sites']:
+            for row in rows:
+                if not row['flags'] and not options['view']:
+                    continue
+                allocations = profiles.filter(view_name=row['view']).values_list('top_allocations', flat=True)
+                self.stdout.write(f"\nTop allocation sites of {row['view']} (KiB held after the view, samples):")
+                for site, size, samples in view_sites(allocations[:SITE_SAMPLES]):
+                    self.stdout.write(f'{kib(size):>10}  {samples:>5}  {site}')
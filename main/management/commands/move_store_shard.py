@@ -0,0 +1,215 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from dokans.models import Store, User
+from main.sharding import forget_store_shard
+from orders.models import Customer, Cart, CartItem, Order, OrderItem, Payment
+from products.models import Category, Product, ProductImage
+
+COPY_BATCH_SIZE = 2000
+
+# Parents before children, with the lookup selecting one store's rows
+TENANT_TABLES = [
+    (Category, 'store'),
+    (Product, 'store'),
+    (ProductImage, 'product__store'),
+    (Customer, 'store'),
+    (Cart, 'store'),
+    (CartItem, 'cart__store'),
+    (Order, 'store'),
+    (OrderItem, 'order__store'),
+    (Payment, 'order__store'),
+]
+
+
+def primary_key_columns(model, connection):
+    """Columns of the table's primary key; partitioned order tables add created_at to id"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    for constraint in constraints.values():
+        if constraint['primary_key']:
+            return constraint['columns']
+    return [model._meta.pk.column]
+
+
+def upsert(model, rows, connection):
+    """INSERT ... ON CONFLICT (primary key) DO UPDATE, keeping primary keys and timestamps as they are"""
+    fields = model._meta.concrete_fields
+    quote = connection.ops.quote_name
+    key_columns = primary_key_columns(model, connection)
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    updates = ', '.join(
+        f'{quote(field.column)} = EXCLUDED.{quote(field.column)}' for field in fields if field.column not in key_columns
+    )
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders}) '
+        f'ON CONFLICT ({", ".join(quote(column) for column in key_columns)}) DO UPDATE SET {updates}'
+    )
+    params = [
+        [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def advance_sequences(connection, models):
+    """
+    Move each table's id sequence past the copied rows, never back: ids below its current
+    value may already have been handed out on this shard.
+    """
+    if connection.vendor != 'postgresql':
+        return  # SQLite's AUTOINCREMENT already follows the largest id inserted
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in models:
+            table, column = model._meta.db_table, model._meta.pk.column
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [quote(table), column])
+            sequence = cursor.fetchone()[0]
+            if sequence is None:
+                continue
+            cursor.execute(f'SELECT max({quote(column)}) FROM {quote(table)}')
+            max_id = cursor.fetchone()[0]
+            if max_id is not None:
+                cursor.execute(f'SELECT setval(%s::regclass, GREATEST(last_value, %s)) FROM {sequence}', [sequence, max_id])
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a store's catalog, carts, customers and orders to another database shard while it keeps "
+        "serving. Shards must allocate ids from disjoint ranges; the move stops if an id is already "
+        "taken on the target."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('subdomain', help='Subdomain of the store to move')
+        parser.add_argument('shard', help="Target database alias ('default' or one of DATABASE_SHARDS)")
+        parser.add_argument('--grace', type=float, default=5,
+                            help='Seconds to let in-flight requests finish after pausing writes and after the switch (default 5)')
+        parser.add_argument('--keep-source', action='store_true',
+                            help='Leave the copied rows on the old shard instead of deleting them')
+
+    def handle(self, *args, **options):
+        target = options['shard']
+        if target != 'default' and target not in settings.DATABASE_SHARDS:
+            raise CommandError(f"'{target}' is not a configured shard")
+
+        store = Store.objects.using('default').filter(subdomain=options['subdomain']).first()
+        if store is None:
+            raise CommandError(f"Store '{options['subdomain']}' does not exist")
+        source = store.db_shard
+        if source == target:
+            raise CommandError(f"{store.subdomain} is already on '{target}'")
+
+        self.source, self.target, self.store = source, target, store
+
+        # 1. Reference rows so foreign keys to the store and its owner hold on the target
+        if target != 'default':
+            self.copy_reference_rows()
+
+        # 2. Bulk copy while the store keeps taking orders
+        started = timezone.now()
+        for model, lookup in TENANT_TABLES:
+            copied = self.copy(model, self.rows(model, lookup, source))
+            self.stdout.write(f'{model._meta.label}: copied {copied}')
+
+        # 3. Pause writes and let requests that already passed the check finish
+        Store.objects.using('default').filter(pk=store.pk).update(shard_locked=True)
+        self.stdout.write(f'Writes paused, waiting {options["grace"]}s for in-flight requests')
+        time.sleep(options['grace'])
+
+        try:
+            # 4. Catch up with rows added, changed or deleted during the copy
+            synced = timezone.now()
+            for model, lookup in TENANT_TABLES:
+                self.sync(model, lookup, started)
+
+            # 5. Sequences on the target must continue past the copied ids
+            advance_sequences(connections[target], [model for model, _lookup in TENANT_TABLES])
+
+            Store.objects.using('default').filter(pk=store.pk).update(db_shard=target)
+            forget_store_shard(store.pk)
+        finally:
+            Store.objects.using('default').filter(pk=store.pk).update(shard_locked=False)
+
+        self.stdout.write(self.style.SUCCESS(f'{store.subdomain} now lives on {target}'))
+
+        # 6. GETs are not paused, so requests that loaded the store before the switch may still
+        # have created (empty) carts on the old shard; carry them over once those requests are done
+        time.sleep(options['grace'])
+        late = self.copy(Cart, self.rows(Cart, 'store', source).filter(created_at__gte=synced))
+        self.stdout.write(f'{Cart._meta.label}: copied {late} created during the switch')
+
+        # 7. Clean up the old shard
+        if not options['keep_source']:
+            with transaction.atomic(using=source):
+                for model, lookup in reversed(TENANT_TABLES):
+                    deleted, _counts = self.rows(model, lookup, source).delete()
+                if source != 'default':
+                    User.objects.using(source).filter(pk=store.owner_id).delete()
+            self.stdout.write(f'Removed the store\'s rows from {source}')
+
+    def rows(self, model, lookup, alias):
+        return model.objects.using(alias).filter(**{lookup: self.store.pk}).order_by('pk')
+
+    def copy_reference_rows(self):
+        connection = connections[self.target]
+        for model, queryset in (
+            (User, User.objects.using('default').filter(pk=self.store.owner_id)),
+            (Store, Store.objects.using('default').filter(pk=self.store.pk)),
+        ):
+            attnames = [field.attname for field in model._meta.concrete_fields]
+            upsert(model, list(queryset.values_list(*attnames)), connection)
+
+    def copy(self, model, queryset):
+        """Upsert queryset's rows into the target in batches; returns the number of rows"""
+        connection = connections[self.target]
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        copied = 0
+        batch = []
+
+        pk_index = attnames.index(model._meta.pk.attname)
+        lookup = dict(TENANT_TABLES)[model]
+
+        def flush():
+            ids = [row[pk_index] for row in batch]
+            clash = model.objects.using(self.target).filter(pk__in=ids).exclude(**{lookup: self.store.pk})
+            if clash.exists():
+                raise CommandError(
+                    f'{model._meta.label} ids on {self.target} overlap with {self.store.subdomain}; '
+                    f'give each shard its own id range before moving stores'
+                )
+            with transaction.atomic(using=self.target):
+                upsert(model, batch, connection)
+
+        for row in queryset.values_list(*attnames).iterator(chunk_size=COPY_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) >= COPY_BATCH_SIZE:
+                flush()
+                copied += len(batch)
+                batch = []
+        if batch:
+            flush()
+            copied += len(batch)
+        return copied
+
+    def sync(self, model, lookup, started):
+        source_ids = set(self.rows(model, lookup, self.source).values_list('pk', flat=True))
+        target_ids = set(self.rows(model, lookup, self.target).values_list('pk', flat=True))
+
+        removed = target_ids - source_ids
+        if removed:
+            model.objects.using(self.target).filter(pk__in=removed).delete()
+
+        changed = self.rows(model, lookup, self.source).filter(pk__in=source_ids - target_ids)
+        copied = self.copy(model, changed)
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            copied += self.copy(model, self.rows(model, lookup, self.source).filter(updated_at__gte=started))
+        elif model is ProductImage:
+            # No timestamp to tell what changed; a store's images are few, so copy them again
+            copied += self.copy(model, self.rows(model, lookup, self.source))
+
+        self.stdout.write(f'{model._meta.label}: synced {copied}, removed {len(removed)}')
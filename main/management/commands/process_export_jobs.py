@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main.models import ExportJob
+from main.sharding import store_shard
+from main.utils.export_service import run_export_job
+
+
+class Command(BaseCommand):
+    help = "Build the files for queued dashboard exports (run from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Maximum number of jobs to process')
+
+    def handle(self, *args, **options):
+        # A worker that died mid-export leaves its job running forever; fail it so the merchant can retry
+        now = timezone.now()
+        stale = ExportJob.objects.filter(
+            status='running', started_at__lt=now - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT)
+        ).update(status='failed', error='The export stopped before it finished. Please request it again.',
+                 finished_at=now)
+        if stale:
+            self.stdout.write(self.style.WARNING(f'Failed {stale} export(s) left running by a stopped worker'))
+
+        jobs = ExportJob.objects.filter(status='pending').select_related('store').order_by('created_at')
+
+        for job in jobs[:options['limit']]:
+            # Claim the job so concurrent runners don't build it twice
+            if not ExportJob.objects.filter(pk=job.pk, status='pending').update(
+                status='running', started_at=timezone.now()
+            ):
+                continue
+
+            with store_shard(job.store):
+                run_export_job(job)
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(f'Export #{job.pk} ({job.kind}): {job.status}, {job.row_count} rows'))
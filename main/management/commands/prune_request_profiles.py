@@ -0,0 +1,17 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from main.utils.request_profiler import prune_profiles
+
+
+class Command(BaseCommand):
+    help = "Delete request profiles and their pstats files once they are old (run daily from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=settings.PROFILE_RETENTION_DAYS, metavar='DAYS',
+                            help='Delete profiles recorded more than this many days ago (default PROFILE_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        pruned = prune_profiles(timezone.now() - timedelta(days=options['older_than']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {pruned} request profile(s)'))
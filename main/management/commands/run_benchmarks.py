@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from main.utils.benchmarks import BENCHMARKS, run_benchmarks, save_results
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the per-request hot paths (middleware, product and cart properties, validators, shop "
+        "templates) and append the results to BENCHMARK_HISTORY for compare_benchmarks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks to run (default all)')
+        parser.add_argument('--repeat', type=int, default=7, help='Timed runs per benchmark (default 7)')
+        parser.add_argument('--min-time', type=float, default=0.2,
+                            help='Seconds each run lasts at least (default 0.2)')
+        parser.add_argument('--history', help='History file (default BENCHMARK_HISTORY)')
+        parser.add_argument('--no-save', action='store_true', help="Print the results without recording them")
+        parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name in BENCHMARKS:
+                self.stdout.write(name)
+            return
+
+        unknown = set(options['names']) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+        def progress(name, timing):
+            self.stdout.write(
+                f"{name:<32}{timing['min_ns'] / 1000:>12.2f} µs"
+                f"  (median {timing['median_ns'] / 1000:.2f} µs, spread {timing['spread']:.1%}, {timing['loops']} loops)"
+            )
+
+        results = run_benchmarks(options['names'], repeat=options['repeat'], min_time=options['min_time'],
+                                 progress=progress)
+
+        if not options['no_save']:
+            entry = save_results(results, options['history'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Recorded {len(results)} benchmark(s) for commit {entry['commit'] or 'unknown'}"
+            ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from dokans.models import Store
+from main.utils.tenant_throttle import STAT_FIELDS, throttle_stats
+
+
+class Command(BaseCommand):
+    help = "Show hourly storefront throttling counts for a store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('subdomain', help='Subdomain of the store')
+        parser.add_argument('--hours', type=int, default=24, help='How many hours back to show (default 24)')
+
+    def handle(self, *args, **options):
+        store = Store.objects.filter(subdomain=options['subdomain']).first()
+        if store is None:
+            raise CommandError(f"Store '{options['subdomain']}' does not exist")
+
+        self.stdout.write('hour (UTC)         ' + ''.join(f'{field:>21}' for field in STAT_FIELDS))
+        for hour, counts in throttle_stats(store.id, options['hours']):
+            self.stdout.write(f'{hour:%Y-%m-%d %H:00}   ' + ''.join(f'{counts[field]:>21}' for field in STAT_FIELDS))
@@ -1,7 +1,45 @@
+from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from django.urls import resolve
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from dokans.models import Store
+from .db_router import start_replica_reads, stop_replica_reads
+from .sharding import store_shard
+from .utils import tenant_throttle
+from .utils.memory_profiler import measure_request, start_tracing
+from .utils.request_profiler import profile_request, profile_trigger
+from .utils.rate_limit import RATE_LIMITED_PATHS, check_request
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def store_moving_response():
+    """Writes are refused for the few seconds a store is switching database shards"""
+    response = HttpResponse("This store is being upgraded. Please try again in a minute.", status=503)
+    response['Retry-After'] = '30'
+    return response
+
+
+class RateLimitMiddleware:
+    """
+    Per-IP budgets for the auth and validation endpoints.
+
+    Sits right after SecurityMiddleware so throttled requests are rejected
+    before sessions, CSRF and authentication do any work.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        name = RATE_LIMITED_PATHS.get(request.path_info)
+        if name:
+            response = check_request(request, name, ('ip',))
+            if response is not None:
+                return response
+
+        return self.get_response(request)
 
 
 class SubdomainMiddleware:
@@ -82,7 +120,35 @@ class SubdomainMiddleware:
                 request.store = None
                 request.is_storefront = False
 
-        response = self.get_response(request)
+        if not request.is_storefront:
+            return self.get_response(request)
+
+        if request.path in tenant_throttle.THROTTLE_EXEMPT_PATHS:
+            with store_shard(request.store):
+                return self.get_response(request)
+
+        # Per-store budget so one store's traffic spike can't occupy every worker
+        result, slot = tenant_throttle.admit(request.store)
+        if result in (tenant_throttle.RATE_LIMITED, tenant_throttle.CONCURRENCY_LIMITED):
+            response = tenant_throttle.cached_page(request)
+            if response is None:
+                response = render(request, 'errors/rate_limited.html', {'retry_after': 5}, status=429)
+                response['Retry-After'] = '5'
+            tenant_throttle.ensure_csrf_cookie(request)
+            return response
+
+        try:
+            if request.store.shard_locked and request.method not in SAFE_METHODS:
+                return store_moving_response()
+            with store_shard(request.store):
+                response = self.get_response(request)
+        finally:
+            tenant_throttle.release(request.store, slot)
+
+        if result == tenant_throttle.ADMITTED_HOT:
+            tenant_throttle.remember_page(request, response)
+        # After remember_page, so the cookie does not stop the page from being kept
+        tenant_throttle.ensure_csrf_cookie(request)
         return response
 
 
@@ -103,5 +169,83 @@ class StoreAccessMiddleware:
                 messages.error(request, "You don't have a store yet.")
                 return redirect('/registration/')
 
+            store = request.user.store
+            if store.shard_locked and request.method not in SAFE_METHODS:
+                return store_moving_response()
+            with store_shard(store):
+                return self.get_response(request)
+
         response = self.get_response(request)
         return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serve storefront catalog pages from the read replicas.
+
+    Only GETs of REPLICA_VIEWS are routed; everything else, and any client
+    that made a write in the last REPLICA_PIN_SECONDS, stays on the primary.
+    """
+
+    REPLICA_VIEWS = {'shop_home', 'shop_products', 'shop_product_detail'}
+    PIN_COOKIE = 'db_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            token = getattr(request, '_replica_token', None)
+            if token is not None:
+                stop_replica_reads(token)
+
+        if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            response.set_cookie(self.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method == 'GET'
+            and view_func.__name__ in self.REPLICA_VIEWS
+            and self.PIN_COOKIE not in request.COOKIES
+        ):
+            request._replica_token = start_replica_reads()
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    Profile the view and template rendering of requests that carry a signed
+    profiling token or are picked by PROFILE_SAMPLE_RATE.
+
+    Last in the chain, so the store and its shard are already set up and
+    the profile holds only the request's own work.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, trigger)
+
+
+class MemoryProfilingMiddleware:
+    """
+    Record peak and retained memory of every request, with its top
+    allocation sites, while MEMORY_PROFILING is on. Removed from the chain
+    otherwise.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        start_tracing()
+
+    def __call__(self, request):
+        return measure_request(request, self.get_response)
@@ -1,3 +1,113 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from dokans.models import Store
 
-# Create your models here.
+
+def export_storage():
+    # Kept outside MEDIA_ROOT: exports contain customer data and are only served through export_download
+    return FileSystemStorage(location=settings.EXPORT_ROOT)
+
+
+def profile_storage():
+    return FileSystemStorage(location=settings.PROFILE_ROOT)
+
+
+class ExportJob(models.Model):
+    """A CSV export too large to stream inside a request, built by process_export_jobs"""
+
+    KIND_CHOICES = [
+        ('orders', 'Orders'),
+        ('customers', 'Customers'),
+        ('products', 'Products'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='export_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='%Y/%m/', storage=export_storage, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['store', '-created_at']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} export #{self.pk} - {self.store.store_name}"
+
+
+class RequestProfile(models.Model):
+    """A request run under the profiler by ProfilingMiddleware: pstats file plus SQL timeline"""
+
+    TRIGGER_CHOICES = [
+        ('header', 'Signed header'),
+        ('query', 'Signed query flag'),
+        ('sample', 'Sampled'),
+    ]
+
+    store = models.ForeignKey(Store, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    # [{'at_ms', 'ms', 'db', 'sql', 'many'}] in execution order
+    sql_timeline = models.JSONField(default=list, blank=True)
+    file = models.FileField(storage=profile_storage)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['store', '-created_at']),
+            models.Index(fields=['view_name', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class MemoryProfile(models.Model):
+    """Memory one request used, recorded by MemoryProfilingMiddleware"""
+
+    store = models.ForeignKey(Store, on_delete=models.SET_NULL, null=True, blank=True, related_name='memory_profiles')
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    # Most allocated at once on top of what the process held before, and what was still held after
+    peak_bytes = models.BigIntegerField()
+    growth_bytes = models.BigIntegerField()
+    # Products + customers + orders of the store at the time
+    tenant_size = models.PositiveIntegerField(default=0)
+    # [{'site', 'bytes', 'count'}], largest first
+    top_allocations = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['view_name', '-created_at']),
+            models.Index(fields=['store', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} (peak {self.peak_bytes // 1024} KiB)"
@@ -0,0 +1,86 @@
+"""
+Tenant shards.
+
+Store.db_shard names the database alias holding a store's catalog, carts,
+customers and orders (TENANT_MODELS). Stores, users and everything else stay
+on 'default'; each shard also keeps a reference copy of its stores and their
+owners so the foreign keys to them hold there.
+
+Code working for one store runs inside store_shard(store): the middleware
+does this per request, commands per store. TenantShardRouter then sends
+every query on a tenant model to that store's shard.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import transaction
+
+TENANT_MODELS = {
+    'products.category',
+    'products.product',
+    'products.productimage',
+    'orders.customer',
+    'orders.cart',
+    'orders.cartitem',
+    'orders.order',
+    'orders.orderitem',
+    'orders.payment',
+}
+
+SHARD_MAP_SECONDS = 60
+
+_current_shard = ContextVar('current_shard', default=None)
+_shard_map = {}
+
+
+def is_tenant_model(model):
+    return model._meta.label_lower in TENANT_MODELS
+
+
+def shard_aliases():
+    return ['default', *settings.DATABASE_SHARDS]
+
+
+def shard_for_store(store_id):
+    """Alias of a store's shard, from a short-lived per-process map"""
+    cached = _shard_map.get(store_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    from dokans.models import Store
+    alias = Store.objects.using('default').filter(pk=store_id).values_list('db_shard', flat=True).first()
+    alias = alias or 'default'
+    _shard_map[store_id] = (alias, time.monotonic() + SHARD_MAP_SECONDS)
+    return alias
+
+
+def forget_store_shard(store_id):
+    _shard_map.pop(store_id, None)
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+@contextmanager
+def store_shard(store):
+    """Route tenant queries to the store's shard for the duration of the block"""
+    alias = store.db_shard if store is not None else None
+    if store is not None:
+        _shard_map[store.pk] = (alias, time.monotonic() + SHARD_MAP_SECONDS)
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def tenant_atomic(func):
+    """transaction.atomic on the shard in scope instead of 'default'"""
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        with transaction.atomic(using=current_shard() or 'default'):
+            return func(*args, **kwargs)
+    return wrapped
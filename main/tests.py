@@ -1,3 +1,953 @@
-from django.test import TestCase
+import io
+import re
+import shutil
+import tempfile
+import tracemalloc
+from unittest import mock
+import dns.message
+import dns.name
+import dns.resolver
+import dns.rrset
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from dokans.models import Store, User
+from main.db_router import replica_reads
+from main.management.commands import move_store_shard
+from main.sharding import store_shard, tenant_atomic
+from main.models import ExportJob, MemoryProfile, RequestProfile
+from main.utils import rate_limit, tenant_throttle
+from main.utils.benchmarks import BENCHMARKS, run_benchmarks
+from main.utils.domain_validator import is_valid_subdomain
+from main.utils.export_service import export_queryset, iter_csv
+from main.utils.email_service import MX_NEGATIVE_TTL_MIN, _negative_ttl
+from main.utils.memory_profiler import measure_request, start_tracing, view_report
+from main.utils.order_archive import archive_orders, load_archived_order, store_archive_dir
+from main.utils.otp_service import MAX_ATTEMPTS, can_resend_otp, generate_otp, verify_otp
+from main.utils.request_profiler import make_profile_token, profile_report
+from orders.models import Cart, CartItem, Customer, Order, OrderItem
+from products.importer import ProductImporter
+from products.models import Category, Product
 
-# Create your tests here.
+MAIN_HOST = 'ekhane.bd'
+
+
+def seed_store(subdomain, products=100, orders=100, categories=10):
+    """A store with an owner, catalog, customers and orders, created with bulk inserts"""
+    owner = User.objects.create_user(username=f'{subdomain}@example.com', password='password')
+    store = Store.objects.create(owner=owner, store_name=subdomain.title(), subdomain=subdomain, status='active')
+    now = timezone.now()
+
+    category_list = Category.objects.bulk_create(
+        Category(store=store, name=f'Category {i}', slug=f'category-{i}', order=i) for i in range(categories)
+    )
+    product_list = Product.objects.bulk_create(
+        Product(
+            store=store,
+            category=category_list[i % categories],
+            name=f'Product {i}',
+            slug=f'product-{i}',
+            sku=f'SKU-{store.id}-{i}',
+            price=Decimal(100 + i % 500),
+            stock_quantity=i % 40,
+            is_featured=i % 25 == 0,
+        )
+        for i in range(products)
+    )
+
+    customer_count = max(1, orders // 3)
+    customer_list = Customer.objects.bulk_create(
+        Customer(store=store, name=f'Customer {i}', email=f'c{i}@example.com', phone=f'0171{i:07d}')
+        for i in range(customer_count)
+    )
+    order_list = Order.objects.bulk_create(
+        Order(
+            store=store,
+            customer=customer_list[i % customer_count],
+            order_number=f'ORD-{store.id}-{i:08d}',
+            status=Order.STATUS_CHOICES[i % len(Order.STATUS_CHOICES)][0],
+            payment_method='cod' if i % 2 else 'bkash',
+            payment_status='paid' if i % 3 else 'pending',
+            subtotal=Decimal(500),
+            total=Decimal(560),
+            shipping_name=f'Customer {i % customer_count}',
+            shipping_email=f'c{i % customer_count}@example.com',
+            shipping_phone=f'0171{i:07d}',
+            shipping_phone_normalized=f'171{i:07d}',
+            shipping_address='House 1, Road 2',
+            shipping_division='Dhaka',
+            shipping_district='Dhaka',
+            item_count=2,
+        )
+        for i in range(orders)
+    )
+    # Spread orders over the last year; auto_now_add stamps them all with the insert time
+    for i, order in enumerate(order_list):
+        order.created_at = now - timedelta(hours=i * 8760 / max(1, orders))
+    Order.objects.bulk_update(order_list, ['created_at'], batch_size=1000)
+
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            product=product_list[(i + offset) % products],
+            product_name=product_list[(i + offset) % products].name,
+            quantity=1,
+            price=Decimal(250),
+            total=Decimal(250),
+        )
+        for i, order in enumerate(order_list)
+        for offset in (0, 1)
+    )
+    return store
+
+
+def explain(sql):
+    """Query plan lines for a SELECT as the database would run it"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Test tables are small; forbid the shortcuts so the plan shows whether an index could be used
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+# Tables that grow with a store; a scan or an unindexed sort on them is a regression
+TENANT_TABLES = (
+    'products_product', 'products_category', 'products_productimage',
+    'orders_customer', 'orders_cart', 'orders_cartitem', 'orders_order', 'orders_orderitem', 'orders_payment',
+)
+
+
+# A prefetch sorts only the children of the parents already fetched for the page
+PREFETCH_WHERE = re.compile(r'WHERE "\w+"\."\w+_id" IN \(')
+
+
+def plan_problems(sql, plan):
+    problems = []
+    for line in plan:
+        if connection.vendor == 'postgresql':
+            scan = re.search(r'Seq Scan on (\w+)', line)
+            sort = re.match(r'\s*(->\s*)?Sort\b', line)
+        else:
+            scan = re.match(r'SCAN (\w+)(?! USING (COVERING )?INDEX)', line)
+            sort = 'USE TEMP B-TREE FOR' in line and 'ORDER BY' in line
+        if scan and scan.group(1) in TENANT_TABLES:
+            problems.append(f'sequential scan of {scan.group(1)}')
+        elif sort and any(table in sql for table in TENANT_TABLES) and not PREFETCH_WHERE.search(sql):
+            problems.append('sort without an index')
+    return problems
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST])
+class QueryPlanTests(TestCase):
+    """
+    The hot storefront and dashboard views, run against a large store next to
+    a smaller one, must only reach tenant tables through indexes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('bigshop', products=3000, orders=3000, categories=40)
+        seed_store('smallshop', products=200, orders=200, categories=5)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        cls.customer = Customer.objects.filter(store=cls.store).first()
+        cls.order = Order.objects.filter(store=cls.store).first()
+
+    def assertIndexedPlans(self, path, host=MAIN_HOST, login=True):
+        if login:
+            self.client.force_login(self.store.owner)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, HTTP_HOST=host)
+        self.assertEqual(response.status_code, 200, path)
+        self.assertIndexed(queries, path)
+
+    def assertIndexed(self, queries, label):
+        problems = []
+        for sql in {query['sql'] for query in queries.captured_queries}:
+            if not sql.startswith('SELECT'):
+                continue
+            for problem in plan_problems(sql, explain(sql)):
+                problems.append(f'{problem}: {sql}')
+        self.assertFalse(problems, f'{label}\n' + '\n'.join(problems))
+
+    def storefront(self, path):
+        self.assertIndexedPlans(path, host=f'bigshop.{MAIN_HOST}', login=False)
+
+    def test_shop_home(self):
+        self.storefront('/shop/')
+
+    def test_shop_products(self):
+        self.storefront('/shop/products/')
+
+    def test_shop_products_by_category(self):
+        self.storefront('/shop/products/?category=category-3')
+
+    def test_shop_product_detail(self):
+        self.storefront('/shop/product/product-42/')
+
+    def test_cart(self):
+        host = f'bigshop.{MAIN_HOST}'
+        product = Product.objects.get(store=self.store, slug='product-7')
+        self.client.post(f'/cart/add/{product.id}/', {'quantity': 1}, HTTP_HOST=host)
+        self.assertTrue(CartItem.objects.filter(cart__store=self.store).exists())
+        self.storefront('/cart/')
+
+    def test_cart_lookup_by_session(self):
+        Cart.objects.create(store=self.store, session_key='a' * 32)
+        with CaptureQueriesContext(connection) as queries:
+            Cart.objects.get(store=self.store, session_key='a' * 32)
+        self.assertIndexed(queries, 'cart by session key')
+
+    def test_dashboard(self):
+        self.assertIndexedPlans('/dashboard/')
+
+    def test_product_list(self):
+        self.assertIndexedPlans('/dashboard/products/')
+
+    def test_product_list_by_category(self):
+        category = Category.objects.filter(store=self.store).first()
+        self.assertIndexedPlans(f'/dashboard/products/?category={category.id}')
+
+    def test_category_list(self):
+        self.assertIndexedPlans('/dashboard/products/categories/')
+
+    def test_order_list(self):
+        self.assertIndexedPlans('/dashboard/orders/')
+
+    def test_order_list_by_status(self):
+        self.assertIndexedPlans('/dashboard/orders/?status=shipped')
+
+    def test_order_list_by_customer(self):
+        self.assertIndexedPlans(f'/dashboard/orders/?customer={self.customer.id}')
+
+    def test_order_search_by_phone(self):
+        self.assertIndexedPlans('/dashboard/orders/?search=01710000')
+
+    def test_order_search_by_number(self):
+        self.assertIndexedPlans(f'/dashboard/orders/?search=ORD-{self.store.id}-0000')
+
+    def test_order_detail(self):
+        self.assertIndexedPlans(f'/dashboard/orders/{self.order.id}/')
+
+    def test_customer_list(self):
+        for sort in ('recent', 'orders', 'value', 'last_order'):
+            with self.subTest(sort=sort):
+                self.assertIndexedPlans(f'/dashboard/customers/?sort={sort}')
+
+
+# (view, path, storefront?, most queries allowed). Paths are filled in per store.
+QUERY_BUDGETS = [
+    ('shop_home', '/shop/', True, 7),
+    ('shop_products', '/shop/products/', True, 6),
+    ('shop_products_by_category', '/shop/products/?category={category_slug}', True, 6),
+    ('shop_product_detail', '/shop/product/{product_slug}/', True, 7),
+    ('cart_view', '/cart/', True, 5),
+    ('checkout', '/checkout/', True, 5),
+    ('order_confirmation', '/order/{order_number}/', True, 3),
+    ('dashboard', '/dashboard/', False, 5),
+    ('product_list', '/dashboard/products/', False, 10),
+    ('product_add', '/dashboard/products/add/', False, 4),
+    ('product_edit', '/dashboard/products/{product_id}/edit/', False, 6),
+    ('category_list', '/dashboard/products/categories/', False, 4),
+    ('order_list', '/dashboard/orders/', False, 6),
+    ('order_list_by_customer', '/dashboard/orders/?customer={customer_id}', False, 6),
+    ('order_detail', '/dashboard/orders/{order_id}/', False, 9),
+    ('customer_list', '/dashboard/customers/', False, 6),
+    ('export_jobs', '/dashboard/exports/', False, 4),
+    ('analytics', '/dashboard/analytics/', False, 3),
+    ('store_settings', '/dashboard/settings/', False, 3),
+]
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST])
+class QueryBudgetTests(TestCase):
+    """
+    Every storefront and dashboard view must stay within its query budget for
+    stores of 10, 1,000 and 10,000 products and orders: a count that grows
+    with the store is an N+1 query.
+    """
+
+    STORE_SIZES = (10, 1000, 10000)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stores = {
+            size: seed_store(f'shop{size}', products=size, orders=size, categories=min(size, 20))
+            for size in cls.STORE_SIZES
+        }
+
+    def path_values(self, store):
+        product = Product.objects.filter(store=store).order_by('id').first()
+        order = Order.objects.filter(store=store).order_by('id').first()
+        return {
+            'product_id': product.id,
+            'product_slug': product.slug,
+            'category_slug': product.category.slug,
+            'order_id': order.id,
+            'order_number': order.order_number,
+            'customer_id': order.customer_id,
+        }
+
+    def count_queries(self, store, path, storefront):
+        """Queries for a repeat visit: the first request creates the session and cart"""
+        if storefront:
+            host = f'{store.subdomain}.{MAIN_HOST}'
+            self.client.logout()
+            for product in Product.objects.filter(store=store).order_by('id')[:3]:
+                self.client.post(f'/cart/add/{product.id}/', {'quantity': 1}, HTTP_HOST=host)
+        else:
+            host = MAIN_HOST
+            self.client.force_login(store.owner)
+
+        self.client.get(path, HTTP_HOST=host)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, HTTP_HOST=host)
+        self.assertEqual(response.status_code, 200, path)
+        return len(queries)
+
+    def test_query_budgets(self):
+        for name, path, storefront, budget in QUERY_BUDGETS:
+            with self.subTest(view=name):
+                counts = {
+                    size: self.count_queries(store, path.format(**self.path_values(store)), storefront)
+                    for size, store in self.stores.items()
+                }
+                self.assertLessEqual(max(counts.values()), budget, f'{name} queries by store size: {counts}')
+                self.assertLessEqual(counts[10000], counts[1000], f'{name} queries grow with the store: {counts}')
+
+
+class BenchmarkTests(SimpleTestCase):
+    """The microbenchmarks keep running, and keep off the database, as the code under them changes"""
+
+    def test_every_benchmark_runs(self):
+        results = run_benchmarks(repeat=1, min_time=0)
+        self.assertEqual(set(results), set(BENCHMARKS))
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST], PROFILE_ROOT=tempfile.mkdtemp(), PROFILE_SAMPLE_RATE=0)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('profiled', products=20, orders=20, categories=2)
+        cls.admin = User.objects.create_superuser(username='admin@example.com', password='password')
+
+    def test_signed_header_profiles_the_request(self):
+        response = self.client.get(
+            '/shop/products/', HTTP_HOST=f'profiled.{MAIN_HOST}', HTTP_X_PROFILE_TOKEN=make_profile_token(self.admin)
+        )
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.store, profile.view_name, profile.trigger), (self.store, 'shop_products', 'header'))
+        self.assertEqual(profile.query_count, len(profile.sql_timeline))
+        self.assertIn('shop_products', profile_report(profile))
+
+    def test_query_token_is_not_stored(self):
+        token = make_profile_token(self.admin)
+        self.client.get(f'/shop/products/?page=1&_profile={token}', HTTP_HOST=f'profiled.{MAIN_HOST}')
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.trigger, profile.path), ('query', '/shop/products/?page=1'))
+
+    def test_tokens_of_other_users_are_ignored(self):
+        for token in ('forged', make_profile_token(self.store.owner)):
+            with self.subTest(token=token):
+                self.client.get(f'/shop/?_profile={token}', HTTP_HOST=f'profiled.{MAIN_HOST}')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_old_profiles_are_pruned_with_their_files(self):
+        token = make_profile_token(self.admin)
+        for _ in range(2):
+            self.client.get(f'/shop/?_profile={token}', HTTP_HOST=f'profiled.{MAIN_HOST}')
+        old, recent = RequestProfile.objects.order_by('pk')
+        RequestProfile.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=30))
+        self.addCleanup(recent.file.delete, save=False)
+
+        call_command('prune_request_profiles', '--older-than', '7', stdout=io.StringIO())
+
+        self.assertEqual(list(RequestProfile.objects.all()), [recent])
+        self.assertFalse(old.file.storage.exists(old.file.name))
+        self.assertTrue(recent.file.storage.exists(recent.file.name))
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST], MEMORY_PROFILING=True, PROFILE_SAMPLE_RATE=0)
+class MemoryProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('measured', products=20, orders=20, categories=2)
+
+    def setUp(self):
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+
+    def test_requests_are_sampled_with_their_tenant_size(self):
+        response = self.client.get('/shop/products/', HTTP_HOST=f'measured.{MAIN_HOST}')
+        self.assertEqual(response.status_code, 200)
+
+        sample = MemoryProfile.objects.get()
+        self.assertEqual((sample.store, sample.view_name, sample.status_code), (self.store, 'shop_products', 200))
+        self.assertEqual(sample.tenant_size, 20 + Customer.objects.count() + 20)
+        self.assertGreater(sample.peak_bytes, 0)
+        self.assertTrue(all({'site', 'bytes', 'count'} <= set(site) for site in sample.top_allocations))
+
+    def test_views_scaling_with_store_size_are_flagged(self):
+        samples = []
+        for store_id, size in ((1, 100), (2, 1000), (3, 10000)):
+            samples.append(('product_list', store_id, size, size * 2048, 0))
+            samples.append(('shop_home', store_id, size, 400 * 1024, 0))
+        samples.append(('customer_list', 1, 100, 900 * 1024, 600 * 1024))
+
+        rows = {row['view']: row for row in view_report(samples)}
+        self.assertEqual(rows['product_list']['flags'], ['scales with tenant size'])
+        self.assertAlmostEqual(rows['product_list']['slope'], 1.0)
+        self.assertEqual(rows['shop_home']['flags'], [])
+        # One store is not a trend, but the memory it kept is still a finding
+        self.assertIsNone(rows['customer_list']['slope'])
+        self.assertEqual(rows['customer_list']['flags'], ['keeps memory after the request'])
+
+    def test_the_response_body_does_not_count_as_kept_memory(self):
+        start_tracing()
+        kept = []
+
+        def large_page(request):
+            return HttpResponse(b'x' * (2 * settings.MEMORY_GROWTH_FLAG_BYTES))
+
+        def leaking_page(request):
+            kept.append(b'x' * (2 * settings.MEMORY_GROWTH_FLAG_BYTES))
+            return HttpResponse(b'ok')
+
+        for view in (large_page, leaking_page):
+            measure_request(RequestFactory().get(f'/{view.__name__}/'), view)
+
+        large, leaking = MemoryProfile.objects.order_by('pk')
+        self.assertLess(large.growth_bytes, settings.MEMORY_GROWTH_FLAG_BYTES)
+        self.assertGreater(large.peak_bytes, 2 * settings.MEMORY_GROWTH_FLAG_BYTES)
+        self.assertGreaterEqual(leaking.growth_bytes, 2 * settings.MEMORY_GROWTH_FLAG_BYTES)
+
+
+class NegativeMxTtlTests(SimpleTestCase):
+    """Negative MX answers are cached for the zone's SOA minimum (RFC 2308)"""
+
+    def setUp(self):
+        self.qname = dns.name.from_text('nomail.example')
+        self.response = dns.message.make_response(dns.message.make_query(self.qname, 'MX'))
+        self.response.authority.append(
+            dns.rrset.from_text('example.', 900, 'IN', 'SOA', 'ns.example. host.example. 1 7200 3600 1209600 300')
+        )
+
+    def test_soa_minimum_of_each_negative_answer(self):
+        for error in (
+            dns.resolver.NoAnswer(response=self.response),
+            dns.resolver.NXDOMAIN(qnames=[self.qname], responses={self.qname: self.response}),
+        ):
+            with self.subTest(error=type(error).__name__):
+                self.assertEqual(_negative_ttl(error), 300)
+
+    def test_answer_without_response_uses_the_floor(self):
+        self.assertEqual(_negative_ttl(dns.resolver.NXDOMAIN()), MX_NEGATIVE_TTL_MIN)
+
+
+class SubdomainValidationTests(SimpleTestCase):
+    def test_leetspeak_spellings_of_reserved_words_are_reserved(self):
+        for name in ('mail', 'ma1l', 'm4il', '4dm1n'):
+            with self.subTest(name=name):
+                self.assertEqual(is_valid_subdomain(name), (False, 'This subdomain is reserved'))
+
+    def test_real_words_are_not_folded_into_reserved_ones(self):
+        for name in ('mall', 'tulip', 'rahimfashion'):
+            with self.subTest(name=name):
+                self.assertEqual(is_valid_subdomain(name), (True, ''))
+
+
+class HotStorePageCacheTests(SimpleTestCase):
+    """Pages replayed to other shoppers while a store is hot must not carry anyone's CSRF token"""
+
+    def request(self, path):
+        request = RequestFactory().get(path, HTTP_HOST=f'hot.{MAIN_HOST}')
+        request.store = Store(id=987654, subdomain='hot')
+        return request
+
+    def test_pages_without_a_token_are_kept(self):
+        request = self.request('/shop/products/')
+        tenant_throttle.remember_page(request, HttpResponse('<p>catalog</p>'))
+        self.assertEqual(tenant_throttle.cached_page(self.request('/shop/products/')).content, b'<p>catalog</p>')
+
+    def test_pages_that_rendered_a_token_are_not_kept(self):
+        request = self.request('/shop/checkout/')
+        token = get_token(request)
+        tenant_throttle.remember_page(request, HttpResponse(f'<input value="{token}">'))
+        self.assertIsNone(tenant_throttle.cached_page(self.request('/shop/checkout/')))
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST])
+class WaitingRoomThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('queued', products=5, orders=0, categories=1)
+        Store.objects.filter(pk=cls.store.pk).update(waiting_room_enabled=True)
+
+    def test_queue_polls_do_not_spend_the_store_budget(self):
+        over_budget = (tenant_throttle.RATE_LIMITED, None)
+        with mock.patch.object(tenant_throttle, 'admit', return_value=over_budget) as admit:
+            poll = self.client.get('/checkout/waiting-room/status/', HTTP_HOST=f'queued.{MAIN_HOST}')
+            admit.assert_not_called()
+            page = self.client.get('/shop/', HTTP_HOST=f'queued.{MAIN_HOST}')
+
+        self.assertEqual(poll.status_code, 200)
+        self.assertIn('admitted', poll.json())
+        self.assertEqual(page.status_code, 429)
+
+    def test_a_checkout_pass_only_works_for_the_shopper_it_was_issued_to(self):
+        cache.clear()
+        host = f'queued.{MAIN_HOST}'
+        product = Product.objects.get(store=self.store, slug='product-0')
+        Product.objects.filter(pk=product.pk).update(stock_quantity=10)
+        self.client.post(f'/cart/add/{product.id}/', HTTP_HOST=host)
+        admitted = self.client.get('/checkout/waiting-room/status/', HTTP_HOST=host)
+        self.assertTrue(admitted.json()['admitted'])
+        self.assertEqual(self.client.get('/checkout/', HTTP_HOST=host).status_code, 200)
+
+        other = self.client_class()
+        other.cookies[f'wr_pass_{self.store.id}'] = self.client.cookies[f'wr_pass_{self.store.id}'].value
+        self.assertRedirects(other.get('/checkout/', HTTP_HOST=host), '/checkout/waiting-room/',
+                             fetch_redirect_response=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/checkout/', {
+                'name': 'Rahim', 'email': 'rahim@example.com', 'phone': '01700000000', 'address': 'Road 1',
+                'division': 'Dhaka', 'district': 'Dhaka', 'payment_method': 'cod',
+            }, HTTP_HOST=host)
+        self.assertTrue(Order.objects.filter(store=self.store).exists())
+        self.client.post(f'/cart/add/{product.id}/', HTTP_HOST=host)
+        self.assertRedirects(self.client.get('/checkout/', HTTP_HOST=host), '/checkout/waiting-room/',
+                             fetch_redirect_response=False)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('exporting', products=3, orders=0, categories=1)
+
+    def test_text_that_would_run_as_a_formula_is_escaped(self):
+        Product.objects.filter(store=self.store, slug='product-0').update(name='=HYPERLINK("http://x","y")')
+        Product.objects.filter(store=self.store, slug='product-1').update(name='-2+3')
+        csv_text = ''.join(iter_csv(*export_queryset('products', self.store, {})))
+
+        self.assertIn('"\'=HYPERLINK(""http://x"",""y"")"', csv_text)
+        self.assertIn("\'-2+3,", csv_text)
+        self.assertIn('Product 2,', csv_text)
+
+    def test_jobs_left_running_by_a_stopped_worker_are_failed(self):
+        stuck = ExportJob.objects.create(
+            store=self.store, kind='products', status='running', started_at=timezone.now() - timedelta(days=1)
+        )
+        queued = ExportJob.objects.create(store=self.store, kind='products')
+        call_command('process_export_jobs', stdout=io.StringIO())
+
+        stuck.refresh_from_db()
+        queued.refresh_from_db()
+        self.addCleanup(queued.file.delete, save=False)
+        self.assertEqual(stuck.status, 'failed')
+        self.assertEqual((queued.status, queued.row_count), ('done', 3))
+
+
+class ProductImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('importing', products=2, orders=0, categories=1)
+
+    def run_import(self, text, dry_run=False):
+        return ProductImporter(self.store, dry_run=dry_run).run(io.BytesIO(text.encode('utf-8-sig')))
+
+    def test_valid_rows_are_created_and_invalid_rows_reported_by_line(self):
+        report = self.run_import(
+            'Name,Price,Category,Stock,SKU\n'
+            'Cotton Panjabi,1200,category 0,4,PJ-1\n'
+            'Product 0,300,,,\n'                      # slug of an existing product
+            'Silk Panjabi,1500,Shoes,,\n'              # unknown category
+            'Linen Panjabi,900,,99999999999,\n'        # beyond the integer column
+            'Khadi Panjabi,800,,,PJ-1\n'               # SKU taken by an earlier row
+            'জামদানি শাড়ি,abc,,,\n'
+        )
+
+        self.assertEqual((report.total_rows, report.created, report.error_count), (6, 1, 5))
+        self.assertEqual([error['line'] for error in report.errors], [3, 4, 5, 6, 7])
+        self.assertIn('slug "product-0" already exists', report.errors[0]['message'])
+        self.assertIn('Unknown category "Shoes"', report.errors[1]['message'])
+        self.assertEqual(report.errors[2]['message'], 'Stock is too large')
+        self.assertEqual(report.errors[3]['message'], 'SKU "PJ-1" is already used')
+        self.assertEqual(report.errors[4]['message'], 'Price must be a number')
+
+        product = Product.objects.get(store=self.store, slug='cotton-panjabi')
+        self.assertEqual((product.sku, product.stock_quantity, product.category.name), ('PJ-1', 4, 'Category 0'))
+
+    def test_generated_skus_are_unique(self):
+        report = self.run_import(
+            'Name,Price\nPremium Jamdani Saree Red Large,100\nPremium Jamdani Saree Red Small,100\n'
+        )
+
+        self.assertEqual(report.created, 2)
+        skus = set(Product.objects.filter(store=self.store, name__startswith='Premium').values_list('sku', flat=True))
+        self.assertEqual(len(skus), 2)
+
+    def test_dry_run_validates_without_saving(self):
+        report = self.run_import('Name,Price\nCotton Panjabi,1200\n', dry_run=True)
+
+        self.assertEqual((report.created, report.error_count), (1, 0))
+        self.assertFalse(Product.objects.filter(store=self.store, slug='cotton-panjabi').exists())
+
+    def test_missing_required_columns(self):
+        report = self.run_import('Name,Stock\nCotton Panjabi,4\n')
+        self.assertEqual(report.errors, [{'line': 1, 'message': 'Missing required column(s): price'}])
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST])
+class ProductBulkEditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('editing', products=3, orders=0, categories=1)
+        cls.other = seed_store('otherstore', products=1, orders=0, categories=1)
+        cls.products = list(Product.objects.filter(store=cls.store).order_by('id'))
+        cls.foreign = Product.objects.get(store=cls.other)
+
+    def setUp(self):
+        self.client.force_login(self.store.owner)
+
+    def api(self, products):
+        return self.client.post(
+            '/dashboard/products/api/bulk-update/', data={'products': products},
+            content_type='application/json', HTTP_HOST=MAIN_HOST,
+        )
+
+    def test_json_updates_valid_rows_and_reports_the_rest(self):
+        first, second, third = self.products
+        response = self.api([
+            {'id': first.id, 'price': '150', 'stock_quantity': 7},
+            {'id': second.id, 'sale_price': str(second.price)},      # not below the price
+            {'id': third.id, 'stock_quantity': 99999999999},
+            {'id': self.foreign.id, 'price': '1'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['success'], data['updated']), (False, 1))
+        self.assertIn('Sale price must be less than regular price', data['errors'][str(second.id)])
+        self.assertIn('Stock is too large', data['errors'][str(third.id)])
+        self.assertEqual(data['errors'][str(self.foreign.id)], 'Product not found')
+
+        first.refresh_from_db()
+        self.assertEqual((first.price, first.stock_quantity), (Decimal('150.00'), 7))
+        for product in (second, third, self.foreign):
+            with self.subTest(product=product.name):
+                before = (product.price, product.sale_price, product.stock_quantity)
+                product.refresh_from_db()
+                self.assertEqual((product.price, product.sale_price, product.stock_quantity), before)
+
+    def test_sale_price_is_checked_against_the_new_price(self):
+        product = self.products[0]
+        response = self.api([{'id': product.id, 'price': '500', 'sale_price': '450'}])
+        self.assertEqual(response.json(), {'success': True, 'updated': 1, 'errors': {}})
+
+        response = self.api([{'id': product.id, 'price': '400'}])
+        self.assertFalse(response.json()['success'])
+        product.refresh_from_db()
+        self.assertEqual((product.price, product.sale_price), (Decimal('500.00'), Decimal('450.00')))
+
+    def test_form_saves_the_edited_columns(self):
+        product = self.products[1]
+        response = self.client.post('/dashboard/products/bulk-edit/', {
+            'product_ids': [str(product.id), str(self.foreign.id)],
+            f'price_{product.id}': '275.50',
+            f'sale_price_{product.id}': '',
+            f'stock_quantity_{product.id}': '12',
+            f'price_{self.foreign.id}': '1',
+            f'stock_quantity_{self.foreign.id}': '0',
+        }, HTTP_HOST=MAIN_HOST)
+
+        self.assertEqual(response.status_code, 302)
+        product.refresh_from_db()
+        self.assertEqual((product.price, product.stock_quantity, product.is_active), (Decimal('275.50'), 12, False))
+        self.foreign.refresh_from_db()
+        self.assertNotEqual(self.foreign.price, Decimal('1'))
+
+
+class OtpTests(SimpleTestCase):
+    """Runs the Lua scripts on the fakeredis stand-in"""
+
+    email = 'rahim@example.com'
+
+    def setUp(self):
+        cache.clear()
+
+    def test_valid_code_verifies_once(self):
+        otp = generate_otp(self.email)
+        self.assertEqual(verify_otp(self.email, f' {otp} '), (True, 'OTP verified successfully'))
+        self.assertEqual(verify_otp(self.email, otp), (False, 'OTP expired or not found'))
+
+    def test_wrong_code(self):
+        otp = generate_otp(self.email)
+        wrong = f'{(int(otp) + 1) % 1000000:06d}'
+        self.assertEqual(verify_otp(self.email, wrong), (False, 'Invalid OTP'))
+        self.assertEqual(verify_otp('other@example.com', otp), (False, 'OTP expired or not found'))
+
+    def test_locked_after_max_attempts_even_with_the_right_code(self):
+        otp = generate_otp(self.email)
+        wrong = f'{(int(otp) + 1) % 1000000:06d}'
+        for _attempt in range(MAX_ATTEMPTS - 1):
+            self.assertEqual(verify_otp(self.email, wrong), (False, 'Invalid OTP'))
+        # The last allowed attempt still counts
+        self.assertEqual(verify_otp(self.email, otp), (True, 'OTP verified successfully'))
+
+        otp = generate_otp(self.email)
+        for _attempt in range(MAX_ATTEMPTS):
+            verify_otp(self.email, wrong)
+        self.assertEqual(verify_otp(self.email, otp), (False, 'Too many attempts. Try again later'))
+
+    def test_expired_code(self):
+        otp = generate_otp(self.email)
+        cache.delete(f'otp_{self.email}')
+        self.assertEqual(verify_otp(self.email, otp), (False, 'OTP expired or not found'))
+
+    def test_new_code_resets_the_attempts(self):
+        generate_otp(self.email)
+        for _attempt in range(MAX_ATTEMPTS):
+            verify_otp(self.email, '000000')
+        otp = generate_otp(self.email)
+        self.assertEqual(verify_otp(self.email, otp), (True, 'OTP verified successfully'))
+
+    def test_resend_cooldown(self):
+        self.assertEqual(can_resend_otp(self.email, cooldown_seconds=60), (True, 0))
+        allowed, remaining = can_resend_otp(self.email, cooldown_seconds=60)
+        self.assertFalse(allowed)
+        self.assertTrue(0 < remaining <= 60)
+        self.assertEqual(can_resend_otp('other@example.com', cooldown_seconds=60), (True, 0))
+
+        cache.delete(f'otp_last_send_{self.email}')
+        self.assertEqual(can_resend_otp(self.email, cooldown_seconds=60), (True, 0))
+
+
+class RateLimitTests(SimpleTestCase):
+    """Sliding-window budgets, run on the fakeredis stand-in"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_budget_per_scope(self):
+        limit, _window = rate_limit.RATE_LIMITS['login']['ip']
+        for _attempt in range(limit):
+            self.assertEqual(rate_limit.hit('login', 'ip', '203.0.113.7'), 0)
+        self.assertGreater(rate_limit.hit('login', 'ip', '203.0.113.7'), 0)
+
+        # Other addresses and the account budget are counted separately
+        self.assertEqual(rate_limit.hit('login', 'ip', '203.0.113.8'), 0)
+        self.assertEqual(rate_limit.hit('login', 'account', '203.0.113.7'), 0)
+
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        limit, window = rate_limit.RATE_LIMITS['login']['account']
+        start = (1_700_000_000 // window + 1) * window
+        with mock.patch.object(rate_limit.time, 'time', return_value=start + 1):
+            for _attempt in range(limit):
+                rate_limit.hit('login', 'account', 'rahim@example.com')
+        # Half way through the next window half of the old hits still count
+        with mock.patch.object(rate_limit.time, 'time', return_value=start + window * 1.5):
+            allowed = 0
+            while not rate_limit.hit('login', 'account', 'rahim@example.com'):
+                allowed += 1
+        self.assertEqual(allowed, limit // 2)
+
+    def test_forwarded_for_is_only_trusted_behind_our_proxies(self):
+        request = RequestFactory().get('/login/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='1.1.1.1, 203.0.113.9')
+        with override_settings(RATE_LIMIT_TRUSTED_PROXIES=0):
+            self.assertEqual(rate_limit.client_ip(request), '10.0.0.2')
+        with override_settings(RATE_LIMIT_TRUSTED_PROXIES=1):
+            # The client can prepend anything; only the hop our proxy added is real
+            self.assertEqual(rate_limit.client_ip(request), '203.0.113.9')
+        with override_settings(RATE_LIMIT_TRUSTED_PROXIES=5):
+            self.assertEqual(rate_limit.client_ip(request), '1.1.1.1')
+
+    def test_validate_answers_json(self):
+        with mock.patch.object(rate_limit, 'hit', return_value=7):
+            response = self.client.get('/validate/', {'field': 'email', 'value': 'x'}, HTTP_HOST=MAIN_HOST)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+        message = 'Too many attempts. Please try again in 7 seconds.'
+        self.assertEqual(response.json(), {'valid': False, 'success': False, 'msg': message, 'message': message})
+
+    def test_fails_open_without_redis(self):
+        with mock.patch.object(rate_limit, '_sliding_window', side_effect=ConnectionError('Redis is down')):
+            self.assertEqual(rate_limit.hit('login', 'ip', '203.0.113.7'), 0)
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST], DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Outside a TestCase transaction, since reads inside one always stay on the primary"""
+
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        self.store = seed_store('replicated', products=3, orders=3, categories=1)
+
+    def get(self, path, host=None, client=None):
+        """The response and the number of queries it sent to the primary and to the replica"""
+        client = client or self.client
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            response = client.get(path, HTTP_HOST=host or f'replicated.{MAIN_HOST}')
+        return response, len(primary), len(replica)
+
+    def test_catalog_pages_read_from_the_replica(self):
+        for path in ['/shop/', '/shop/products/', '/shop/product/product-0/']:
+            with self.subTest(path=path):
+                response, _, replica = self.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(replica, 0)
+
+    def test_a_client_that_just_wrote_keeps_reading_from_the_primary(self):
+        product = Product.objects.get(store=self.store, slug='product-1')
+        response = self.client.post(f'/cart/add/{product.id}/', HTTP_HOST=f'replicated.{MAIN_HOST}')
+        self.assertIn('db_primary', response.cookies)
+
+        response, primary, replica = self.get('/shop/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_reads_inside_a_transaction_stay_on_the_primary(self):
+        with replica_reads():
+            self.assertEqual(Product.objects.all().db, 'replica1')
+            with transaction.atomic():
+                self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_dashboard_and_checkout_never_use_the_replica(self):
+        self.client.force_login(self.store.owner)
+        response, _, replica = self.get('/dashboard/', host=MAIN_HOST)
+        self.assertEqual((response.status_code, replica), (200, 0))
+
+        response, _, replica = self.get('/checkout/', client=self.client_class())
+        self.assertEqual((response.status_code, replica), (302, 0))
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST], DATABASE_SHARDS=['shard1'])
+class TenantShardTests(TestCase):
+    databases = {'default', 'shard1'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('moving', products=5, orders=4, categories=2)
+
+    def move(self, during_grace=()):
+        """Move the store to shard1, running each of during_grace in place of a grace period"""
+        steps = iter(during_grace)
+        with mock.patch.object(move_store_shard.time, 'sleep', side_effect=lambda seconds: next(steps, lambda: None)()):
+            call_command('move_store_shard', 'moving', 'shard1', stdout=io.StringIO())
+        self.store.refresh_from_db()
+
+    def test_tenant_queries_follow_the_store_in_scope(self):
+        Store.objects.filter(pk=self.store.pk).update(db_shard='shard1')
+        self.store.refresh_from_db()
+        self.assertEqual(Product.objects.all().db, 'default')
+        self.assertEqual(Store.objects.all().db, 'default')
+        with store_shard(self.store):
+            self.assertEqual(Product.objects.all().db, 'shard1')
+            self.assertEqual(Order.objects.all().db, 'shard1')
+            self.assertEqual(Store.objects.all().db, 'default')
+
+            @tenant_atomic
+            def depth():
+                return len(connections['shard1'].atomic_blocks)
+            self.assertEqual(depth(), len(connections['shard1'].atomic_blocks) + 1)
+
+    def test_a_move_carries_changes_made_during_the_copy_and_empties_the_source(self):
+        def change_during_copy():
+            Product.objects.filter(store=self.store, slug='product-0').update(name='Renamed', updated_at=timezone.now())
+            Product.objects.filter(store=self.store, slug='product-1').delete()
+            Category.objects.create(store=self.store, name='Late', slug='late')
+
+        def cart_created_during_switch():
+            Cart.objects.using('default').create(store=self.store, session_key='late-shopper')
+
+        self.move([change_during_copy, cart_created_during_switch])
+
+        self.assertEqual(self.store.db_shard, 'shard1')
+        self.assertFalse(self.store.shard_locked)
+        on_shard = Product.objects.using('shard1').filter(store=self.store)
+        self.assertEqual(on_shard.count(), 4)
+        self.assertEqual(on_shard.get(slug='product-0').name, 'Renamed')
+        self.assertTrue(Category.objects.using('shard1').filter(store=self.store, slug='late').exists())
+        self.assertEqual(Order.objects.using('shard1').filter(store=self.store).count(), 4)
+        self.assertTrue(Cart.objects.using('shard1').filter(store=self.store, session_key='late-shopper').exists())
+        for model in (Category, Product, Order, Customer, Cart):
+            self.assertFalse(model.objects.using('default').filter(store=self.store).exists(), model)
+
+        response = self.client.get('/shop/products/', HTTP_HOST=f'moving.{MAIN_HOST}')
+        self.assertContains(response, 'Renamed')
+
+    def test_a_move_stops_when_an_id_is_taken_on_the_target(self):
+        other = seed_store('taken', products=0, orders=0, categories=1)
+        shard = connections['shard1']
+        move_store_shard.upsert(User, [[getattr(other.owner, f.attname) for f in User._meta.concrete_fields]], shard)
+        move_store_shard.upsert(Store, [[getattr(other, f.attname) for f in Store._meta.concrete_fields]], shard)
+        clashing_id = Product.objects.filter(store=self.store).values_list('pk', flat=True).first()
+        Product.objects.using('shard1').bulk_create([Product(id=clashing_id, store=other, name='Theirs', price=1)])
+
+        with self.assertRaisesMessage(CommandError, 'overlap'):
+            self.move()
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.db_shard, 'default')
+        self.assertEqual(Product.objects.filter(store=self.store).count(), 5)
+
+
+@override_settings(ALLOWED_HOSTS=[f'.{MAIN_HOST}', MAIN_HOST], ORDER_ARCHIVE_ROOT=tempfile.mkdtemp())
+class OrderArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = seed_store('archiving', products=3, orders=24, categories=1)
+        # The first customer's orders, newest first: 0, 4 and 8 months old
+        cls.history = list(Order.objects.filter(store=cls.store, customer__name='Customer 0').order_by('-created_at'))
+        for order, status in zip(cls.history, ['delivered', 'cancelled', 'delivered']):
+            order.status = status
+        Order.objects.bulk_update(cls.history, ['status'])
+
+    def setUp(self):
+        self.addCleanup(shutil.rmtree, store_archive_dir(self.store.id), ignore_errors=True)
+        archive_orders(self.store, timezone.now())
+
+    def test_archived_orders_are_read_back_from_the_index(self):
+        late = Order.objects.filter(store=self.store, status='pending').first()
+        Order.objects.filter(pk=late.pk).update(status='cancelled')
+        archive_orders(self.store, timezone.now())
+
+        for order in (self.history[0], late):
+            archived = load_archived_order(self.store, order.id)
+            self.assertEqual((archived.order_number, archived.archived), (order.order_number, True))
+            self.assertEqual(len(archived.items.all()), 2)
+        self.assertIsNone(load_archived_order(self.store, 10 ** 9))
+
+    def test_the_archived_history_follows_the_list_filters(self):
+        self.client.force_login(self.store.owner)
+        customer_id = self.history[0].customer_id
+
+        def archived(**filters):
+            response = self.client.get('/dashboard/orders/', {'customer': customer_id, **filters}, HTTP_HOST=MAIN_HOST)
+            return [order['id'] for order in response.context['archived_orders']]
+
+        ids = [order.id for order in self.history]
+        self.assertEqual(archived(), ids)
+        self.assertEqual(archived(status='delivered'), [ids[0], ids[2]])
+        self.assertEqual(archived(payment_method='cod'), [])
+        since = (timezone.now() - timedelta(days=200)).date().isoformat()
+        self.assertEqual(archived(date_from=since), ids[:2])
@@ -0,0 +1,89 @@
+"""
+Admin helpers for tables with millions of rows.
+
+EstimatedCountPaginator answers the unfiltered changelist count from the
+planner's statistics instead of COUNT(*), and StoreAutocompleteFilter
+replaces the store dropdown (one <option> per store) with a search box
+backed by the admin autocomplete view.
+"""
+from django import forms
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from dokans.models import Store
+
+# Below this many rows an exact count is cheap enough
+ESTIMATE_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            connection = connections[queryset.db]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                        [queryset.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                if row and row[0] >= ESTIMATE_THRESHOLD:
+                    return row[0]
+        return super().count
+
+
+class StoreAutocompleteFilter(admin.SimpleListFilter):
+    """Filter on the model's store FK, picking the store by search"""
+    title = 'store'
+    parameter_name = 'store__id__exact'
+    template = 'admin/store_autocomplete_filter.html'
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.app_label = model._meta.app_label
+        self.model_name = model._meta.model_name
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        # Only the selected store is listed; others are found through the search box
+        value = self.value()
+        if value and value.isdigit():
+            store = Store.objects.filter(pk=value).only('store_name', 'subdomain').first()
+            if store:
+                return [(str(store.pk), str(store))]
+        return []
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(store_id=value)
+        return queryset
+
+
+class LargeTableAdminMixin:
+    """Estimated counts, no second full-table COUNT(*) on filtered pages, and the filter's assets"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        # Same asset names as AutocompleteSelect so the two merge without loading jQuery twice
+        extra = '' if settings.DEBUG else '.min'
+        return super().media + forms.Media(
+            js=(
+                f'admin/js/vendor/jquery/jquery{extra}.js',
+                f'admin/js/vendor/select2/select2.full{extra}.js',
+                'admin/js/jquery.init.js',
+                'admin/js/autocomplete.js',
+            ),
+            css={
+                'screen': (f'admin/css/vendor/select2/select2{extra}.css', 'admin/css/autocomplete.css'),
+            },
+        )
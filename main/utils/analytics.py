@@ -0,0 +1,198 @@
+"""
+Columnar analytics snapshots.
+
+build_snapshot() copies a store's orders and order items into NumPy arrays
+and saves them as one compressed .npz file per store under ANALYTICS_ROOT.
+It runs periodically from the build_analytics_snapshots command and also
+takes in orders moved to the cold archive. The report functions only read
+those arrays, using vectorized NumPy operations, so the dashboard analytics
+page never queries the order tables.
+
+Money is stored as int64 poisha (1/100 taka) so sums are exact.
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from itertools import chain
+import numpy as np
+from django.conf import settings
+from orders.models import Order, OrderItem
+from .order_archive import iter_archived_records
+
+SNAPSHOT_CHUNK_SIZE = 5000
+SECONDS_PER_DAY = 86400
+
+STATUS_CODES = {status: code for code, (status, _label) in enumerate(Order.STATUS_CHOICES)}
+CANCELLED = STATUS_CODES['cancelled']
+
+
+def snapshot_path(store_id):
+    return os.path.join(settings.ANALYTICS_ROOT, f'store_{store_id}.npz')
+
+
+def _to_poisha(amount):
+    return int(round(amount * 100))
+
+
+def _columns(rows, converters):
+    """Stream rows (tuples) into one NumPy array per column"""
+    columns = [[] for _ in converters]
+    for row in rows:
+        for column, value, (convert, _dtype) in zip(columns, row, converters):
+            column.append(convert(value))
+    return [np.array(column, dtype=dtype) for column, (_convert, dtype) in zip(columns, converters)]
+
+
+def _archived_rows(store):
+    """Order and item rows of the store's archived orders, shaped like the queries below"""
+    # An order archived twice (after an interrupted run) counts once
+    records = {record['order']['id']: record for record in iter_archived_records(store)}
+    orders, items = [], []
+    for record in records.values():
+        order = record['order']
+        orders.append((
+            order['id'], datetime.fromisoformat(order['created_at']), Decimal(order['total']),
+            order['status'], order['customer_id'],
+        ))
+        items.extend(
+            (item['order_id'], item['product_id'], item['product_name'], item['quantity'], Decimal(item['total']))
+            for item in record['items']
+        )
+    return orders, items
+
+
+def build_snapshot(store):
+    """Export the store's orders into a columnar snapshot file and return its path"""
+    order_rows = Order.objects.filter(store=store).order_by('id').values_list(
+        'id', 'created_at', 'total', 'status', 'customer_id'
+    )
+    archived_orders, archived_items = _archived_rows(store)
+    order_id, created, total, status, customer = _columns(chain(
+        order_rows.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE), archived_orders
+    ), [
+        (int, np.int64),
+        (lambda value: int(value.timestamp()), np.int64),
+        (_to_poisha, np.int64),
+        (STATUS_CODES.get, np.int8),
+        (lambda value: value or 0, np.int64),
+    ])
+
+    item_rows = OrderItem.objects.filter(order__store=store).order_by('order_id').values_list(
+        'order_id', 'product_id', 'product_name', 'quantity', 'total'
+    )
+    item_order, item_product, item_name, item_quantity, item_total = _columns(chain(
+        item_rows.iterator(chunk_size=SNAPSHOT_CHUNK_SIZE), archived_items
+    ), [
+        (int, np.int64),
+        (lambda value: value or 0, np.int64),
+        (str, np.str_),
+        (int, np.int64),
+        (_to_poisha, np.int64),
+    ])
+
+    # Keep one display name per product key; deleted products (id 0) are keyed by name
+    product_key = np.where(item_product > 0, item_product.astype(str), item_name) if item_name.size else item_name
+
+    path = snapshot_path(store.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temp file and rename so readers never see a half-written snapshot
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz')
+    with os.fdopen(fd, 'wb') as fh:
+        np.savez_compressed(
+            fh,
+            generated_at=np.int64(time.time()),
+            order_id=order_id,
+            order_created=created,
+            order_total=total,
+            order_status=status,
+            order_customer=customer,
+            item_order=item_order,
+            item_product_key=product_key,
+            item_name=item_name,
+            item_quantity=item_quantity,
+            item_total=item_total,
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_snapshot(store):
+    """Return the store's snapshot arrays, or None if none has been built yet"""
+    try:
+        with np.load(snapshot_path(store.id)) as data:
+            return {key: data[key] for key in data.files}
+    except FileNotFoundError:
+        return None
+
+
+def revenue_by_day(snapshot, days=30):
+    """List of (date, order_count, revenue) for the last `days` days, oldest first"""
+    valid = snapshot['order_status'] != CANCELLED
+    created = snapshot['order_created'][valid]
+    total = snapshot['order_total'][valid]
+
+    today = int(snapshot['generated_at']) // SECONDS_PER_DAY
+    offset = created // SECONDS_PER_DAY - (today - days + 1)
+    in_range = (offset >= 0) & (offset < days)
+
+    counts = np.bincount(offset[in_range], minlength=days)
+    revenue = np.bincount(offset[in_range], weights=total[in_range], minlength=days)
+
+    first_day = (today - days + 1) * SECONDS_PER_DAY
+    return [
+        (
+            datetime.fromtimestamp(first_day + index * SECONDS_PER_DAY, tz=dt_timezone.utc).date(),
+            int(counts[index]),
+            revenue[index] / 100,
+        )
+        for index in range(days)
+    ]
+
+
+def top_products(snapshot, limit=10):
+    """List of (name, quantity, revenue) for the best selling products by revenue"""
+    keys = snapshot['item_product_key']
+    if not keys.size:
+        return []
+
+    cancelled_orders = snapshot['order_id'][snapshot['order_status'] == CANCELLED]
+    valid = ~np.isin(snapshot['item_order'], cancelled_orders)
+
+    unique_keys, first_index, inverse = np.unique(keys[valid], return_index=True, return_inverse=True)
+    quantity = np.bincount(inverse, weights=snapshot['item_quantity'][valid])
+    revenue = np.bincount(inverse, weights=snapshot['item_total'][valid])
+    names = snapshot['item_name'][valid][first_index]
+
+    best = np.argsort(revenue)[::-1][:limit]
+    return [(str(names[i]), int(quantity[i]), revenue[i] / 100) for i in best]
+
+
+def summary(snapshot):
+    """Headline numbers: order count, revenue, average order value and repeat customer rate"""
+    valid = snapshot['order_status'] != CANCELLED
+    totals = snapshot['order_total'][valid]
+    customers = snapshot['order_customer'][valid]
+    customers = customers[customers > 0]
+
+    order_count = int(totals.size)
+    revenue = int(totals.sum()) / 100
+
+    if customers.size:
+        _ids, orders_per_customer = np.unique(customers, return_counts=True)
+        repeat_rate = float((orders_per_customer > 1).mean() * 100)
+        customer_count = int(orders_per_customer.size)
+    else:
+        repeat_rate = 0.0
+        customer_count = 0
+
+    return {
+        'order_count': order_count,
+        'revenue': revenue,
+        'average_order_value': revenue / order_count if order_count else 0,
+        'customer_count': customer_count,
+        'repeat_rate': repeat_rate,
+        'generated_at': datetime.fromtimestamp(int(snapshot['generated_at']), tz=dt_timezone.utc),
+    }
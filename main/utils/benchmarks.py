@@ -0,0 +1,304 @@
+"""
+Microbenchmarks for the code every request runs.
+
+Each entry in BENCHMARKS is a setup function returning the callable to
+time. Fixtures are unsaved model instances with their relations and
+prefetches filled in by hand, and run_benchmarks() refuses any database
+query while timing, so results measure Python and template work only and
+need no data. Store lookups and queries are covered by the query budget
+tests and the load_test command instead.
+
+Timing follows timeit: the loop count is calibrated until one run takes
+at least min_time, then `repeat` runs are timed with the garbage collector
+off. The fastest run is the figure to compare, as timeit advises: slower
+runs are the machine's noise, not the code's. The median and the spread
+between runs show how much noise there was.
+
+Results are appended as one JSON line per run to BENCHMARK_HISTORY,
+tagged with the git commit and the machine, for compare_benchmarks.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import timeit
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from dokans.models import Store, User
+from orders.models import Cart, CartItem
+from products.models import Category, Product, ProductImage
+from .domain_validator import is_valid_subdomain
+from .email_service import is_real_email
+
+BENCHMARKS = {}
+BENCH_HOST = f'benchshop.{settings.MAIN_DOMAIN}'
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# ----------------------------------------------------------------------------
+# Fixtures
+# ----------------------------------------------------------------------------
+
+def _prefetched(instance, name, model, objects):
+    """Attach objects as if prefetch_related(name) had loaded them"""
+    queryset = model.objects.none()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault('_prefetched_objects_cache', {})[name] = queryset
+
+
+def _store():
+    owner = User(id=1, username='bench@example.com', first_name='Bench')
+    return Store(id=1, owner=owner, store_name='Bench বাজার', subdomain='benchshop', status='active')
+
+
+def _products(store, count=12):
+    category = Category(id=1, store=store, name='শাড়ি', slug='sarees')
+    products = []
+    for number in range(count):
+        price = Decimal(250 + 100 * number)
+        product = Product(
+            id=number + 1, store=store, category=category,
+            name=f'Jamdani Saree {number}' if number % 2 else f'জামদানি শাড়ি {number}',
+            slug=f'jamdani-saree-{number}', price=price,
+            sale_price=price - 50 if number % 3 == 0 else None,
+            stock_quantity=number % 4, is_featured=number % 5 == 0,
+        )
+        image = ProductImage(id=number + 1, product=product, image=f'products/bench/{number}.jpg', is_primary=True)
+        _prefetched(product, 'images', ProductImage, [image])
+        products.append(product)
+    return products
+
+
+def _cart(store, products):
+    cart = Cart(id=1, store=store, session_key='b' * 32)
+    _prefetched(cart, 'items', CartItem, [
+        CartItem(id=number + 1, cart=cart, product=product, quantity=number % 3 + 1, price=product.final_price)
+        for number, product in enumerate(products)
+    ])
+    return cart
+
+
+def _request(path, host=BENCH_HOST, store=None):
+    request = RequestFactory().get(path, HTTP_HOST=host)
+    request.user = AnonymousUser()
+    request.store = store
+    request.is_storefront = store is not None
+    return request
+
+
+# ----------------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------------
+
+def _middleware(path, host):
+    from ..middleware import SubdomainMiddleware
+
+    middleware = SubdomainMiddleware(lambda request: HttpResponse())
+    request = RequestFactory().get(path, HTTP_HOST=host)
+    return lambda: middleware(request)
+
+
+@benchmark('middleware_main_site_path')
+def bench_middleware_main_site_path():
+    return _middleware('/dashboard/orders/', settings.MAIN_DOMAIN)
+
+
+@benchmark('middleware_main_domain')
+def bench_middleware_main_domain():
+    return _middleware('/', settings.MAIN_DOMAIN)
+
+
+@benchmark('middleware_www')
+def bench_middleware_www():
+    return _middleware('/shop/products/', f'www.{settings.MAIN_DOMAIN}')
+
+
+@benchmark('product_final_price')
+def bench_product_final_price():
+    products = _products(_store())
+    return lambda: [product.final_price for product in products]
+
+
+@benchmark('product_discount_percentage')
+def bench_product_discount_percentage():
+    products = _products(_store())
+    return lambda: [product.discount_percentage for product in products]
+
+
+@benchmark('product_is_in_stock')
+def bench_product_is_in_stock():
+    products = _products(_store())
+    return lambda: [product.is_in_stock for product in products]
+
+
+@benchmark('cart_subtotal')
+def bench_cart_subtotal():
+    store = _store()
+    cart = _cart(store, _products(store, 5))
+    return lambda: cart.subtotal
+
+
+@benchmark('is_valid_subdomain')
+def bench_is_valid_subdomain():
+    names = ['rahimfashion', 'g00gle', 'my-shop-bd', 'dhakabazar2025', 'admin']
+    is_valid_subdomain(names[0])  # compile the matcher outside the timing
+    return lambda: [is_valid_subdomain(name) for name in names]
+
+
+@benchmark('is_real_email')
+def bench_is_real_email():
+    from django.core.cache import cache
+
+    # The MX answer is cached after the first check; time that path, not DNS
+    cache.set('mx_example.com', True, timeout=None)
+    addresses = ['rahim@example.com', 'not-an-email', 'fatema.begum@example.com']
+    return lambda: [is_real_email(address) for address in addresses]
+
+
+def _template(name, path, **context):
+    store = _store()
+    request = _request(path, store=store)
+    context = {'store': store, 'cart_count': 3, **context}
+    return lambda: render_to_string(name, context, request=request)
+
+
+@benchmark('render_shop_home')
+def bench_render_shop_home():
+    products = _products(_store())
+    return _template('shop/home.html', '/shop/', featured_products=products[:8], all_products=products)
+
+
+@benchmark('render_shop_products')
+def bench_render_shop_products():
+    store = _store()
+    products = _products(store, 48)
+    return _template('shop/products.html', '/shop/products/', products=products,
+                     categories=[products[0].category], search='')
+
+
+@benchmark('render_shop_product_detail')
+def bench_render_shop_product_detail():
+    products = _products(_store(), 5)
+    return _template('shop/product_detail.html', '/shop/product/jamdani-saree-0/',
+                     product=products[0], related_products=products[1:])
+
+
+@benchmark('render_shop_cart')
+def bench_render_shop_cart():
+    store = _store()
+    return _template('shop/cart.html', '/cart/', cart=_cart(store, _products(store, 5)))
+
+
+# ----------------------------------------------------------------------------
+# Harness
+# ----------------------------------------------------------------------------
+
+def _no_queries(execute, sql, params, many, context):
+    raise AssertionError(f'Benchmarks must not query the database: {sql}')
+
+
+def measure(func, repeat=7, min_time=0.2):
+    """Per-call timings of func in nanoseconds: median, min, spread and how they were taken"""
+    timer = timeit.Timer(func)
+    loops = 1
+    while True:
+        if timer.timeit(loops) >= min_time:
+            break
+        loops *= 2
+    runs = [seconds / loops * 1e9 for seconds in timer.repeat(repeat=repeat, number=loops)]
+    median = statistics.median(runs)
+    return {
+        'median_ns': round(median, 1),
+        'min_ns': round(min(runs), 1),
+        'spread': round((max(runs) - min(runs)) / median, 3) if median else 0,
+        'loops': loops,
+        'repeat': repeat,
+    }
+
+
+# Benchmarks run without Redis or a database server, for hosts under MAIN_DOMAIN
+BENCHMARK_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'ALLOWED_HOSTS': [settings.MAIN_DOMAIN, f'.{settings.MAIN_DOMAIN}'],
+}
+
+
+def run_benchmarks(names=None, repeat=7, min_time=0.2, progress=None):
+    """Time the named benchmarks (default all); returns {name: timings}"""
+    results = {}
+    with override_settings(**BENCHMARK_SETTINGS), connections['default'].execute_wrapper(_no_queries):
+        for name, setup in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            results[name] = measure(setup(), repeat=repeat, min_time=min_time)
+            if progress:
+                progress(name, results[name])
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, path=None):
+    """Append a run to the history file; returns the entry"""
+    path = path or settings.BENCHMARK_HISTORY
+    entry = {
+        'commit': _git_commit(),
+        'timestamp': timezone.now().isoformat(),
+        'machine': platform.node(),
+        'python': platform.python_version(),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as fh:
+        fh.write(json.dumps(entry) + '\n')
+    return entry
+
+
+def load_history(path=None):
+    try:
+        with open(path or settings.BENCHMARK_HISTORY, encoding='utf-8') as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def compare(base, head, threshold=0.10):
+    """
+    Rows of (name, base time, head time, relative change, verdict) for
+    benchmarks in both runs, by their fastest run. A change beyond threshold, and beyond the noise
+    both runs saw, is a 'regression' or an 'improvement'.
+    """
+    rows = []
+    for name, new in head['results'].items():
+        old = base['results'].get(name)
+        if old is None:
+            continue
+        change = (new['min_ns'] - old['min_ns']) / old['min_ns']
+        noise = max(old.get('spread', 0), new.get('spread', 0))
+        verdict = ''
+        if abs(change) > max(threshold, noise):
+            verdict = 'regression' if change > 0 else 'improvement'
+        rows.append((name, old['min_ns'], new['min_ns'], change, verdict))
+    return rows
@@ -0,0 +1,14 @@
+from datetime import datetime, time
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def day_start(value):
+    """Parse a YYYY-MM-DD query parameter into an aware datetime at midnight"""
+    try:
+        date = parse_date(value) if value else None
+    except ValueError:
+        date = None
+    if not date:
+        return None
+    return timezone.make_aware(datetime.combine(date, time.min))
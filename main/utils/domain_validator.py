@@ -1,5 +1,9 @@
 import re
-from .profanity_checker import has_profanity
+from functools import cache
+from .profanity_checker import PROFANITY, add_profanity
+from .word_matcher import WordMatcher
+
+RESERVED = 'reserved'
 
 RESERVED_SUBDOMAINS = {
     "admin","root","owner","support","help","secure","login",
@@ -9,16 +13,29 @@ RESERVED_SUBDOMAINS = {
     "facebook","google","amazon","daraz","bangladesh","microsoft",
 }
 
-def is_valid_subdomain(value: str):
+
+@cache
+def get_subdomain_matcher():
+    """Profanity and reserved names in one automaton, compiled once per process"""
+    matcher = add_profanity(WordMatcher())
+    for name in RESERVED_SUBDOMAINS:
+        matcher.add(name, RESERVED)
+    return matcher.compile()
+
+
+def is_valid_subdomain(value: str, matcher=None):
     value = value.strip().lower()
 
     if len(value) < 3 or len(value) > 50:
         return False, "Subdomain must be 3 to 50 characters"
 
-    if has_profanity(value):
+    # One pass finds both; reserved names (and lookalikes like g00gle) only count as the whole name
+    found = (matcher or get_subdomain_matcher()).scan(value)
+
+    if PROFANITY in found:
         return False, "Subdomain contains inappropriate words"
 
-    if value in RESERVED_SUBDOMAINS:
+    if found.get(RESERVED):
         return False, "This subdomain is reserved"
 
     if value.startswith("-") or value.endswith("-"):
@@ -37,3 +54,9 @@ def is_valid_subdomain(value: str):
         return False, "Subdomain cannot be repetitive characters"
 
     return True, ""
+
+
+def validate_subdomains(values):
+    """Batch form of is_valid_subdomain: {value: (valid, message)}"""
+    matcher = get_subdomain_matcher()
+    return {value: is_valid_subdomain(value, matcher) for value in values}
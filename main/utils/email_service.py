@@ -2,12 +2,29 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
+from django.core.cache import cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import re
+import threading
 from disposable_email_domains import blocklist
+import dns.exception
+import dns.rdatatype
 import dns.resolver
 
 DEFAULT_FROM = getattr(settings, "DEFAULT_FROM_EMAIL", "no-reply@yourdomain.com")
 
+# MX lookups: hard time budget per check and cache lifetimes (seconds)
+MX_LOOKUP_TIMEOUT = 2.0
+MX_POSITIVE_TTL_MIN = 300
+MX_POSITIVE_TTL_MAX = 86400
+MX_NEGATIVE_TTL_MIN = 60
+MX_NEGATIVE_TTL_MAX = 3600
+
+_mx_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='mx-lookup')
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
 def send_email(subject, to, template_name, context):
     """
     Send HTML email with plain text fallback.
@@ -44,12 +61,85 @@ def is_valid_email_format(email):
     return re.match(pattern, email) is not None
 
 
+def _negative_ttl(error):
+    """TTL for caching a negative answer: the SOA minimum from the authority section (RFC 2308)"""
+    try:
+        if isinstance(error, dns.resolver.NXDOMAIN):
+            response = error.response(error.qnames()[0])
+        else:
+            response = error.response()
+    except (KeyError, IndexError):
+        # Raised without the response it came from
+        return MX_NEGATIVE_TTL_MIN
+    for rrset in response.authority:
+        if rrset.rdtype == dns.rdatatype.SOA:
+            return min(rrset.ttl, rrset[0].minimum)
+    return MX_NEGATIVE_TTL_MIN
+
+
+def lookup_mx(domain):
+    """
+    Resolve MX records with a hard time budget.
+
+    Returns (has_mx, ttl), or None when the resolver could not answer in time.
+    """
+    try:
+        answer = dns.resolver.resolve(domain, 'MX', lifetime=MX_LOOKUP_TIMEOUT)
+        return True, answer.rrset.ttl
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        return False, _negative_ttl(e)
+    except (dns.exception.Timeout, dns.resolver.NoNameservers):
+        return None
+    except dns.exception.DNSException:
+        # Malformed names and similar can never have a mail server
+        return False, MX_NEGATIVE_TTL_MAX
+
+
+def _lookup_and_cache(domain):
+    try:
+        result = lookup_mx(domain)
+        if result is not None:
+            has_mx, ttl = result
+            if has_mx:
+                ttl = min(max(ttl, MX_POSITIVE_TTL_MIN), MX_POSITIVE_TTL_MAX)
+            else:
+                ttl = min(max(ttl, MX_NEGATIVE_TTL_MIN), MX_NEGATIVE_TTL_MAX)
+            cache.set(f"mx_{domain}", has_mx, timeout=ttl)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(domain, None)
+
+
 def domain_has_mx(domain):
+    """
+    Check a domain for MX records.
+
+    Answers come from the cache when possible. Misses are resolved on a shared
+    thread pool with one lookup in flight per domain, so a burst of checks for
+    the same domain costs a single DNS query. Callers wait at most
+    MX_LOOKUP_TIMEOUT; a resolver that cannot answer in time does not reject
+    the address.
+    """
+    domain = domain.strip().lower().rstrip('.')
+    cached = cache.get(f"mx_{domain}")
+    if cached is not None:
+        return cached
+
+    with _inflight_lock:
+        future = _inflight.get(domain)
+        if future is None:
+            future = _mx_executor.submit(_lookup_and_cache, domain)
+            _inflight[domain] = future
+
     try:
-        dns.resolver.resolve(domain, 'MX')
+        result = future.result(timeout=MX_LOOKUP_TIMEOUT)
+    except FutureTimeoutError:
+        result = None
+
+    if result is None:
         return True
-    except Exception:
-        return False
+    return result[0]
 
 
 def is_disposable_email(email):
@@ -0,0 +1,165 @@
+"""
+CSV exports for the store dashboard.
+
+Rows are read with values_list().iterator() so the database streams them in
+chunks (a server-side cursor on PostgreSQL) and no model instances are built.
+The same row generator feeds both the in-request StreamingHttpResponse and the
+background ExportJob file, so memory stays flat regardless of row count.
+"""
+import csv
+from datetime import timedelta
+from orders.models import Customer, OrderItem
+from products.models import Product
+from .date_utils import day_start
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Excel only detects UTF-8 (and therefore Bangla text) when the file starts with a BOM
+CSV_BOM = '\ufeff'
+
+# Names, addresses and product names come from shoppers; text starting with these runs as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+ORDER_HEADER = [
+    'Order Number', 'Date', 'Status', 'Payment Method', 'Payment Status',
+    'Customer Name', 'Customer Email', 'Phone', 'Division', 'District',
+    'Product', 'SKU', 'Quantity', 'Unit Price', 'Line Total',
+    'Order Subtotal', 'Shipping', 'Order Total',
+]
+
+CUSTOMER_HEADER = [
+    'Name', 'Email', 'Phone', 'Orders', 'Lifetime Value',
+    'First Order', 'Last Order', 'Registered',
+]
+
+PRODUCT_HEADER = [
+    'Name', 'SKU', 'Category', 'Price', 'Sale Price', 'Stock',
+    'Track Inventory', 'Active', 'Featured', 'Created',
+]
+
+
+def _date_range(queryset, field, filters):
+    start = day_start(filters.get('date_from'))
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+
+    end = day_start(filters.get('date_to'))
+    if end:
+        queryset = queryset.filter(**{f'{field}__lt': end + timedelta(days=1)})
+
+    return queryset
+
+
+def order_rows(store, filters):
+    items = OrderItem.objects.filter(order__store=store)
+    if filters.get('status'):
+        items = items.filter(order__status=filters['status'])
+    items = _date_range(items, 'order__created_at', filters)
+
+    return items.order_by('order__created_at', 'id').values_list(
+        'order__order_number', 'order__created_at', 'order__status',
+        'order__payment_method', 'order__payment_status',
+        'order__shipping_name', 'order__shipping_email', 'order__shipping_phone',
+        'order__shipping_division', 'order__shipping_district',
+        'product_name', 'product_sku', 'quantity', 'price', 'total',
+        'order__subtotal', 'order__shipping_cost', 'order__total',
+    )
+
+
+def customer_rows(store, filters):
+    customers = _date_range(Customer.objects.filter(store=store), 'created_at', filters)
+
+    return customers.order_by('created_at', 'id').values_list(
+        'name', 'email', 'phone', 'order_count', 'lifetime_value',
+        'first_order_at', 'last_order_at', 'created_at',
+    )
+
+
+def product_rows(store, filters):
+    products = Product.objects.filter(store=store)
+    if filters.get('status') == 'active':
+        products = products.filter(is_active=True)
+    elif filters.get('status') == 'inactive':
+        products = products.filter(is_active=False)
+    products = _date_range(products, 'created_at', filters)
+
+    return products.order_by('created_at', 'id').values_list(
+        'name', 'sku', 'category__name', 'price', 'sale_price', 'stock_quantity',
+        'track_inventory', 'is_active', 'is_featured', 'created_at',
+    )
+
+
+EXPORTS = {
+    'orders': (ORDER_HEADER, order_rows),
+    'customers': (CUSTOMER_HEADER, customer_rows),
+    'products': (PRODUCT_HEADER, product_rows),
+}
+
+
+def export_queryset(kind, store, filters):
+    header, build_rows = EXPORTS[kind]
+    # Bound to the shard now: a StreamingHttpResponse is iterated after the view, outside store_shard()
+    return header, build_rows(store, filters).using(store.db_shard)
+
+
+class Echo:
+    """File-like object whose write() hands the CSV line straight back"""
+
+    def write(self, value):
+        return value
+
+
+def escape_cell(value):
+    """Neutralize text a spreadsheet would run as a formula (CSV injection)"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(header, rows):
+    """Yield the CSV export line by line"""
+    writer = csv.writer(Echo())
+    yield CSV_BOM + writer.writerow(header)
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([escape_cell(value) for value in row])
+
+
+def export_filename(store, kind, filters):
+    # Only dates that parsed make it into the name; raw query text never reaches headers or paths
+    parts = [store.subdomain, kind]
+    for key in ('date_from', 'date_to'):
+        start = day_start(filters.get(key))
+        if start:
+            parts.append(start.date().isoformat())
+    return '-'.join(parts) + '.csv'
+
+
+def run_export_job(job):
+    """Build the CSV for a queued ExportJob and attach it to the job"""
+    from tempfile import TemporaryFile
+    from django.core.files import File
+    from django.utils import timezone
+
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        header, rows = export_queryset(job.kind, job.store, job.filters)
+        row_count = -1  # the header line is not a row
+        with TemporaryFile(mode='w+', encoding='utf-8', newline='') as fh:
+            for line in iter_csv(header, rows):
+                fh.write(line)
+                row_count += 1
+            fh.seek(0)
+            job.file.save(export_filename(job.store, job.kind, job.filters), File(fh), save=False)
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+    else:
+        job.status = 'done'
+        job.row_count = row_count
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
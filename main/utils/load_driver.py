@@ -0,0 +1,261 @@
+"""
+Load driver for a locally running server.
+
+run_load() starts `concurrency` virtual shoppers, each a thread with its own
+keep-alive connection and cookies, for a fixed duration. Every iteration a
+shopper picks a store (a few busy stores get most of the traffic, as in
+production) and a scenario from SCENARIOS by weight: storefront browsing,
+cart, checkout or the store owner's dashboard. Stores are addressed by Host
+header, so one server on 127.0.0.1 serves every subdomain.
+
+Only the scenario's last request is timed; set-up requests such as logging
+in or filling the cart before a checkout are not. Redirects are not
+followed: pages must answer 200, an add to cart must answer
+{"success": true}, a checkout must redirect to its order confirmation,
+anything else (a bounce to the login page included) counts as an error.
+
+Dashboard scenarios run as one store owner per shopper, assigned round robin
+and logged in once. Switching owners would mean a login per switch, and the
+login rate limits (per IP and per account) would soon turn every dashboard
+request into a redirect to the login page.
+
+The result maps each scenario to its request count, errors and latencies;
+summarize() turns that into throughput and p50/p95/p99 per endpoint.
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from orders.models import Order
+from products.models import Category, Product
+from ..sharding import store_shard
+
+CATALOG_SAMPLE = 500
+SEARCH_TERMS = ['saree', 'honey', 'tea', 'cotton', 'মধু', 'শাড়ি', 'bag', 'premium']
+
+
+class VirtualUser:
+    """One shopper: a persistent connection plus per-host cookies, like a browser"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.cookies = {}
+        # The store whose owner this shopper is on the dashboard, logged in on first use
+        self.owner = None
+        self.logged_in = False
+
+    def request(self, method, host, path, data=None):
+        """Send one request; returns (status, seconds, redirect location, body)"""
+        cookies = self.cookies.setdefault(host, {})
+        headers = {'Host': host, 'User-Agent': 'ekhanebd-load-driver'}
+        if cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in cookies.items())
+        body = None
+        if method == 'POST':
+            headers['X-CSRFToken'] = cookies.get('csrftoken', '')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            body = urlencode({'csrfmiddlewaretoken': cookies.get('csrftoken', ''), **(data or {})})
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return 0, time.perf_counter() - started, None, b''
+        elapsed = time.perf_counter() - started
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                if morsel['max-age'] == '0':
+                    cookies.pop(name, None)
+                else:
+                    cookies[name] = morsel.value
+        return response.status, elapsed, response.headers.get('Location'), body
+
+    def close(self):
+        self.connection.close()
+
+
+class Target:
+    """A store under test with a sample of its catalog"""
+
+    def __init__(self, store, domain):
+        self.store = store
+        self.host = f'{store.subdomain}.{domain}'
+        with store_shard(store):
+            self.products = list(
+                Product.objects.filter(store=store, is_active=True, stock_quantity__gt=0)
+                .values_list('id', 'slug')[:CATALOG_SAMPLE]
+            )
+            self.categories = list(
+                Category.objects.filter(store=store, is_active=True).values_list('slug', flat=True)
+            )
+            self.order_ids = list(
+                Order.objects.filter(store=store).order_by('-created_at').values_list('id', flat=True)[:CATALOG_SAMPLE]
+            )
+
+
+def _page(user, host, path):
+    """GET a page; returns (ok, seconds)"""
+    status, elapsed, _location, _body = user.request('GET', host, path)
+    return status == 200, elapsed
+
+
+def _storefront(path):
+    def scenario(user, target, rng, options):
+        return _page(user, target.host, path(target, rng))
+    return scenario
+
+
+def _add_to_cart(user, target, rng):
+    product_id, _slug = rng.choice(target.products)
+    if 'csrftoken' not in user.cookies.get(target.host, {}):
+        user.request('GET', target.host, '/shop/')
+    return user.request('POST', target.host, f'/cart/add/{product_id}/', {'quantity': 1})
+
+
+def cart_add(user, target, rng, options):
+    # The view answers 200 with {"success": false} when it refuses, e.g. out of stock
+    status, elapsed, _location, body = _add_to_cart(user, target, rng)
+    try:
+        added = status == 200 and json.loads(body).get('success') is True
+    except ValueError:
+        added = False
+    return added, elapsed
+
+
+def checkout(user, target, rng, options):
+    _add_to_cart(user, target, rng)
+    status, elapsed, location, _body = user.request('POST', target.host, '/checkout/', {
+        'name': 'Load Test', 'email': 'load.test@example.com', 'phone': '01711000000',
+        'address': 'House 1, Road 2, Mirpur', 'division': 'Dhaka', 'district': 'Dhaka',
+        'payment_method': 'cod',
+    })
+    return status == 302 and '/order/' in (location or ''), elapsed
+
+
+def _dashboard(path):
+    def scenario(user, _target, rng, options):
+        host = options['domain']
+        target = user.owner
+        if not user.logged_in:
+            user.request('GET', host, '/login/')
+            user.request('POST', host, '/login/', {
+                'email': target.store.owner.username, 'password': options['password'], 'remember_me': 'on',
+            })
+            user.logged_in = True
+        return _page(user, host, path(target, rng))
+    return scenario
+
+
+# (endpoint, weight, scenario); weights follow a storefront-heavy day
+SCENARIOS = [
+    ('shop_home', 20, _storefront(lambda target, rng: '/shop/')),
+    ('shop_products', 12, _storefront(lambda target, rng: '/shop/products/')),
+    ('shop_products_by_category', 10, _storefront(
+        lambda target, rng: f'/shop/products/?category={rng.choice(target.categories)}' if target.categories
+        else '/shop/products/'
+    )),
+    ('shop_search', 5, _storefront(
+        lambda target, rng: f'/shop/products/?{urlencode({"search": rng.choice(SEARCH_TERMS)})}'
+    )),
+    ('shop_product_detail', 25, _storefront(lambda target, rng: f'/shop/product/{rng.choice(target.products)[1]}/')),
+    ('cart_add', 8, cart_add),
+    ('cart_view', 6, _storefront(lambda target, rng: '/cart/')),
+    ('checkout', 2, checkout),
+    ('dashboard', 4, _dashboard(lambda target, rng: '/dashboard/')),
+    ('product_list', 3, _dashboard(lambda target, rng: '/dashboard/products/')),
+    ('order_list', 3, _dashboard(lambda target, rng: '/dashboard/orders/')),
+    ('order_detail', 1, _dashboard(
+        lambda target, rng: f'/dashboard/orders/{rng.choice(target.order_ids)}/' if target.order_ids
+        else '/dashboard/orders/'
+    )),
+    ('customer_list', 1, _dashboard(lambda target, rng: '/dashboard/customers/')),
+]
+
+
+def run_load(stores, base_url, duration=30, concurrency=8, seed=0, password='password', domain=None,
+             scenarios=None):
+    """Drive weighted traffic at the stores for `duration` seconds; returns ({endpoint: stats}, seconds)"""
+    options = {'domain': domain or settings.MAIN_DOMAIN, 'password': password}
+    targets = [Target(store, options['domain']) for store in stores]
+    targets = [target for target in targets if target.products]
+    if not targets:
+        raise ValueError('None of the stores has an active product in stock')
+    scenarios = [scenario for scenario in SCENARIOS if scenarios is None or scenario[0] in scenarios]
+    names, weights, functions = zip(*scenarios)
+    # Zipf-like: the first store gets the most traffic, as a few tenants do in production
+    store_weights = [1 / rank for rank in range(1, len(targets) + 1)]
+
+    results = {name: {'requests': 0, 'errors': 0, 'latencies': []} for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def shopper(number):
+        rng = random.Random(f'{seed}-{number}')
+        user = VirtualUser(base_url)
+        user.owner = targets[number % len(targets)]
+        try:
+            while time.monotonic() < deadline:
+                target = rng.choices(targets, store_weights)[0]
+                index = rng.choices(range(len(names)), weights)[0]
+                ok, elapsed = functions[index](user, target, rng, options)
+                with lock:
+                    stats = results[names[index]]
+                    stats['requests'] += 1
+                    stats['latencies'].append(elapsed)
+                    if not ok:
+                        stats['errors'] += 1
+        finally:
+            user.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=shopper, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.monotonic() - started
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(results, elapsed):
+    """Rows of endpoint, requests, errors, req/s and latency percentiles in milliseconds, plus a total row"""
+    rows = []
+    everything = []
+    for name, stats in results.items():
+        latencies = sorted(stats['latencies'])
+        everything.extend(latencies)
+        if not latencies:
+            continue
+        rows.append(_row(name, latencies, stats['errors'], elapsed))
+    everything.sort()
+    errors = sum(stats['errors'] for stats in results.values())
+    rows.append(_row('total', everything, errors, elapsed))
+    return rows
+
+
+def _row(name, latencies, errors, elapsed):
+    return {
+        'endpoint': name,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
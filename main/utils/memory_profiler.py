@@ -0,0 +1,239 @@
+"""
+Per-request memory instrumentation.
+
+With MEMORY_PROFILING on, MemoryProfilingMiddleware starts tracemalloc and
+measures every request around the view: the peak it allocated on top of
+what the process already held, and the net growth still held afterwards,
+less the response body, which goes to the client rather than staying.
+The top allocation sites come from diffing tracemalloc snapshots taken
+before and after. Each site is named by where the memory was allocated and
+by the innermost frame in our own code that led there, so a queryset shows
+up as the view line that evaluated it, not only as a line inside Django.
+
+Samples are saved as MemoryProfile rows tagged with view, store and the
+store's size (products, customers and orders, cached for an hour).
+memory_report then flags views whose peak grows with tenant size: on a
+log-log fit of peak against size, a slope of MEMORY_SCALING_SLOPE or more
+means the view loads something proportional to the store, typically an
+unpaginated queryset. It also flags views whose requests keep memory.
+
+Tracing slows every allocation and snapshots cost time per request, so
+this is for staging or a single canary worker. tracemalloc sees the whole
+process, so run that worker with one thread.
+"""
+import logging
+import math
+import os
+import statistics
+import sys
+import tracemalloc
+from django.conf import settings
+from django.core.cache import cache
+from ..sharding import store_shard
+from .request_profiler import path_without_token
+
+logger = logging.getLogger('ekhanebd')
+
+TOP_SITES = 10
+TENANT_SIZE_SECONDS = 3600
+# Views need samples from this many stores of different sizes before a trend means anything
+MIN_STORES_FOR_TREND = 3
+
+_PROJECT_ROOT = str(settings.BASE_DIR)
+_IGNORED = (tracemalloc.__file__, __file__)
+
+
+def start_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(settings.MEMORY_TRACE_FRAMES)
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, filename) for filename in _IGNORED
+    ] + [tracemalloc.Filter(False, '<frozen importlib._bootstrap>')])
+
+
+def _short(frame):
+    filename = frame.filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        # Library frames by package path, without the site-packages prefix
+        for marker in ('site-packages' + os.sep, 'dist-packages' + os.sep):
+            if marker in filename:
+                filename = filename.split(marker, 1)[1]
+                break
+    return f'{filename}:{frame.lineno}'
+
+
+def _site(traceback):
+    """'allocation line' or 'allocation line <- our line' for a tracemalloc traceback"""
+    # Frames run from the oldest call to the allocation
+    innermost = traceback[-1]
+    ours = next(
+        (frame for frame in reversed(traceback)
+         if frame.filename.startswith(_PROJECT_ROOT) and 'site-packages' not in frame.filename),
+        None,
+    )
+    if ours is None or ours is innermost:
+        return _short(innermost)
+    return f'{_short(innermost)} <- {_short(ours)}'
+
+
+def top_sites(before, after, limit=TOP_SITES, released=()):
+    """
+    Sites that allocated the most memory between two snapshots, still held
+    at the second, leaving out the objects in released.
+    """
+    sites = {}
+    for stat in after.compare_to(before, 'traceback'):
+        if stat.size_diff <= 0:
+            continue
+        site = _site(stat.traceback)
+        size, count = sites.get(site, (0, 0))
+        sites[site] = (size + stat.size_diff, count + stat.count_diff)
+    for obj in released:
+        traceback = tracemalloc.get_object_traceback(obj)
+        site = _site(traceback) if traceback else None
+        if site in sites:
+            size, count = sites[site]
+            sites[site] = (size - sys.getsizeof(obj), count - 1)
+    sites = {site: (size, count) for site, (size, count) in sites.items() if size > 0}
+    ranked = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    return [{'site': site, 'bytes': size, 'count': count} for site, (size, count) in ranked]
+
+
+def tenant_size(store):
+    """Products, customers and orders of the store, the figure memory use is checked against"""
+    def count():
+        from orders.models import Customer, Order
+        from products.models import Product
+
+        with store_shard(store):
+            return (
+                Product.objects.filter(store=store).count()
+                + Customer.objects.filter(store=store).count()
+                + Order.objects.filter(store=store).count()
+            )
+    return cache.get_or_set(f'tenant_size_{store.pk}', count, TENANT_SIZE_SECONDS)
+
+
+def request_store(request):
+    store = getattr(request, 'store', None)
+    if store is None and request.path.startswith('/dashboard/'):
+        store = getattr(getattr(request, 'user', None), 'store', None)
+    return store
+
+
+def measure_request(request, get_response):
+    """Run the request with memory tracing and record a MemoryProfile; returns the response"""
+    before = _snapshot()
+    baseline, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    response = get_response(request)
+
+    current, peak = tracemalloc.get_traced_memory()
+    after = _snapshot()
+    # The body is still referenced here but leaves with the response; it is not memory the request kept
+    body = [] if response.streaming else [response.content]
+    growth = current - baseline - sum(sys.getsizeof(chunk) for chunk in body)
+    try:
+        save_sample(request, response, peak - baseline, growth, top_sites(before, after, released=body))
+    except Exception:
+        logger.exception('Could not store the memory profile of %s', request.path)
+    return response
+
+
+def save_sample(request, response, peak, growth, sites):
+    from ..models import MemoryProfile
+
+    store = request_store(request)
+    match = request.resolver_match
+    return MemoryProfile.objects.create(
+        store=store,
+        view_name=((match.view_name if match else '') or 'unresolved')[:200],
+        method=request.method,
+        path=path_without_token(request)[:500],
+        status_code=response.status_code,
+        peak_bytes=peak,
+        growth_bytes=growth,
+        tenant_size=tenant_size(store) if store else 0,
+        top_allocations=sites,
+    )
+
+
+def scaling_slope(points):
+    """
+    Slope and correlation of log(peak) on log(tenant size). A slope of 1
+    means peak memory grows in proportion to the store, 0 means it does not.
+    """
+    points = [(size, peak) for size, peak in points if size > 0 and peak > 0]
+    if len({size for size, _peak in points}) < 2:
+        return None, None
+    xs = [math.log(size) for size, _peak in points]
+    ys = [math.log(peak) for _size, peak in points]
+    slope, _intercept = statistics.linear_regression(xs, ys)
+    try:
+        correlation = statistics.correlation(xs, ys)
+    except statistics.StatisticsError:
+        correlation = 0.0
+    return slope, correlation
+
+
+def view_report(samples):
+    """
+    One row per view from (view_name, store_id, tenant_size, peak, growth)
+    tuples, with medians, the size trend and flags, worst first.
+    """
+    by_view = {}
+    for view_name, store_id, size, peak, growth in samples:
+        by_view.setdefault(view_name, []).append((store_id, size, peak, growth))
+
+    rows = []
+    for view_name, view_samples in by_view.items():
+        peaks = sorted(peak for _store, _size, peak, _growth in view_samples)
+        growths = [growth for _store, _size, _peak, growth in view_samples]
+
+        # Median peak per store, so a busy store's many requests count once
+        per_store = {}
+        for store, size, peak, _growth in view_samples:
+            if store:
+                per_store.setdefault(store, (size, []))[1].append(peak)
+        slope = correlation = None
+        if len(per_store) >= MIN_STORES_FOR_TREND:
+            slope, correlation = scaling_slope(
+                [(size, statistics.median(store_peaks)) for size, store_peaks in per_store.values()]
+            )
+
+        flags = []
+        if slope is not None and slope >= settings.MEMORY_SCALING_SLOPE and correlation >= 0.7:
+            flags.append('scales with tenant size')
+        if statistics.median(growths) >= settings.MEMORY_GROWTH_FLAG_BYTES:
+            flags.append('keeps memory after the request')
+
+        rows.append({
+            'view': view_name,
+            'requests': len(view_samples),
+            'stores': len(per_store),
+            'median_peak': statistics.median(peaks),
+            'max_peak': peaks[-1],
+            'median_growth': statistics.median(growths),
+            'slope': slope,
+            'correlation': correlation,
+            'flags': flags,
+        })
+    rows.sort(key=lambda row: (not row['flags'], -row['max_peak']))
+    return rows
+
+
+def view_sites(allocation_lists, limit=TOP_SITES):
+    """Allocation sites summed over many samples' top_allocations, largest first"""
+    sites = {}
+    for allocations in allocation_lists:
+        for allocation in allocations:
+            size, samples = sites.get(allocation['site'], (0, 0))
+            sites[allocation['site']] = (size + allocation['bytes'], samples + 1)
+    ranked = sorted(sites.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    return [(site, size, samples) for site, (size, samples) in ranked]
@@ -0,0 +1,271 @@
+"""
+Cold archive of old orders.
+
+archive_orders() moves a store's delivered and cancelled orders older than
+ORDER_ARCHIVE_AFTER_DAYS out of the database into gzipped JSON lines files,
+one per store and month of creation, under ORDER_ARCHIVE_ROOT:
+
+    store_<id>/2025-03.jsonl.gz   one order per line, with its items and payment
+    store_<id>/index.sqlite3      one summary row per archived order
+
+Each run appends a new gzip member to the month file, which gzip readers
+treat as one stream. Files are synced before the index is written and the
+rows are deleted, so a crash in between at worst archives an order twice;
+the index points at the last copy.
+
+The index is a small SQLite database, so lookups never read the whole of
+it. It serves the customer's order history with the order list's filters,
+and gives load_archived_order() the month file and the offset of the gzip
+member holding the order, so a detail page decompresses only from there to
+the order's line.
+"""
+import gzip
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from decimal import Decimal
+from django.conf import settings
+from orders.models import Order, OrderItem, Payment
+
+ARCHIVE_STATUSES = ('delivered', 'cancelled')
+ARCHIVE_BATCH_SIZE = 500
+
+
+def store_archive_dir(store_id):
+    return os.path.join(settings.ORDER_ARCHIVE_ROOT, f'store_{store_id}')
+
+
+def _index_path(store_id):
+    return os.path.join(store_archive_dir(store_id), 'index.sqlite3')
+
+
+INDEX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY,
+        order_number TEXT NOT NULL,
+        customer_id INTEGER,
+        status TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        payment_status TEXT NOT NULL,
+        total TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        month TEXT NOT NULL,
+        member_offset INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS orders_customer ON orders (customer_id, created_at);
+    CREATE INDEX IF NOT EXISTS orders_created ON orders (created_at);
+"""
+INDEX_COLUMNS = (
+    'id', 'order_number', 'customer_id', 'status', 'payment_method', 'payment_status', 'total', 'created_at',
+    'month', 'member_offset',
+)
+
+
+def _open_index(store_id, create=False):
+    """Connection to the store's archive index, or None if nothing was archived yet"""
+    path = _index_path(store_id)
+    if not create and not os.path.exists(path):
+        return None
+    index = sqlite3.connect(path)
+    index.row_factory = sqlite3.Row
+    if create:
+        index.executescript(INDEX_SCHEMA)
+    return index
+
+
+def _month_path(store_id, month):
+    return os.path.join(store_archive_dir(store_id), f'{month}.jsonl.gz')
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _dump(instance):
+    return {field.attname: _encode(field.value_from_object(instance)) for field in instance._meta.concrete_fields}
+
+
+def _load(model, data):
+    fields = [field for field in model._meta.concrete_fields if field.attname in data]
+    return model.from_db(
+        None,
+        [field.attname for field in fields],
+        [None if data[field.attname] is None else field.to_python(data[field.attname]) for field in fields],
+    )
+
+
+def _utc(moment):
+    """ISO text that sorts and compares in time order: UTC, always with microseconds"""
+    return moment.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _summary(order, member_offset):
+    return (
+        order.id, order.order_number, order.customer_id, order.status, order.payment_method,
+        order.payment_status, str(order.total), _utc(order.created_at), f'{order.created_at:%Y-%m}', member_offset,
+    )
+
+
+def _append(path, lines):
+    """Append lines as a new gzip member; returns the member's offset in the file"""
+    with open(path, 'ab') as raw:
+        offset = raw.tell()
+        with gzip.open(raw, 'wt', encoding='utf-8') as fh:
+            for line in lines:
+                fh.write(json.dumps(line, ensure_ascii=False) + '\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    return offset
+
+
+def archive_orders(store, cutoff):
+    """Move the store's finished orders created before cutoff to the archive; returns how many"""
+    os.makedirs(store_archive_dir(store.id), exist_ok=True)
+    orders = Order.objects.filter(
+        store=store, status__in=ARCHIVE_STATUSES, created_at__lt=cutoff
+    ).order_by('id')
+
+    archived = 0
+    while True:
+        batch = list(orders.select_related('payment').prefetch_related('items')[:ARCHIVE_BATCH_SIZE])
+        if not batch:
+            return archived
+
+        by_month = {}
+        for order in batch:
+            payment = getattr(order, 'payment', None)
+            by_month.setdefault(f'{order.created_at:%Y-%m}', []).append({
+                'order': _dump(order),
+                'items': [_dump(item) for item in order.items.all()],
+                'payment': _dump(payment) if payment else None,
+            })
+        offsets = {month: _append(_month_path(store.id, month), records) for month, records in by_month.items()}
+        index = _open_index(store.id, create=True)
+        with closing(index), index:
+            index.executemany(
+                f'INSERT OR REPLACE INTO orders ({", ".join(INDEX_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(INDEX_COLUMNS))})',
+                [_summary(order, offsets[f'{order.created_at:%Y-%m}']) for order in batch],
+            )
+
+        # Items and payments go with their orders
+        Order.objects.filter(pk__in=[order.pk for order in batch]).delete()
+        archived += len(batch)
+
+
+def _entry(row):
+    entry = dict(row)
+    entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+    entry['total'] = Decimal(entry['total'])
+    return entry
+
+
+def archived_orders(store, customer_id=None, status=None, payment_method=None, start=None, end=None):
+    """
+    Index entries of the store's archived orders, newest first, optionally
+    narrowed to one customer, status and payment method, and to orders
+    created in [start, end).
+    """
+    conditions, params = [], []
+    for column, value in (('customer_id', customer_id), ('status', status), ('payment_method', payment_method)):
+        if value:
+            conditions.append(f'{column} = ?')
+            params.append(value)
+    if start:
+        conditions.append('created_at >= ?')
+        params.append(_utc(start))
+    if end:
+        conditions.append('created_at < ?')
+        params.append(_utc(end))
+
+    index = _open_index(store.id)
+    if index is None:
+        return []
+    where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+    with closing(index):
+        rows = index.execute(f'SELECT * FROM orders {where} ORDER BY created_at DESC', params).fetchall()
+    return [_entry(row) for row in rows]
+
+
+def iter_archived_records(store, month=None):
+    """Raw archive records of the store, oldest month first (or only the given month)"""
+    directory = store_archive_dir(store.id)
+    if month:
+        names = [f'{month}.jsonl.gz']
+    else:
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith('.jsonl.gz'))
+        except FileNotFoundError:
+            return
+
+    for name in names:
+        try:
+            with gzip.open(os.path.join(directory, name), 'rt', encoding='utf-8') as fh:
+                for line in fh:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            continue
+
+
+def load_archived_order(store, order_id):
+    """A read-only Order rebuilt from the archive, with items and payment attached, or None"""
+    index = _open_index(store.id)
+    if index is None:
+        return None
+    with closing(index):
+        entry = index.execute('SELECT month, member_offset FROM orders WHERE id = ?', [order_id]).fetchone()
+    if entry is None:
+        return None
+
+    # Decompress from the gzip member the order was written in, up to its line
+    record = None
+    try:
+        with open(_month_path(store.id, entry['month']), 'rb') as raw:
+            raw.seek(entry['member_offset'])
+            with gzip.open(raw, 'rt', encoding='utf-8') as fh:
+                record = next((line for line in map(json.loads, fh) if line['order']['id'] == order_id), None)
+    except FileNotFoundError:
+        pass
+    if record is None:
+        return None
+
+    order = _load(Order, record['order'])
+    items = OrderItem.objects.none()
+    items._result_cache = [_load(OrderItem, item) for item in record['items']]
+    items._prefetch_done = True
+    order._prefetched_objects_cache = {'items': items}
+    order._state.fields_cache['payment'] = _load(Payment, record['payment']) if record['payment'] else None
+    order.archived = True
+    return order
+
+
+def archived_customer_stats(store):
+    """{customer_id: (order_count, paid_total, first_order_at, last_order_at)} over archived orders"""
+    stats = {}
+    for entry in archived_orders(store):
+        if not entry['customer_id']:
+            continue
+        count, paid, first, last = stats.get(entry['customer_id'], (0, Decimal(0), None, None))
+        created = entry['created_at']
+        stats[entry['customer_id']] = (
+            count + 1,
+            paid + (entry['total'] if entry['payment_status'] == 'paid' else 0),
+            min(first, created) if first else created,
+            max(last, created) if last else created,
+        )
+    return stats
+
+
+def archived_store_ids():
+    """Ids of the stores that have an archive directory"""
+    try:
+        names = os.listdir(settings.ORDER_ARCHIVE_ROOT)
+    except FileNotFoundError:
+        return []
+    return [int(name[6:]) for name in names if name.startswith('store_') and name[6:].isdigit()]
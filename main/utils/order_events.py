@@ -0,0 +1,79 @@
+"""
+Live order events for the dashboard.
+
+New orders and status changes are published to a per-store Redis pub/sub
+channel. The order_events view (served through ekhanebd/asgi.py) subscribes
+to that channel and forwards each message to the browser as a Server-Sent
+Event, so an open order list updates without reloading the page.
+"""
+import json
+import logging
+from django.conf import settings
+from django.urls import reverse
+
+logger = logging.getLogger('ekhanebd')
+
+SSE_HEARTBEAT_SECONDS = 15
+# Streams are closed periodically; EventSource reconnects on its own
+SSE_MAX_SECONDS = 300
+
+
+def order_channel(store_id):
+    return f"ekhanebd:store:{store_id}:orders"
+
+
+def order_payload(order, event):
+    return {
+        'event': event,
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'payment_method': order.payment_method,
+        'payment_status': order.payment_status,
+        'total': str(order.total),
+        'item_count': order.item_count,
+        'customer_name': order.shipping_name,
+        'customer_email': order.shipping_email,
+        'created_at': order.created_at.isoformat(),
+        'url': reverse('order_detail', args=[order.id]),
+    }
+
+
+def publish_order_event(order, event):
+    """Publish 'created' or 'status' for an order; never fails the caller"""
+    from django_redis import get_redis_connection
+
+    try:
+        get_redis_connection('default').publish(
+            order_channel(order.store_id), json.dumps(order_payload(order, event))
+        )
+    except Exception as e:
+        logger.warning(f"Could not publish order event for {order.order_number}: {e}")
+
+
+async def stream_order_events(store_id):
+    """Yield SSE frames for one store until SSE_MAX_SECONDS have passed"""
+    import asyncio
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(settings.REDIS_URL)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(order_channel(store_id))
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SSE_MAX_SECONDS
+    try:
+        yield "retry: 3000\n\n"
+        while loop.time() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_HEARTBEAT_SECONDS)
+            if message is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": ping\n\n"
+                continue
+            data = message['data'].decode() if isinstance(message['data'], bytes) else message['data']
+            yield f"event: order\ndata: {data}\n\n"
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+        await client.aclose()
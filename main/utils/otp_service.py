@@ -1,22 +1,81 @@
+"""
+Signup OTPs, stored in Redis.
+
+Each operation is a single round trip: generation is one MULTI/EXEC
+pipeline, and verification and the resend cooldown are Lua scripts that
+run atomically on the server. The attempt counter is incremented in the
+same script that compares the code, so concurrent submissions can never
+get more than MAX_ATTEMPTS tries.
+
+Only an HMAC of the code is stored, never the code itself.
+"""
+import hashlib
+import hmac
 import pyotp
+from django.conf import settings
 from django.core.cache import cache
-from django.utils import timezone
-from datetime import timedelta
 
 OTP_EXPIRY_SECONDS = 300  # 5 minutes
 MAX_ATTEMPTS = 5
 
+OTP_EXPIRED = -1
+OTP_LOCKED = -2
+OTP_INVALID = 0
+OTP_VALID = 1
+
+# KEYS[1] = otp hash, ARGV[1] = submitted code digest, ARGV[2] = max attempts
+VERIFY_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then return -1 end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts > tonumber(ARGV[2]) then return -2 end
+if code == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+return 0
+"""
+
+# KEYS[1] = cooldown key, ARGV[1] = cooldown seconds; returns seconds left, 0 if allowed
+RESEND_SCRIPT = """
+if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then return 0 end
+local remaining = redis.call('TTL', KEYS[1])
+if remaining < 1 then return 1 end
+return remaining
+"""
+
+_scripts = {}
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _script(source):
+    # register_script() uses EVALSHA and only sends the source again after a NOSCRIPT reply
+    if source not in _scripts:
+        _scripts[source] = _redis().register_script(source)
+    return _scripts[source]
+
+
+def _digest(email, otp):
+    message = f"{email}:{otp}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
 def generate_otp(email):
     """
-    Generate and store OTP with secret for validation.
+    Generate an OTP and store its digest with a fresh attempt counter.
     """
-    secret = pyotp.random_base32()
-    totp = pyotp.TOTP(secret)
-
-    otp = totp.now()
+    otp = pyotp.TOTP(pyotp.random_base32()).now()
 
-    cache.set(f"otp_secret_{email}", secret, timeout=OTP_EXPIRY_SECONDS)
-    cache.set(f"otp_attempts_{email}", 0, timeout=OTP_EXPIRY_SECONDS)
+    key = cache.make_key(f"otp_{email}")
+    pipe = _redis().pipeline(transaction=True)
+    pipe.delete(key)
+    pipe.hset(key, mapping={'code': _digest(email, otp), 'attempts': 0})
+    pipe.expire(key, OTP_EXPIRY_SECONDS)
+    pipe.execute()
 
     return otp
 
@@ -25,35 +84,23 @@ def verify_otp(email, user_otp):
     """
     Verify OTP and enforce attempt limits.
     """
-    secret = cache.get(f"otp_secret_{email}")
-    attempts = cache.get(f"otp_attempts_{email}", 0)
+    result = _script(VERIFY_SCRIPT)(
+        keys=[cache.make_key(f"otp_{email}")],
+        args=[_digest(email, user_otp.strip()), MAX_ATTEMPTS],
+    )
 
-    if not secret:
+    if result == OTP_VALID:
+        return True, "OTP verified successfully"
+    if result == OTP_EXPIRED:
         return False, "OTP expired or not found"
-
-    if attempts >= MAX_ATTEMPTS:
+    if result == OTP_LOCKED:
         return False, "Too many attempts. Try again later"
-
-    totp = pyotp.TOTP(secret)
-    valid = totp.verify(user_otp)
-
-    if valid:
-        # Clear OTP & attempts after success
-        cache.delete(f"otp_secret_{email}")
-        cache.delete(f"otp_attempts_{email}")
-        return True, "OTP verified successfully"
-
-    # Increase failed attempts
-    cache.set(f"otp_attempts_{email}", attempts + 1, timeout=OTP_EXPIRY_SECONDS)
     return False, "Invalid OTP"
 
 
 def can_resend_otp(email, cooldown_seconds=60):
-    last_sent = cache.get(f"otp_last_send_{email}")
-
-    if last_sent and timezone.now() < last_sent + timedelta(seconds=cooldown_seconds):
-        remaining = (last_sent + timedelta(seconds=cooldown_seconds) - timezone.now()).seconds
-        return False, remaining
-
-    cache.set(f"otp_last_send_{email}", timezone.now(), timeout=OTP_EXPIRY_SECONDS)
-    return True, 0
+    remaining = _script(RESEND_SCRIPT)(
+        keys=[cache.make_key(f"otp_last_send_{email}")],
+        args=[cooldown_seconds],
+    )
+    return remaining == 0, remaining
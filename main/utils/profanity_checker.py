@@ -1,7 +1,8 @@
-from better_profanity import profanity
+from functools import cache
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+from .word_matcher import WordMatcher
 
-# load default English
-profanity.load_censor_words()
+PROFANITY = 'profanity'
 
 # extend Bangla slang + local abusive terms
 bangla_words = [
@@ -11,8 +12,27 @@ bangla_words = [
     "motherchod", "beparoa", "pagol", "pagla", "baperbeta"
 ]
 
-profanity.add_censor_words(bangla_words)
+
+def profanity_words():
+    """Default English list shipped with better_profanity plus the Bangla terms"""
+    words = set(read_wordlist(get_complete_path_of_file("profanity_wordlist.txt")))
+    words.update(bangla_words)
+    # Phrases also match when written as one word, e.g. "bull shit" -> "bullshit"
+    words.update(word.replace(" ", "") for word in list(words) if " " in word)
+    return words
+
+
+def add_profanity(matcher):
+    for word in profanity_words():
+        matcher.add(word, PROFANITY)
+    return matcher
+
+
+@cache
+def get_profanity_matcher():
+    """Compiled on first use, then shared for the life of the process"""
+    return add_profanity(WordMatcher()).compile()
 
 
 def has_profanity(text: str) -> bool:
-    return profanity.contains_profanity(text)
+    return PROFANITY in get_profanity_matcher().scan(text)
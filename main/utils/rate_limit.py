@@ -0,0 +1,158 @@
+"""
+Sliding-window rate limits for the auth and validation endpoints.
+
+Each limit is a pair of fixed-window counters in Redis; the previous
+window's count is weighted by how much of it still overlaps the sliding
+window. Checking and counting a hit is one Lua script call.
+
+RateLimitMiddleware applies the per-IP budgets by path, before sessions and
+authentication run, so a throttled bot costs one Redis round trip. The
+@rate_limit decorator applies the per-account budgets (keyed on the
+submitted email), which need the request body.
+"""
+import hashlib
+import logging
+import math
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import render
+
+logger = logging.getLogger('ekhanebd')
+
+# name: methods counted, (limit, window seconds) per IP and per account
+RATE_LIMITS = {
+    'login': {'methods': ('POST',), 'ip': (20, 300), 'account': (10, 900)},
+    'signup': {'methods': ('POST',), 'ip': (10, 3600), 'account': (5, 3600)},
+    'validate': {'methods': ('GET',), 'ip': (60, 60), 'json': True},
+    'verify_otp': {'methods': ('POST',), 'ip': (30, 600), 'account': (10, 600)},
+    'resend_otp': {'methods': ('POST',), 'ip': (10, 600), 'account': (5, 3600), 'json': True},
+}
+
+RATE_LIMITED_PATHS = {
+    '/login/': 'login',
+    '/registration/': 'signup',
+    '/validate/': 'validate',
+    '/verify-otp/': 'verify_otp',
+    '/resend-otp/': 'resend_otp',
+}
+
+# KEYS = current, previous window; ARGV = limit, window ms, ms into current window.
+# Returns 0 if the hit was counted, otherwise milliseconds until it would be allowed.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+
+if previous * (window - elapsed) / window + current < limit then
+    redis.call('INCR', KEYS[1])
+    redis.call('PEXPIRE', KEYS[1], window * 2)
+    return 0
+end
+
+if current >= limit or previous == 0 then
+    return window - elapsed
+end
+-- Time until the weighted share of the previous window drops far enough
+local wait = window * (1 - (limit - current) / previous) - elapsed
+if wait < 1 then return 1 end
+return math.ceil(wait)
+"""
+
+_script = None
+
+
+def _sliding_window():
+    global _script
+    if _script is None:
+        from django_redis import get_redis_connection
+        _script = get_redis_connection('default').register_script(SLIDING_WINDOW_SCRIPT)
+    return _script
+
+
+def client_ip(request):
+    """REMOTE_ADDR, or the address added by our own proxies in X-Forwarded-For"""
+    proxies = settings.RATE_LIMIT_TRUSTED_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-min(proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def hit(name, scope, identifier):
+    """
+    Count one request against RATE_LIMITS[name][scope].
+
+    Returns seconds until a retry would be allowed, or 0 if the request may
+    proceed. Fails open if Redis is unavailable.
+    """
+    limit, window = RATE_LIMITS[name][scope]
+    now_ms = int(time.time() * 1000)
+    window_ms = window * 1000
+    bucket = now_ms // window_ms
+    identifier = hashlib.sha1(identifier.encode()).hexdigest()[:20]
+    prefix = cache.make_key(f'ratelimit:{name}:{scope}:{identifier}')
+
+    try:
+        wait_ms = _sliding_window()(
+            keys=[f'{prefix}:{bucket}', f'{prefix}:{bucket - 1}'],
+            args=[limit, window_ms, now_ms - bucket * window_ms],
+        )
+    except Exception as e:
+        logger.warning(f"Rate limit check for {name} failed: {e}")
+        return 0
+    return math.ceil(wait_ms / 1000)
+
+
+def too_many_requests(request, name, retry_after):
+    message = f"Too many attempts. Please try again in {retry_after} seconds."
+    if RATE_LIMITS[name].get('json'):
+        # validate_field reads "msg", resend_otp_view's callers read "message"
+        response = JsonResponse(
+            {'valid': False, 'success': False, 'msg': message, 'message': message}, status=429
+        )
+    else:
+        response = render(request, 'errors/rate_limited.html', {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def check_request(request, name, scopes):
+    """Apply the given scopes of a budget to a request; returns a 429 response or None"""
+    budget = RATE_LIMITS[name]
+    if request.method not in budget['methods']:
+        return None
+
+    for scope in scopes:
+        if scope not in budget:
+            continue
+        if scope == 'ip':
+            identifier = client_ip(request)
+        else:
+            identifier = (request.POST.get('email') or request.GET.get('email') or '').strip().lower()
+            if not identifier:
+                continue
+
+        retry_after = hit(name, scope, identifier)
+        if retry_after:
+            logger.info(f"Rate limited {name} by {scope} from {client_ip(request)}")
+            return too_many_requests(request, name, retry_after)
+    return None
+
+
+def rate_limit(name, scopes=('account',)):
+    """View decorator applying RATE_LIMITS[name]; pass scopes=('ip', 'account') without the middleware"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = check_request(request, name, scopes)
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
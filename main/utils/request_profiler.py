@@ -0,0 +1,205 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware runs a request under cProfile when it carries a valid
+profiling token, in the X-Profile-Token header or the _profile query
+parameter, or when it falls in the random PROFILE_SAMPLE_RATE. Tokens are
+signed with SECRET_KEY, name a staff user and expire after
+PROFILE_TOKEN_MAX_AGE seconds; staff get one from the request profiles
+page in the admin. That lets them profile any store's storefront, whose
+subdomain never sees their admin session.
+
+Every query on every database alias is timed alongside, giving the SQL
+timeline: when each query started within the request and how long it
+took. The call profile is saved as a pstats file under PROFILE_ROOT and
+the rest as a RequestProfile row keyed by store, view and time, which the
+admin renders. prune_profiles() deletes old ones with their files, run by
+the prune_request_profiles command.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import random
+import time
+import uuid
+from contextlib import ExitStack
+from django.conf import settings
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger('ekhanebd')
+
+TOKEN_HEADER = 'HTTP_X_PROFILE_TOKEN'
+TOKEN_PARAM = '_profile'
+SIGNING_SALT = 'request-profiling'
+
+# Profiles deleted per query by prune_profiles
+PRUNE_BATCH_SIZE = 500
+
+# Longest SQL text kept per query and most queries kept per request
+SQL_MAX_LENGTH = 2000
+TIMELINE_MAX_QUERIES = 1000
+
+
+def make_profile_token(user):
+    return signing.dumps(user.pk, salt=SIGNING_SALT)
+
+
+def token_user_id(token):
+    """The staff user id a token was issued to, or None if it is forged or expired"""
+    try:
+        return signing.loads(token, salt=SIGNING_SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+
+def profile_trigger(request):
+    """'header', 'query' or 'sample' when the request should be profiled, else None"""
+    token, trigger = request.META.get(TOKEN_HEADER), 'header'
+    if not token:
+        token, trigger = request.GET.get(TOKEN_PARAM), 'query'
+    if token:
+        from dokans.models import User
+
+        user_id = token_user_id(token)
+        if user_id is not None and User.objects.filter(pk=user_id, is_active=True, is_staff=True).exists():
+            return trigger
+        return None
+
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate and random.random() < rate:
+        return 'sample'
+    return None
+
+
+def path_without_token(request):
+    """The request's path and query string minus the profiling token, which must not be stored"""
+    query = request.GET.copy()
+    query.pop(TOKEN_PARAM, None)
+    return f'{request.path}?{query.urlencode()}' if query else request.path
+
+
+class SqlTimeline:
+    """execute_wrapper recording start offset, duration and SQL of each query"""
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            if len(self.queries) < TIMELINE_MAX_QUERIES:
+                self.queries.append({
+                    'at_ms': round((start - self.started) * 1000, 2),
+                    'ms': round(elapsed * 1000, 2),
+                    'db': context['connection'].alias,
+                    'sql': sql[:SQL_MAX_LENGTH],
+                    'many': many,
+                })
+
+
+def profile_request(request, get_response, trigger):
+    """Run the request under the profiler and record it; returns the response"""
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    timeline = SqlTimeline(started)
+
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timeline))
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+    duration = time.perf_counter() - started
+
+    try:
+        save_profile(request, response, trigger, profiler, timeline, duration)
+    except Exception:
+        # A profile that cannot be stored must not break the page
+        logger.exception('Could not store the profile of %s', request.path)
+    return response
+
+
+def save_profile(request, response, trigger, profiler, timeline, duration):
+    from ..models import RequestProfile
+
+    store = getattr(request, 'store', None)
+    if store is None and getattr(request, 'user', None) is not None and request.path.startswith('/dashboard/'):
+        store = getattr(request.user, 'store', None)
+    match = request.resolver_match
+    view_name = (match.view_name if match else '') or 'unresolved'
+
+    profiler.create_stats()
+    now = timezone.now()
+    profile = RequestProfile(
+        store=store,
+        view_name=view_name[:200],
+        method=request.method,
+        path=path_without_token(request)[:500],
+        status_code=response.status_code,
+        trigger=trigger,
+        duration_ms=round(duration * 1000, 2),
+        query_count=timeline.count,
+        sql_ms=round(timeline.seconds * 1000, 2),
+        sql_timeline=timeline.queries,
+    )
+    folder = f'store_{store.pk}' if store else 'main'
+    profile.file.save(
+        f'{folder}/{now:%Y%m%d-%H%M%S}-{view_name.replace(":", "-")}-{uuid.uuid4().hex[:8]}.prof',
+        ContentFile(marshal.dumps(profiler.stats)),
+        save=False,
+    )
+    profile.save()
+    return profile
+
+
+def prune_profiles(cutoff):
+    """Delete the profiles recorded before cutoff and their pstats files; returns how many"""
+    from ..models import RequestProfile
+
+    old = RequestProfile.objects.filter(created_at__lt=cutoff).order_by('pk').only('pk', 'file')
+    pruned = 0
+    while True:
+        batch = list(old[:PRUNE_BATCH_SIZE])
+        if not batch:
+            return pruned
+        # Files first: a row left behind by a crash is pruned again, a lost row would orphan its file
+        for profile in batch:
+            if profile.file:
+                profile.file.delete(save=False)
+        RequestProfile.objects.filter(pk__in=[profile.pk for profile in batch]).delete()
+        pruned += len(batch)
+
+
+def profile_report(profile, limit=40, sort='cumulative'):
+    """Text of the profile's top functions, as pstats prints them"""
+    stream = io.StringIO()
+    with profile.file.open('rb') as fh:
+        data = fh.read()
+    stats = pstats.Stats(_LoadedStats(marshal.loads(data)), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class _LoadedStats:
+    """Stand-in profiler object: pstats.Stats accepts anything with create_stats() and .stats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
@@ -0,0 +1,123 @@
+"""
+In-memory registry of taken subdomains.
+
+The registration form validates the subdomain on every change, so
+availability is answered from a per-process set instead of a query. New
+stores are picked up incrementally (by id) every SUBDOMAIN_REFRESH_SECONDS
+and immediately from Store saves in this process; the whole set is reloaded
+every SUBDOMAIN_RELOAD_SECONDS to drop renamed or deleted stores.
+
+The set can only be behind by a refresh interval, i.e. report a name taken
+seconds ago on another worker as available. Signup still checks the
+database, so suggestions are confirmed there before being offered.
+"""
+import random
+import re
+import threading
+import time
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from dokans.models import Store
+from .domain_validator import validate_subdomains
+
+SUBDOMAIN_REFRESH_SECONDS = 30
+SUBDOMAIN_RELOAD_SECONDS = 3600
+SUBDOMAIN_MAX_LENGTH = 50
+
+SUGGESTION_SUFFIXES = ['bd', 'shop', 'store', 'online', 'bazar', 'mart', 'house']
+
+
+class TakenSubdomains:
+    def __init__(self):
+        self.names = set()
+        self.last_id = 0
+        self.refreshed_at = 0
+        self.reloaded_at = 0
+        self.lock = threading.Lock()
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.refreshed_at < SUBDOMAIN_REFRESH_SECONDS:
+            return
+        # One worker thread refreshes; the others keep answering from the current set
+        if not self.lock.acquire(blocking=force):
+            return
+        try:
+            if force or now - self.reloaded_at >= SUBDOMAIN_RELOAD_SECONDS:
+                names, last_id = set(), 0
+                self.reloaded_at = now
+            else:
+                names, last_id = self.names, self.last_id
+
+            rows = Store.objects.filter(id__gt=last_id).values_list('id', 'subdomain')
+            for store_id, subdomain in rows.iterator(chunk_size=5000):
+                names.add(subdomain)
+                last_id = max(last_id, store_id)
+
+            self.names = names
+            self.last_id = last_id
+            self.refreshed_at = now
+        finally:
+            self.lock.release()
+
+    def __contains__(self, subdomain):
+        self.refresh()
+        return subdomain in self.names
+
+    def add(self, subdomain):
+        self.names.add(subdomain)
+
+    def discard(self, subdomain):
+        self.names.discard(subdomain)
+
+
+taken_subdomains = TakenSubdomains()
+
+
+@receiver(post_save, sender=Store)
+def remember_subdomain(sender, instance, **kwargs):
+    taken_subdomains.add(instance.subdomain)
+
+
+@receiver(post_delete, sender=Store)
+def forget_subdomain(sender, instance, **kwargs):
+    taken_subdomains.discard(instance.subdomain)
+
+
+def is_subdomain_taken(subdomain):
+    return subdomain in taken_subdomains
+
+
+def suggestion_candidates(value):
+    """Variations of value in preference order, all within the length limit"""
+    base = re.sub(r'-{2,}', '-', re.sub(r'[^a-z0-9-]', '', value.lower())).strip('-')
+    if not base:
+        return
+
+    for suffix in SUGGESTION_SUFFIXES:
+        for separator in ('', '-'):
+            stem = base[:SUBDOMAIN_MAX_LENGTH - len(separator) - len(suffix)].rstrip('-')
+            yield f'{stem}{separator}{suffix}'
+
+    for number in [*range(1, 10), *random.sample(range(10, 1000), 30)]:
+        suffix = str(number)
+        yield f'{base[:SUBDOMAIN_MAX_LENGTH - len(suffix)].rstrip("-")}{suffix}'
+
+
+def suggest_subdomains(value, limit=4):
+    """
+    Up to `limit` subdomains close to value that pass is_valid_subdomain and
+    are free; the shortlist is confirmed with one query.
+    """
+    candidates = []
+    for candidate in suggestion_candidates(value):
+        if candidate not in candidates and candidate not in taken_subdomains:
+            candidates.append(candidate)
+
+    results = validate_subdomains(candidates)
+    candidates = [candidate for candidate in candidates if results[candidate][0]][:limit * 3]
+
+    taken = set(Store.objects.filter(subdomain__in=candidates).values_list('subdomain', flat=True))
+    for subdomain in taken:
+        taken_subdomains.add(subdomain)
+    return [candidate for candidate in candidates if candidate not in taken][:limit]
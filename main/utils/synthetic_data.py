@@ -0,0 +1,277 @@
+"""
+Synthetic tenant data for local load tests.
+
+generate_store() creates one store with an owner, categories, products with
+images, customers, abandoned carts and a year of orders with items and
+payments. Names, addresses and descriptions mix Bangla and English the way
+real storefronts do.
+
+Everything is drawn from random.Random(f'{seed}-{index}'), so the same seed
+and store index always give the same catalog and order history whatever
+else is generated alongside; only timestamps follow the clock. Rows go in
+with bulk_create on the store's shard. Product images are a small shared
+set of generated JPEGs under MEDIA_ROOT rather than one file per product.
+"""
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from dokans.models import Store, User
+from orders.models import Cart, CartItem, Customer, Order, OrderItem, Payment, normalize_phone
+from products.models import Category, Product, ProductImage
+from ..sharding import store_shard
+
+BATCH_SIZE = 1000
+IMAGE_COUNT = 12
+IMAGE_DIR = 'products/synthetic'
+
+# (English, Bangla) pairs; product and category names use either
+CATEGORIES = [
+    ('Sarees', 'শাড়ি'), ('Panjabi', 'পাঞ্জাবি'), ('Kurti', 'কুর্তি'), ('Groceries', 'মুদি'),
+    ('Tea', 'চা'), ('Honey', 'মধু'), ('Handicrafts', 'হস্তশিল্প'), ('Electronics', 'ইলেকট্রনিক্স'),
+    ('Books', 'বই'), ('Cosmetics', 'প্রসাধনী'), ('Shoes', 'জুতা'), ('Home Decor', 'গৃহসজ্জা'),
+]
+ADJECTIVES = [
+    ('Handloom', 'তাঁতের'), ('Cotton', 'সুতি'), ('Silk', 'রেশমি'), ('Organic', 'জৈব'),
+    ('Premium', 'প্রিমিয়াম'), ('Classic', 'ক্লাসিক'), ('Jamdani', 'জামদানি'), ('Fresh', 'তাজা'),
+    ('Nakshi', 'নকশি'), ('Pure', 'খাঁটি'),
+]
+NOUNS = [
+    ('Saree', 'শাড়ি'), ('Panjabi', 'পাঞ্জাবি'), ('Three Piece', 'থ্রি পিস'), ('Lungi', 'লুঙ্গি'),
+    ('Sundarbans Honey', 'সুন্দরবনের মধু'), ('Sylhet Tea', 'সিলেটের চা'), ('Rajshahi Mango', 'রাজশাহীর আম'),
+    ('Kantha', 'কাঁথা'), ('Jute Bag', 'পাটের ব্যাগ'), ('Clay Pot', 'মাটির হাঁড়ি'),
+    ('Power Bank', 'পাওয়ার ব্যাংক'), ('Earphones', 'ইয়ারফোন'), ('Novel', 'উপন্যাস'),
+    ('Lipstick', 'লিপস্টিক'), ('Sandals', 'স্যান্ডেল'), ('Cushion Cover', 'কুশন কভার'),
+]
+DESCRIPTIONS = [
+    'Made by artisans in Tangail. Colours may vary slightly from the photo.',
+    'দেশি কারিগরদের হাতে তৈরি। ছবির সাথে রঙের সামান্য পার্থক্য হতে পারে।',
+    'Cash on delivery all over Bangladesh. 7 day easy return.',
+    'সারা বাংলাদেশে ক্যাশ অন ডেলিভারি। ৭ দিনের মধ্যে সহজ রিটার্ন।',
+    'Best quality guaranteed, packed fresh for every order.',
+    'শতভাগ মান নিশ্চিত, প্রতিটি অর্ডারে নতুন করে প্যাক করা হয়।',
+]
+FIRST_NAMES = [
+    ('Rahim', 'রহিম'), ('Karim', 'করিম'), ('Fatema', 'ফাতেমা'), ('Ayesha', 'আয়েশা'), ('Nusrat', 'নুসরাত'),
+    ('Tanvir', 'তানভীর'), ('Sabbir', 'সাব্বির'), ('Mitu', 'মিতু'), ('Rafiq', 'রফিক'), ('Shirin', 'শিরিন'),
+]
+LAST_NAMES = [
+    ('Ahmed', 'আহমেদ'), ('Hossain', 'হোসেন'), ('Islam', 'ইসলাম'), ('Rahman', 'রহমান'),
+    ('Chowdhury', 'চৌধুরী'), ('Begum', 'বেগম'), ('Khan', 'খান'), ('Sarker', 'সরকার'),
+]
+DIVISIONS = {
+    'Dhaka': ['Dhaka', 'Gazipur', 'Narayanganj', 'Tangail', 'Faridpur'],
+    'Chattogram': ['Chattogram', "Cox's Bazar", 'Cumilla', 'Feni'],
+    'Rajshahi': ['Rajshahi', 'Bogura', 'Pabna'],
+    'Khulna': ['Khulna', 'Jashore', 'Kushtia'],
+    'Barishal': ['Barishal', 'Patuakhali'],
+    'Sylhet': ['Sylhet', 'Moulvibazar', 'Habiganj'],
+    'Rangpur': ['Rangpur', 'Dinajpur'],
+    'Mymensingh': ['Mymensingh', 'Jamalpur'],
+}
+STREETS = ['Road', 'Lane', 'রোড', 'লেন']
+AREAS = ['Mirpur', 'Dhanmondi', 'Uttara', 'Agrabad', 'Zindabazar', 'মিরপুর', 'ধানমন্ডি', 'উত্তরা']
+
+# Order statuses weighted roughly like a live store: most orders are done
+STATUS_WEIGHTS = [
+    ('delivered', 55), ('shipped', 10), ('processing', 8), ('confirmed', 7),
+    ('pending', 12), ('cancelled', 8),
+]
+
+
+def synthetic_images(seed):
+    """Names of the shared product images, generating any that are missing"""
+    from PIL import Image
+
+    rng = random.Random(f'{seed}-images')
+    names = []
+    for number in range(IMAGE_COUNT):
+        color = tuple(rng.randrange(40, 230) for _ in range(3))
+        name = f'{IMAGE_DIR}/{seed}-{number}.jpg'
+        if not default_storage.exists(name):
+            buffer = io.BytesIO()
+            Image.new('RGB', (600, 600), color).save(buffer, 'JPEG', quality=80)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        names.append(name)
+    return names
+
+
+def _language(rng):
+    """Index into the (English, Bangla) pairs; about one name in three is Bangla"""
+    return 1 if rng.random() < 0.35 else 0
+
+
+def _person(rng):
+    language = _language(rng)
+    return f'{rng.choice(FIRST_NAMES)[language]} {rng.choice(LAST_NAMES)[language]}'
+
+
+def _phone(rng):
+    return f'01{rng.choice("3456789")}{rng.randrange(10 ** 8):08d}'
+
+
+def _timestamps(rng, count, days, now):
+    """count moments over the last `days`, oldest first, denser towards now"""
+    return sorted(now - timedelta(seconds=int(days * 86400 * rng.random() ** 1.5)) for _ in range(count))
+
+
+def _set_created_at(model, rows, stamps):
+    # auto_now_add stamps every row with the insert time; backdate them afterwards
+    for row, stamp in zip(rows, stamps):
+        row.created_at = stamp
+    model.objects.bulk_update(rows, ['created_at'], batch_size=BATCH_SIZE)
+
+
+def generate_store(index, seed=0, prefix='loadshop', products=200, customers=100, orders=500,
+                   carts=50, days=365, password='password', images=None):
+    """Create store number `index` with its catalog, customers, carts and orders; returns the store"""
+    rng = random.Random(f'{seed}-{index}')
+    now = timezone.now()
+    subdomain = f'{prefix}{index}'
+    images = images if images is not None else synthetic_images(seed)
+
+    owner_first, owner_last = rng.choice(FIRST_NAMES)[0], rng.choice(LAST_NAMES)[0]
+    owner = User.objects.create_user(
+        username=f'{subdomain}@example.com', email=f'{subdomain}@example.com', password=password,
+        first_name=owner_first, last_name=owner_last, phone=_phone(rng),
+    )
+    store = Store.objects.create(
+        owner=owner, subdomain=subdomain, status='active',
+        store_name=f'{owner_first} {rng.choice(["Fashion", "Bazar", "Shop", "বাজার", "ঘর"])}',
+    )
+
+    with store_shard(store), transaction.atomic(using=store.db_shard):
+        category_pairs = rng.sample(CATEGORIES, k=min(len(CATEGORIES), max(1, products // 20)))
+        category_list = Category.objects.bulk_create(
+            Category(store=store, name=pair[_language(rng)], slug=slugify(pair[0]), order=number)
+            for number, pair in enumerate(category_pairs)
+        )
+
+        product_list = []
+        for number in range(products):
+            adjective, noun, language = rng.choice(ADJECTIVES), rng.choice(NOUNS), _language(rng)
+            price = Decimal(rng.choice([150, 250, 350, 450, 650, 850, 1200, 1800, 2500, 4500]))
+            product_list.append(Product(
+                store=store,
+                category=rng.choice(category_list),
+                name=f'{adjective[language]} {noun[language]}',
+                slug=f'{slugify(f"{adjective[0]} {noun[0]}")}-{number}',
+                sku=f'SKU-{store.id}-{number:05d}',
+                description='\n\n'.join(rng.sample(DESCRIPTIONS, k=2)),
+                short_description=rng.choice(DESCRIPTIONS),
+                price=price,
+                sale_price=(price * Decimal('0.85')).quantize(Decimal('1')) if rng.random() < 0.2 else None,
+                stock_quantity=rng.choice([0, 2, 5, 12, 25, 40, 80, 150]),
+                is_active=rng.random() < 0.95,
+                is_featured=rng.random() < 0.05,
+            ))
+        product_list = Product.objects.bulk_create(product_list, batch_size=BATCH_SIZE)
+        _set_created_at(Product, product_list, _timestamps(rng, len(product_list), days, now))
+
+        ProductImage.objects.bulk_create(
+            (
+                ProductImage(product=product, image=rng.choice(images), alt_text=product.name,
+                             is_primary=position == 0, order=position)
+                for product in product_list
+                for position in range(rng.choice([0, 1, 1, 2, 3]))
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        customer_list = [
+            Customer(
+                store=store,
+                name=_person(rng),
+                email=f'customer{number}.{subdomain}@example.com',
+                phone=_phone(rng),
+            )
+            for number in range(customers)
+        ]
+        # Repeat customers ship to the same division
+        customer_divisions = [rng.choice(list(DIVISIONS)) for _ in customer_list]
+        customer_list = Customer.objects.bulk_create(customer_list, batch_size=BATCH_SIZE)
+        _set_created_at(Customer, customer_list, _timestamps(rng, len(customer_list), days, now))
+
+        cart_list = Cart.objects.bulk_create(
+            (Cart(store=store, session_key=f'{rng.getrandbits(128):032x}') for _ in range(carts)),
+            batch_size=BATCH_SIZE,
+        )
+        cart_items = []
+        for cart in cart_list:
+            for product in rng.sample(product_list, k=min(len(product_list), rng.randint(1, 4))):
+                cart_items.append(CartItem(cart=cart, product=product, quantity=rng.randint(1, 3),
+                                           price=product.final_price))
+        CartItem.objects.bulk_create(cart_items, batch_size=BATCH_SIZE)
+
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        order_list, order_lines = [], []
+        for number in range(orders if customer_list and product_list else 0):
+            position = rng.randrange(len(customer_list))
+            customer, division = customer_list[position], customer_divisions[position]
+            lines = [
+                (product, rng.randint(1, 3))
+                for product in rng.sample(product_list, k=min(len(product_list), rng.choice([1, 1, 2, 2, 3, 5])))
+            ]
+            subtotal = sum(product.final_price * quantity for product, quantity in lines)
+            shipping = Decimal(60 if division == 'Dhaka' else 120)
+            status = rng.choices(statuses, weights)[0]
+            method = 'cod' if rng.random() < 0.7 else 'bkash'
+            paid = status == 'delivered' or (method == 'bkash' and status != 'cancelled')
+            order_list.append(Order(
+                store=store,
+                customer=customer,
+                order_number=f'SYN-{store.id}-{number:07d}',
+                status=status,
+                payment_method=method,
+                payment_status='paid' if paid else 'pending',
+                subtotal=subtotal,
+                shipping_cost=shipping,
+                total=subtotal + shipping,
+                shipping_name=customer.name,
+                shipping_email=customer.email,
+                shipping_phone=customer.phone,
+                shipping_phone_normalized=normalize_phone(customer.phone),
+                shipping_address=f'House {rng.randint(1, 120)}, {rng.choice(STREETS)} {rng.randint(1, 30)}, '
+                                 f'{rng.choice(AREAS)}',
+                shipping_division=division,
+                shipping_district=rng.choice(DIVISIONS[division]),
+                item_count=len(lines),
+            ))
+            order_lines.append(lines)
+
+        order_list = Order.objects.bulk_create(order_list, batch_size=BATCH_SIZE)
+        order_times = _timestamps(rng, len(order_list), days, now)
+        _set_created_at(Order, order_list, order_times)
+
+        item_list = OrderItem.objects.bulk_create(
+            (
+                OrderItem(order=order, product=product, product_name=product.name, product_sku=product.sku,
+                          quantity=quantity, price=product.final_price, total=product.final_price * quantity)
+                for order, lines in zip(order_list, order_lines)
+                for product, quantity in lines
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        # Order items are partitioned by their order's month
+        item_times = [stamp for stamp, lines in zip(order_times, order_lines) for _line in lines]
+        _set_created_at(OrderItem, item_list, item_times)
+
+        payment_status = {'paid': 'completed', 'pending': 'pending'}
+        Payment.objects.bulk_create(
+            (
+                Payment(order=order, payment_method=order.payment_method, amount=order.total,
+                        status=payment_status[order.payment_status],
+                        bkash_trx_id=f'{rng.getrandbits(40):010X}' if order.payment_method == 'bkash' else '')
+                for order in order_list
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        Customer.objects.filter(store=store).recompute_stats()
+
+    return store
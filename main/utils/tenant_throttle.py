@@ -0,0 +1,210 @@
+"""
+Per-store fair-share throttling for storefront traffic.
+
+Every storefront request takes a token from the store's bucket (refilled at
+STORE_RATE_LIMIT per second up to STORE_BURST) and a slot from its set of
+in-flight requests (at most STORE_MAX_CONCURRENT). Both live in Redis so the
+budget is shared by all app servers, and admission is one Lua call; the slot
+is released after the response.
+
+A store that goes over budget is marked "hot" for a minute. While it is hot,
+successful anonymous GET pages are kept in the cache for a short time and
+rejected requests get that copy instead of a 429 where one exists. A page
+that rendered a CSRF token is never kept, since replaying it would hand one
+shopper's token to everyone else; storefront scripts read the token from the
+csrftoken cookie instead, which ensure_csrf_cookie() gives every visitor.
+
+Admitted and rejected counts are recorded per store per hour.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+logger = logging.getLogger('ekhanebd')
+
+ADMITTED = 0
+ADMITTED_HOT = 1
+RATE_LIMITED = 2
+CONCURRENCY_LIMITED = 3
+
+# In-flight slots older than this belong to crashed workers and are dropped
+SLOT_TIMEOUT_SECONDS = 60
+HOT_SECONDS = 60
+CACHED_PAGE_SECONDS = 30
+STATS_RETENTION_SECONDS = 7 * 86400
+STAT_FIELDS = ('admitted', 'rate_limited', 'concurrency_limited', 'served_cached')
+
+# Waiting room polls are paced by the queue (Retry-After) and touch only Redis, so they do not spend
+# the store's budget: hundreds of queued shoppers would otherwise starve the storefront and themselves
+THROTTLE_EXEMPT_PATHS = ('/checkout/waiting-room/status/',)
+
+# KEYS = token bucket, in-flight zset, hot flag, stats hash
+# ARGV = now, rate, burst, max concurrent, slot timeout, slot id, hot seconds, stats ttl
+ADMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local rejected = nil
+if tokens < 1 then
+    rejected = 'rate_limited'
+else
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[5]))
+    if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then
+        rejected = 'concurrency_limited'
+    end
+end
+
+redis.call('EXPIRE', KEYS[4], ARGV[8])
+if rejected then
+    redis.call('HINCRBY', KEYS[4], rejected, 1)
+    redis.call('SET', KEYS[3], '1', 'EX', ARGV[7])
+    if rejected == 'rate_limited' then return 2 end
+    return 3
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+redis.call('ZADD', KEYS[2], now, ARGV[6])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+redis.call('HINCRBY', KEYS[4], 'admitted', 1)
+if redis.call('EXISTS', KEYS[3]) == 1 then return 1 end
+return 0
+"""
+
+_script = None
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection('default')
+
+
+def _key(store_id, name):
+    return cache.make_key(f'store_throttle:{store_id}:{name}')
+
+
+def _stats_key(store_id, hour):
+    return _key(store_id, f'stats:{hour:%Y%m%d%H}')
+
+
+def admit(store):
+    """
+    Try to admit a storefront request.
+
+    Returns (result, slot); pass slot to release() once the response is built.
+    Fails open if Redis is unavailable.
+    """
+    global _script
+    slot = uuid.uuid4().hex
+    try:
+        if _script is None:
+            _script = _redis().register_script(ADMIT_SCRIPT)
+        result = _script(
+            keys=[
+                _key(store.id, 'bucket'),
+                _key(store.id, 'inflight'),
+                _key(store.id, 'hot'),
+                _stats_key(store.id, datetime.now(dt_timezone.utc)),
+            ],
+            args=[
+                time.time(),
+                settings.STORE_RATE_LIMIT,
+                settings.STORE_BURST,
+                settings.STORE_MAX_CONCURRENT,
+                SLOT_TIMEOUT_SECONDS,
+                slot,
+                HOT_SECONDS,
+                STATS_RETENTION_SECONDS,
+            ],
+        )
+    except Exception as e:
+        logger.warning(f"Store throttle check for {store.subdomain} failed: {e}")
+        return ADMITTED, None
+    return result, slot if result in (ADMITTED, ADMITTED_HOT) else None
+
+
+def release(store, slot):
+    if slot is None:
+        return
+    try:
+        _redis().zrem(_key(store.id, 'inflight'), slot)
+    except Exception as e:
+        logger.warning(f"Could not release store slot for {store.subdomain}: {e}")
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'store_page:{request.store.id}:{path}'
+
+
+def _cacheable(request):
+    # Pages of shoppers with a session show their cart, so only anonymous views are shared
+    return request.method == 'GET' and settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def ensure_csrf_cookie(request):
+    """Have CsrfViewMiddleware set the csrftoken cookie when the visitor has none yet"""
+    if request.method == 'GET' and settings.CSRF_COOKIE_NAME not in request.COOKIES:
+        get_token(request)
+
+
+def remember_page(request, response):
+    """Keep a short-lived copy of a page rendered while the store is hot"""
+    if (
+        _cacheable(request)
+        # get_token() sets this whenever the page used the token, e.g. a {% csrf_token %} form
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and response.get('Content-Type', '').startswith('text/html')
+    ):
+        cache.set(_page_key(request), (response['Content-Type'], response.content), CACHED_PAGE_SECONDS)
+
+
+def cached_page(request):
+    """A recent copy of the requested page, or None"""
+    if not _cacheable(request):
+        return None
+    page = cache.get(_page_key(request))
+    if page is None:
+        return None
+
+    try:
+        _redis().hincrby(_stats_key(request.store.id, datetime.now(dt_timezone.utc)), 'served_cached', 1)
+    except Exception:
+        pass
+    content_type, content = page
+    response = HttpResponse(content, content_type=content_type)
+    response['Cache-Control'] = f'max-age={CACHED_PAGE_SECONDS}'
+    return response
+
+
+def throttle_stats(store_id, hours=24):
+    """List of (hour, {field: count}) for the last `hours` hours, oldest first"""
+    now = datetime.now(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    hour_list = [now - timedelta(hours=offset) for offset in range(hours - 1, -1, -1)]
+
+    pipe = _redis().pipeline(transaction=False)
+    for hour in hour_list:
+        pipe.hgetall(_stats_key(store_id, hour))
+
+    stats = []
+    for hour, values in zip(hour_list, pipe.execute()):
+        counts = {field: 0 for field in STAT_FIELDS}
+        for field, value in values.items():
+            counts[field.decode()] = int(value)
+        stats.append((hour, counts))
+    return stats
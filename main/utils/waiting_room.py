@@ -0,0 +1,174 @@
+"""
+Virtual waiting room in front of checkout.
+
+Stores that turn it on (Store.waiting_room_enabled) only let shoppers into
+checkout at waiting_room_rate per minute. A shopper without a checkout pass
+takes a numbered ticket; the store's "now serving" number advances with time
+at the configured rate, and once it reaches the ticket the shopper gets a
+checkout pass valid for CHECKOUT_PASS_SECONDS. Tickets are signed cookies,
+so waiting costs no session or database writes, and the queue itself is one
+Redis hash per store updated by a Lua script.
+
+A pass is a signed cookie too, holding the ticket, a random nonce and the
+shopper's session key, and the nonce is recorded in Redis until the pass is
+used for an order or expires. Copying the cookie to another client therefore
+does not work, and one admission buys one checkout, so the admission rate
+really limits checkouts.
+
+The waiting page polls the status endpoint as often as poll_interval()
+says, sent back as Retry-After: every few seconds near the front of the
+queue, at most once a minute far back. The polls are exempt from the
+store's request budget, so the waiting shoppers cannot use it all up.
+"""
+import logging
+import secrets
+import time
+from django.core.cache import cache
+
+logger = logging.getLogger('ekhanebd')
+
+CHECKOUT_PASS_SECONDS = 15 * 60
+QUEUE_IDLE_SECONDS = 3600
+SIGNING_SALT = 'waiting-room'
+POLL_MIN_SECONDS = 5
+POLL_MAX_SECONDS = 60
+
+# KEYS[1] = queue hash; ARGV = now, admits per minute, ticket (0 for a new one), idle ttl
+# Returns {ticket, position}; position 0 means admitted.
+QUEUE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local per_second = tonumber(ARGV[2]) / 60
+local state = redis.call('HMGET', KEYS[1], 'tail', 'serving', 'ts')
+local tail = tonumber(state[1]) or 0
+local serving = tonumber(state[2]) or 0
+local ts = tonumber(state[3]) or now
+
+-- Serving never runs ahead of the queue, so idle time is not banked as a burst
+serving = math.min(tail, serving + math.max(0, now - ts) * per_second)
+
+local ticket = tonumber(ARGV[3])
+if ticket == 0 or ticket > tail then
+    tail = tail + 1
+    ticket = tail
+end
+
+redis.call('HSET', KEYS[1], 'tail', tail, 'serving', tostring(serving), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+
+local position = math.ceil(ticket - serving) - 1
+if position < 0 then position = 0 end
+return {ticket, position}
+"""
+
+_script = None
+
+
+def ticket_cookie(store):
+    return f'wr_ticket_{store.id}'
+
+
+def pass_cookie(store):
+    return f'wr_pass_{store.id}'
+
+
+def _pass_key(store, nonce):
+    return f'waiting_room:{store.id}:pass:{nonce}'
+
+
+def _read_pass(request, store):
+    """(ticket, nonce) of the shopper's pass when it was issued to this session, else None"""
+    value = request.get_signed_cookie(
+        pass_cookie(store), default=None, salt=SIGNING_SALT, max_age=CHECKOUT_PASS_SECONDS
+    )
+    try:
+        ticket, nonce, session_key = value.split(':')
+    except (AttributeError, ValueError):
+        return None
+    if not session_key or session_key != request.session.session_key:
+        return None
+    return ticket, nonce
+
+
+def has_checkout_pass(request, store):
+    if not store.waiting_room_enabled:
+        return True
+    checkout_pass = _read_pass(request, store)
+    if checkout_pass is None:
+        return False
+    ticket, nonce = checkout_pass
+    try:
+        return cache.get(_pass_key(store, nonce)) == ticket
+    except Exception as e:
+        # The cookie is signed and bound to the session; honour it while Redis is away
+        logger.warning(f"Checkout pass check for {store.subdomain} failed: {e}")
+        return True
+
+
+def use_checkout_pass(request, store):
+    """Spend the pass on a placed order, so it cannot buy a second one"""
+    checkout_pass = _read_pass(request, store) if store.waiting_room_enabled else None
+    if checkout_pass is None:
+        return
+    try:
+        cache.delete(_pass_key(store, checkout_pass[1]))
+    except Exception as e:
+        logger.warning(f"Could not spend the checkout pass for {store.subdomain}: {e}")
+
+
+def check_in(request, store):
+    """
+    Take or refresh the shopper's place in the queue.
+
+    Returns (ticket, position, wait_seconds). Fails open (position 0) if
+    Redis is unavailable, so a Redis outage never blocks checkout.
+    """
+    global _script
+    try:
+        ticket = int(request.get_signed_cookie(ticket_cookie(store), default=0, salt=SIGNING_SALT))
+    except ValueError:
+        ticket = 0
+
+    try:
+        if _script is None:
+            from django_redis import get_redis_connection
+            _script = get_redis_connection('default').register_script(QUEUE_SCRIPT)
+        ticket, position = _script(
+            keys=[cache.make_key(f'waiting_room:{store.id}')],
+            args=[time.time(), store.waiting_room_rate, ticket, QUEUE_IDLE_SECONDS],
+        )
+    except Exception as e:
+        logger.warning(f"Waiting room check for {store.subdomain} failed: {e}")
+        return ticket, 0, 0
+
+    wait_seconds = int(position * 60 / store.waiting_room_rate)
+    return ticket, position, wait_seconds
+
+
+def poll_interval(wait_seconds):
+    """Seconds until the waiting page should ask again: a quarter of the expected wait, within bounds"""
+    return min(POLL_MAX_SECONDS, max(POLL_MIN_SECONDS, wait_seconds // 4))
+
+
+def update_cookies(request, response, store, ticket, position):
+    """Keep the ticket while waiting; swap it for a checkout pass once admitted"""
+    if position:
+        response.set_signed_cookie(
+            ticket_cookie(store), str(ticket), salt=SIGNING_SALT,
+            max_age=QUEUE_IDLE_SECONDS, httponly=True, samesite='Lax',
+        )
+        return response
+
+    # The pass is bound to the session, so the shopper needs one before it is issued
+    if not request.session.session_key:
+        request.session.create()
+    nonce = secrets.token_urlsafe(16)
+    try:
+        cache.set(_pass_key(store, nonce), str(ticket), CHECKOUT_PASS_SECONDS)
+    except Exception as e:
+        logger.warning(f"Could not record the checkout pass for {store.subdomain}: {e}")
+    response.set_signed_cookie(
+        pass_cookie(store), f'{ticket}:{nonce}:{request.session.session_key}', salt=SIGNING_SALT,
+        max_age=CHECKOUT_PASS_SECONDS, httponly=True, samesite='Lax',
+    )
+    response.delete_cookie(ticket_cookie(store))
+    return response
@@ -0,0 +1,103 @@
+"""
+Aho-Corasick word matcher.
+
+All patterns are compiled once into a single automaton, so checking a text
+is one left-to-right pass over its characters no matter how many words are
+in the list. Text and patterns are folded the same way first: lowercase,
+common leetspeak substitutions (0 -> o, 1 -> i, @ -> a, $ -> s, ...) and any
+other non-alphanumeric character becomes a '-' separator.
+
+Matches only count on whole words: every pattern is stored as -word- and the
+text is scanned as -text-, so "ass" matches "my-ass-shop" but not "classic".
+"""
+from collections import deque
+
+SEPARATOR = '-'
+
+# Digits and symbols only: folding letters (l -> i) would make real words such as 'mall' read as 'mail'
+LEET_FOLD = {
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't',
+    '@': 'a', '$': 's',
+}
+
+
+def fold_char(char):
+    char = char.lower()
+    if char in LEET_FOLD:
+        return LEET_FOLD[char]
+    return char if char.isalnum() else SEPARATOR
+
+
+def fold(text):
+    return ''.join(fold_char(char) for char in text)
+
+
+class WordMatcher:
+    """Matches many whole words (or hyphen/space separated phrases) in one pass"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        # Per state: list of (pattern_length, kind) ending there
+        self.output = [[]]
+        self.compiled = False
+
+    def add(self, word, kind):
+        """Add a word tagged with `kind`; must be called before the first scan"""
+        pattern = f'{SEPARATOR}{fold(word.strip())}{SEPARATOR}'
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append((len(pattern), kind))
+
+    def compile(self):
+        """Fill in failure links breadth first and merge outputs along them"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+        self.compiled = True
+        return self
+
+    def matches(self, text):
+        """
+        Yield (kind, whole) for every word found in text, where whole is True
+        when the word spans the entire text.
+        """
+        if not self.compiled:
+            self.compile()
+
+        goto, fail, output = self.goto, self.fail, self.output
+        padded_length = len(text) + 2
+        state = 0
+        for position, char in enumerate(f'{SEPARATOR}{text}{SEPARATOR}', 1):
+            char = fold_char(char) if position not in (1, padded_length) else SEPARATOR
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, kind in output[state]:
+                yield kind, length == position == padded_length
+
+    def scan(self, text):
+        """Return {kind: whole} for the kinds found in text, preferring whole matches"""
+        found = {}
+        for kind, whole in self.matches(text):
+            found[kind] = found.get(kind, False) or whole
+        return found
+
+    def scan_many(self, texts):
+        return [self.scan(text) for text in texts]
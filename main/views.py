@@ -8,11 +8,19 @@ from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, prefetch_related_objects
+from django.utils import timezone
 from dokans.models import Store
 from .utils.email_service import is_real_email, send_otp_email
 from .utils.domain_validator import is_valid_subdomain
+from .utils.subdomain_registry import is_subdomain_taken, suggest_subdomains
 from .utils.otp_service import generate_otp, verify_otp, can_resend_otp
+from .utils.date_utils import day_start
+from .utils.rate_limit import rate_limit
+from .utils.waiting_room import has_checkout_pass, check_in, poll_interval, update_cookies, use_checkout_pass
+from .sharding import tenant_atomic
+from .utils.order_events import publish_order_event
+from datetime import timedelta
 import re
 import json
 
@@ -56,8 +64,12 @@ def validate_field(request):
         if not valid:
             return JsonResponse({"valid": False, "msg": msg})
 
-        if Store.objects.filter(subdomain=value).exists():
-            return JsonResponse({"valid": False, "msg": "Subdomain already taken"})
+        if is_subdomain_taken(value.lower()):
+            return JsonResponse({
+                "valid": False,
+                "msg": "Subdomain already taken",
+                "suggestions": suggest_subdomains(value),
+            })
 
         return JsonResponse({"valid": True})
 
@@ -76,6 +88,7 @@ def home(request):
     return render(request, 'home.html', context)
 
 
+@rate_limit('signup')
 def signup(request):
     if request.method == "POST":
         # Extract form data
@@ -152,6 +165,7 @@ def signup(request):
     return render(request, 'registration_template.html')
 
 
+@rate_limit('verify_otp')
 def verify_otp_view(request):
     email = request.GET.get('email', '').strip().lower()
 
@@ -215,6 +229,7 @@ def verify_otp_view(request):
     return render(request, 'verify_otp.html', {'email': email})
 
 
+@rate_limit('resend_otp')
 def resend_otp_view(request):
     if request.method == "POST":
         email = request.POST.get('email', '').strip().lower()
@@ -257,6 +272,7 @@ def resend_otp_view(request):
     return JsonResponse({'success': False, 'message': 'Invalid request method'})
 
 
+@rate_limit('login')
 def login_view(request):
     # Redirect if already logged in
     if request.user.is_authenticated:
@@ -319,7 +335,7 @@ def dashboard(request):
     total_products = Product.objects.filter(store=store).count()
     total_customers = 0  # Will be populated when Customer model is created
     recent_orders = []  # Will be populated when Order model is created
-    low_stock_products = [p for p in Product.objects.filter(store=store, track_inventory=True)[:5] if p.is_low_stock]
+    low_stock_products = Product.objects.filter(store=store).low_stock().order_by('stock_quantity')[:5]
 
     context = {
         'store': store,
@@ -348,8 +364,10 @@ def shop_home(request):
     from products.models import Product
 
     # Get products
-    featured_products = Product.objects.filter(store=store, is_active=True, is_featured=True)[:8]
-    all_products = Product.objects.filter(store=store, is_active=True)[:12]
+    featured_products = Product.objects.filter(
+        store=store, is_active=True, is_featured=True
+    ).prefetch_related('images')[:8]
+    all_products = Product.objects.filter(store=store, is_active=True).prefetch_related('images')[:12]
 
     # Get cart count
     cart_count = get_cart_count(request, store)
@@ -376,12 +394,13 @@ def shop_products(request):
     category_slug = request.GET.get('category')
     search = request.GET.get('search', '')
 
-    # Base queryset
-    products = Product.objects.filter(store=store, is_active=True)
+    # Base queryset; cards show the primary image and category of every product
+    products = Product.objects.filter(store=store, is_active=True).select_related('category').prefetch_related('images')
 
     # Apply filters
     if category_slug:
-        products = products.filter(category__slug=category_slug)
+        # Scoping the slug to the store pins one category, so products come in index order
+        products = products.filter(category__store=store, category__slug=category_slug)
 
     if search:
         from django.db.models import Q
@@ -414,12 +433,21 @@ def shop_product_detail(request, slug):
     from products.models import Product
     from django.shortcuts import get_object_or_404
 
-    product = get_object_or_404(Product, store=store, slug=slug, is_active=True)
+    product = get_object_or_404(
+        Product.objects.select_related('category').prefetch_related('images'),
+        store=store, slug=slug, is_active=True,
+    )
+    related_products = []
+    if product.category_id:
+        related_products = Product.objects.filter(
+            store=store, category_id=product.category_id, is_active=True
+        ).exclude(pk=product.pk).prefetch_related('images')[:4]
     cart_count = get_cart_count(request, store)
 
     context = {
         'store': store,
         'product': product,
+        'related_products': related_products,
         'cart_count': cart_count,
     }
     return render(request, 'shop/product_detail.html', context)
@@ -567,6 +595,8 @@ def cart_view(request):
         return redirect('/')
 
     cart = get_or_create_cart(request, store)
+    # Items, totals and images all read from one prefetch
+    prefetch_related_objects([cart], 'items__product__images')
 
     context = {
         'store': store,
@@ -677,6 +707,10 @@ def checkout(request):
     if not store:
         return redirect('/')
 
+    # During sales shoppers queue in the waiting room until they hold a checkout pass
+    if not has_checkout_pass(request, store):
+        return redirect('waiting_room')
+
     cart = get_or_create_cart(request, store)
 
     if cart.total_items == 0:
@@ -686,6 +720,7 @@ def checkout(request):
     if request.method == 'POST':
         return process_checkout(request, store, cart)
 
+    prefetch_related_objects([cart], 'items__product')
     context = {
         'store': store,
         'cart': cart,
@@ -694,7 +729,46 @@ def checkout(request):
     return render(request, 'shop/checkout.html', context)
 
 
-@transaction.atomic
+def waiting_room(request):
+    """Queue page shown before checkout while the store's waiting room is on"""
+    store = request.store
+    if not store:
+        return redirect('/')
+    if has_checkout_pass(request, store):
+        return redirect('checkout')
+
+    ticket, position, wait_seconds = check_in(request, store)
+    if not position:
+        response = redirect('checkout')
+    else:
+        response = render(request, 'shop/waiting_room.html', {
+            'store': store,
+            'cart_count': get_cart_count(request, store),
+            'position': position,
+            'wait_minutes': wait_seconds // 60 + 1,
+            'retry_after': poll_interval(wait_seconds),
+        })
+    return update_cookies(request, response, store, ticket, position)
+
+
+def waiting_room_status(request):
+    """Polled by the waiting room page; admits the shopper once their turn comes"""
+    store = request.store
+    if not store:
+        return JsonResponse({'admitted': False}, status=404)
+    if has_checkout_pass(request, store):
+        return JsonResponse({'admitted': True, 'position': 0, 'wait_seconds': 0})
+
+    ticket, position, wait_seconds = check_in(request, store)
+    retry_after = poll_interval(wait_seconds)
+    response = JsonResponse({
+        'admitted': not position, 'position': position, 'wait_seconds': wait_seconds, 'retry_after': retry_after,
+    })
+    response['Retry-After'] = str(retry_after)
+    return update_cookies(request, response, store, ticket, position)
+
+
+@tenant_atomic
 def process_checkout(request, store, cart):
     """Process checkout and create order (with transaction and stock locking)"""
     from orders.models import Customer, Order, OrderItem, Payment
@@ -759,8 +833,10 @@ def process_checkout(request, store, cart):
         shipping_division=division,
         shipping_district=district,
         shipping_area=area,
-        notes=notes
+        notes=notes,
+        item_count=len(cart_items)
     )
+    customer.record_order(order)
 
     # Create order items and reduce stock atomically
     for cart_item in cart_items:
@@ -777,7 +853,8 @@ def process_checkout(request, store, cart):
         # Reduce stock using F() expression to prevent race conditions
         if cart_item.product.track_inventory:
             Product.objects.filter(id=cart_item.product.id).update(
-                stock_quantity=F('stock_quantity') - cart_item.quantity
+                stock_quantity=F('stock_quantity') - cart_item.quantity,
+                updated_at=timezone.now(),
             )
 
     # Create payment record
@@ -791,6 +868,12 @@ def process_checkout(request, store, cart):
     # Clear cart
     cart.clear()
 
+    # One admission from the waiting room buys one order
+    transaction.on_commit(lambda: use_checkout_pass(request, store), using=store.db_shard)
+
+    # Push the new order to open dashboards once it is committed
+    transaction.on_commit(lambda: publish_order_event(order, 'created'), using=store.db_shard)
+
     # Handle payment method
     if payment_method == 'cod':
         # COD - order is confirmed, payment pending
@@ -798,7 +881,7 @@ def process_checkout(request, store, cart):
         order.save()
 
         # Send order confirmation email (outside transaction to avoid delays)
-        transaction.on_commit(lambda: send_order_confirmation_email(order, store))
+        transaction.on_commit(lambda: send_order_confirmation_email(order, store), using=store.db_shard)
 
         return redirect('order_confirmation', order_number=order.order_number)
     elif payment_method == 'bkash':
@@ -808,7 +891,7 @@ def process_checkout(request, store, cart):
         order.save()
 
         # Send order confirmation email (outside transaction to avoid delays)
-        transaction.on_commit(lambda: send_order_confirmation_email(order, store))
+        transaction.on_commit(lambda: send_order_confirmation_email(order, store), using=store.db_shard)
 
         return redirect('order_confirmation', order_number=order.order_number)
 
@@ -838,60 +921,131 @@ def order_confirmation(request, order_number):
 # ORDER MANAGEMENT VIEWS (Store Owner Dashboard)
 # ============================================================================
 
+ORDERS_PER_PAGE = 25
+PHONE_SEARCH_PATTERN = r"^[\d\s+-]+$"
+
+
 @login_required
 def order_list(request):
     """Order listing for store owners"""
     store = request.user.store
-    from orders.models import Order
+    from orders.models import Order, normalize_phone
+    from django.core.paginator import Paginator
+    from django.db.models import Sum, Count, Q
+    from .utils.order_archive import archived_orders
 
     # Get filters
     status = request.GET.get('status', '')
-    search = request.GET.get('search', '')
+    payment_method = request.GET.get('payment_method', '')
+    customer_id = request.GET.get('customer', '')
+    date_from = request.GET.get('date_from', '')
+    date_to = request.GET.get('date_to', '')
+    search = request.GET.get('search', '').strip()
 
     # Base queryset
-    orders = Order.objects.filter(store=store).select_related('customer').prefetch_related('items')
+    orders = Order.objects.filter(store=store).select_related('customer')
 
     # Apply filters
     if status:
         orders = orders.filter(status=status)
 
-    if search:
-        from django.db.models import Q
-        orders = orders.filter(
-            Q(order_number__icontains=search) |
-            Q(customer__name__icontains=search) |
-            Q(customer__email__icontains=search) |
-            Q(shipping_phone__icontains=search)
+    if payment_method:
+        orders = orders.filter(payment_method=payment_method)
+
+    if customer_id.isdigit():
+        orders = orders.filter(customer_id=customer_id)
+
+    # Compare against day boundaries rather than created_at__date so the index is usable
+    start = day_start(date_from)
+    if start:
+        orders = orders.filter(created_at__gte=start)
+
+    end = day_start(date_to)
+    if end:
+        end += timedelta(days=1)
+        orders = orders.filter(created_at__lt=end)
+
+    archived = []
+    if customer_id.isdigit():
+        # A customer's history includes orders already moved to the archive
+        archived = archived_orders(
+            store, customer_id=int(customer_id), status=status, payment_method=payment_method, start=start, end=end,
         )
 
-    # Statistics
-    from django.db.models import Sum, Count
-    total_orders = Order.objects.filter(store=store).count()
-    pending_orders = Order.objects.filter(store=store, status='pending').count()
-    total_revenue = Order.objects.filter(store=store, payment_status='paid').aggregate(Sum('total'))['total__sum'] or 0
+    if search:
+        # Prefix matches only, so both lookups can use the (store, ...) pattern indexes
+        if re.match(PHONE_SEARCH_PATTERN, search):
+            orders = orders.filter(shipping_phone_normalized__startswith=normalize_phone(search))
+        else:
+            orders = orders.filter(order_number__startswith=search.upper())
+
+    paginator = Paginator(orders, ORDERS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    # Statistics (single aggregate query)
+    stats = Order.objects.filter(store=store).aggregate(
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        total_revenue=Sum('total', filter=Q(payment_status='paid')),
+    )
 
     context = {
         'store': store,
-        'orders': orders,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'total_revenue': total_revenue,
+        'orders': page_obj,
+        'page_obj': page_obj,
+        'total_orders': stats['total_orders'],
+        'pending_orders': stats['pending_orders'],
+        'total_revenue': stats['total_revenue'] or 0,
+        'status_choices': Order.STATUS_CHOICES,
+        'payment_method_choices': Order.PAYMENT_METHOD_CHOICES,
         'selected_status': status,
+        'selected_payment_method': payment_method,
+        'selected_customer': customer_id,
+        'archived_orders': archived,
+        'date_from': date_from,
+        'date_to': date_to,
         'search': search,
+        # New orders are only inserted live into the unfiltered first page
+        'live_feed': page_obj.number == 1 and not any([status, payment_method, customer_id, date_from, date_to, search]),
     }
     return render(request, 'dashboard/orders/list.html', context)
 
 
+@login_required
+async def order_events(request):
+    """Server-Sent Events feed of new orders and status changes for the owner's store"""
+    from django.http import HttpResponse, StreamingHttpResponse
+    from .utils.order_events import stream_order_events
+
+    # Only ASGI can hold the stream open without tying up a worker; 204 tells EventSource to stop
+    if not hasattr(request, 'scope'):
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    store = await Store.objects.aget(owner=user)
+
+    response = StreamingHttpResponse(stream_order_events(store.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable nginx response buffering
+    return response
+
+
 @login_required
 def order_detail(request, order_id):
     """Order detail view for store owners"""
     store = request.user.store
     from orders.models import Order
-    from django.shortcuts import get_object_or_404
+    from django.http import Http404
+    from .utils.order_archive import load_archived_order
 
-    order = get_object_or_404(Order, id=order_id, store=store)
+    order = Order.objects.filter(id=order_id, store=store).first()
+    if order is None:
+        # Old finished orders are read back from the archive
+        order = load_archived_order(store, order_id)
+        if order is None:
+            raise Http404("No Order matches the given query.")
 
-    if request.method == 'POST':
+    if request.method == 'POST' and not getattr(order, 'archived', False):
         # Update order status
         new_status = request.POST.get('status')
         if new_status in dict(Order.STATUS_CHOICES):
@@ -902,6 +1056,7 @@ def order_detail(request, order_id):
             # Send email notification if status changed
             if old_status != new_status:
                 send_order_status_update_email(order, store, new_status)
+                publish_order_event(order, 'status')
 
             messages.success(request, f'Order status updated to {order.get_status_display()}')
             return redirect('order_detail', order_id=order.id)
@@ -913,21 +1068,140 @@ def order_detail(request, order_id):
     return render(request, 'dashboard/orders/detail.html', context)
 
 
+CUSTOMERS_PER_PAGE = 25
+CUSTOMER_SORTS = {
+    'recent': '-created_at',
+    'orders': '-order_count',
+    'value': '-lifetime_value',
+    'last_order': '-last_order_at',
+}
+
+
 @login_required
 def customer_list(request):
     """Customer listing for store owners"""
     store = request.user.store
     from orders.models import Customer
+    from django.core.paginator import Paginator
+    from django.db.models import Q
+
+    search = request.GET.get('search', '').strip()
+    sort = request.GET.get('sort', 'recent')
+    if sort not in CUSTOMER_SORTS:
+        sort = 'recent'
+
+    customers = Customer.objects.filter(store=store)
+
+    if search:
+        customers = customers.filter(
+            Q(name__istartswith=search) |
+            Q(email__istartswith=search) |
+            Q(phone__startswith=search)
+        )
 
-    customers = Customer.objects.filter(store=store).order_by('-created_at')
+    # Nulls last so customers without orders don't head the "last order" sort
+    order_field = CUSTOMER_SORTS[sort]
+    if sort == 'last_order':
+        customers = customers.order_by(F(order_field[1:]).desc(nulls_last=True), '-id')
+    else:
+        customers = customers.order_by(order_field, '-id')
+
+    paginator = Paginator(customers, CUSTOMERS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    new_customers_count = Customer.objects.filter(store=store, created_at__gte=month_start).count()
 
     context = {
         'store': store,
-        'customers': customers,
+        'customers': page_obj,
+        'page_obj': page_obj,
+        'search': search,
+        'selected_sort': sort,
+        'new_customers_count': new_customers_count,
     }
     return render(request, 'dashboard/customers/list.html', context)
 
 
+@login_required
+def export_data(request, kind):
+    """Stream a CSV export, or queue it as an ExportJob when it is too large"""
+    store = request.user.store
+    from django.http import Http404, StreamingHttpResponse
+    from .models import ExportJob
+    from .utils.export_service import EXPORTS, export_queryset, export_filename, iter_csv
+
+    if kind not in EXPORTS:
+        raise Http404("Unknown export")
+
+    filters = {}
+    for key in ('date_from', 'date_to', 'status'):
+        value = request.GET.get(key, '').strip()
+        if value:
+            filters[key] = value
+
+    header, rows = export_queryset(kind, store, filters)
+
+    if rows.count() > settings.EXPORT_STREAM_MAX_ROWS:
+        ExportJob.objects.create(store=store, kind=kind, filters=filters)
+        messages.info(request, 'This export is large, so it is being prepared in the background. '
+                               'Download it here once it is ready.')
+        return redirect('export_jobs')
+
+    response = StreamingHttpResponse(iter_csv(header, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(store, kind, filters)}"'
+    return response
+
+
+@login_required
+def export_jobs(request):
+    """Background exports for the store"""
+    store = request.user.store
+    from .models import ExportJob
+
+    context = {
+        'store': store,
+        'jobs': ExportJob.objects.filter(store=store)[:20],
+    }
+    return render(request, 'dashboard/exports/list.html', context)
+
+
+@login_required
+def export_download(request, job_id):
+    """Download a finished background export"""
+    store = request.user.store
+    from .models import ExportJob
+    from django.http import FileResponse
+    from django.shortcuts import get_object_or_404
+    import os
+
+    job = get_object_or_404(ExportJob, id=job_id, store=store, status='done')
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name))
+
+
+@login_required
+def analytics(request):
+    """Sales analytics, computed from the store's latest columnar snapshot"""
+    store = request.user.store
+    from .utils import analytics as reports
+
+    snapshot = reports.load_snapshot(store)
+
+    context = {'store': store, 'snapshot_ready': snapshot is not None}
+    if snapshot is not None:
+        daily = reports.revenue_by_day(snapshot, days=30)
+        best_day = max(revenue for _date, _count, revenue in daily)
+        context.update({
+            'summary': reports.summary(snapshot),
+            'daily': [
+                (date, count, revenue, revenue / best_day * 100 if best_day else 0)
+                for date, count, revenue in daily
+            ],
+            'top_products': reports.top_products(snapshot, limit=10),
+        })
+    return render(request, 'dashboard/analytics.html', context)
+
+
 @login_required
 def store_settings(request):
     """Store settings page"""
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from main.utils.admin_tools import LargeTableAdminMixin, StoreAutocompleteFilter
 from .models import Customer, Cart, CartItem, Order, OrderItem, Payment
 
 
@@ -10,17 +11,22 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'phone', 'store', 'total_orders', 'total_spent', 'created_at')
-    list_filter = ('store', 'created_at')
+class CustomerAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'email', 'phone', 'store', 'order_count', 'lifetime_value', 'last_order_at', 'created_at')
+    list_filter = (StoreAutocompleteFilter, 'created_at')
+    list_select_related = ('store',)
+    autocomplete_fields = ('store',)
     search_fields = ('name', 'email', 'phone', 'store__store_name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('order_count', 'lifetime_value', 'first_order_at', 'last_order_at', 'created_at', 'updated_at')
     ordering = ('-created_at',)
 
     fieldsets = (
         ('Customer Information', {
             'fields': ('store', 'name', 'email', 'phone')
         }),
+        ('Order History', {
+            'fields': ('order_count', 'lifetime_value', 'first_order_at', 'last_order_at')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at')
         }),
@@ -28,28 +34,47 @@ class CustomerAdmin(admin.ModelAdmin):
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'store', 'customer', 'total_items', 'subtotal', 'created_at', 'updated_at')
-    list_filter = ('store', 'created_at')
+    list_filter = (StoreAutocompleteFilter, 'created_at')
+    list_select_related = ('store', 'customer__store')
     search_fields = ('customer__name', 'customer__email', 'session_key')
     readonly_fields = ('created_at', 'updated_at')
+    autocomplete_fields = ('store', 'customer')
     ordering = ('-updated_at',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    @admin.display(description='Total items', ordering='item_quantity')
+    def total_items(self, obj):
+        return obj.item_quantity
+
+    @admin.display(description='Subtotal', ordering='item_subtotal')
+    def subtotal(self, obj):
+        return obj.item_subtotal
+
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('cart', 'product', 'quantity', 'price', 'total', 'created_at')
     list_filter = ('created_at',)
+    list_select_related = ('cart__customer', 'product__store')
+    autocomplete_fields = ('cart', 'product')
     search_fields = ('product__name', 'cart__customer__name')
     readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('order_number', 'store', 'customer', 'status', 'payment_method', 'payment_status', 'total', 'created_at')
-    list_filter = ('status', 'payment_status', 'payment_method', 'store', 'created_at')
+    list_filter = ('status', 'payment_status', 'payment_method', StoreAutocompleteFilter, 'created_at')
+    list_select_related = ('store', 'customer__store')
+    autocomplete_fields = ('store', 'customer')
     search_fields = ('order_number', 'customer__name', 'customer__email', 'shipping_phone')
-    readonly_fields = ('order_number', 'created_at', 'updated_at')
+    # Payment state changes go through Payment.mark_as_completed/mark_as_failed, which keep
+    # Customer.lifetime_value in step; editing it here would bypass them
+    readonly_fields = ('order_number', 'payment_status', 'created_at', 'updated_at')
     inlines = [OrderItemInline]
     ordering = ('-created_at',)
 
@@ -75,19 +100,24 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('order', 'product_name', 'quantity', 'price', 'total')
     list_filter = ('order__created_at',)
+    list_select_related = ('order__customer',)
+    autocomplete_fields = ('order', 'product')
     search_fields = ('product_name', 'product_sku', 'order__order_number')
     readonly_fields = ('total',)
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('order', 'payment_method', 'amount', 'status', 'transaction_id', 'created_at')
     list_filter = ('payment_method', 'status', 'created_at')
+    list_select_related = ('order__customer',)
+    autocomplete_fields = ('order',)
     search_fields = ('order__order_number', 'transaction_id', 'bkash_payment_id', 'bkash_trx_id')
-    readonly_fields = ('created_at', 'updated_at')
+    # Set by mark_as_completed/mark_as_failed only, see OrderAdmin
+    readonly_fields = ('status', 'created_at', 'updated_at')
     ordering = ('-created_at',)
 
     fieldsets = (
@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from dokans.models import Store
+from main.sharding import store_shard
+from main.utils.order_archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Move delivered and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS out of the database "
+        "into compressed files under ORDER_ARCHIVE_ROOT (run from cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', help='Only archive orders of the store with this subdomain')
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help=f'Archive orders older than this many days (default {settings.ORDER_ARCHIVE_AFTER_DAYS})')
+
+    def handle(self, *args, **options):
+        stores = Store.objects.all()
+
+        if options['store']:
+            stores = Store.objects.filter(subdomain=options['store'])
+            if not stores.exists():
+                raise CommandError(f"Store '{options['store']}' does not exist")
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        total = 0
+        for store in stores.iterator():
+            with store_shard(store):
+                archived = archive_orders(store, cutoff)
+            if archived:
+                self.stdout.write(f'{store.subdomain}: archived {archived} order(s)')
+            total += archived
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} order(s) created before {cutoff:%Y-%m-%d}'))
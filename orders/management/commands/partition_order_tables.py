@@ -0,0 +1,231 @@
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from main.sharding import shard_aliases
+from orders.models import Order, OrderItem
+
+# Range partitioned by month of created_at. Payments stay one plain table: their
+# one-to-one key on order_id has to be unique across all months.
+PARTITIONED_MODELS = [Order, OrderItem]
+PARTITION_KEY = 'created_at'
+
+# A partitioned table can only enforce unique keys that include the partition key.
+# Order ids and numbers must stay unique across months (Order.order_number is
+# unique=True and order_confirmation looks orders up by it), so a trigger keeps
+# both in this plain table, whose unique keys reject a duplicate in any partition.
+ORDER_KEY_TABLE = 'orders_order_key'
+ORDER_KEY_SQL = [
+    f'CREATE TABLE {ORDER_KEY_TABLE} (order_number varchar(20) PRIMARY KEY, order_id bigint NOT NULL UNIQUE)',
+    f'INSERT INTO {ORDER_KEY_TABLE} (order_number, order_id) SELECT order_number, id FROM orders_order',
+    f"""
+    CREATE FUNCTION {ORDER_KEY_TABLE}_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM {ORDER_KEY_TABLE} WHERE order_id = OLD.id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO {ORDER_KEY_TABLE} (order_number, order_id) VALUES (NEW.order_number, NEW.id);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    f'CREATE TRIGGER {ORDER_KEY_TABLE}_sync AFTER INSERT OR DELETE OR UPDATE OF id, order_number '
+    f'ON orders_order FOR EACH ROW EXECUTE FUNCTION {ORDER_KEY_TABLE}_sync()',
+]
+
+# Fills the partition key of rows created before it existed
+BACKFILL_SQL = {
+    OrderItem: (
+        'UPDATE orders_orderitem SET created_at = orders_order.created_at FROM orders_order '
+        'WHERE orders_order.id = orders_orderitem.order_id AND orders_orderitem.created_at IS NULL'
+    ),
+}
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(value):
+    return month_start(month_start(value) + timedelta(days=32))
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the order and order item tables partitioned by month on PostgreSQL: create upcoming "
+        "partitions and drop emptied ones (run monthly from cron). --convert turns existing plain "
+        "tables into partitioned ones once, during a maintenance window."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='Only this database alias (default: every shard)')
+        parser.add_argument('--ahead', type=int, default=3, help='Months of partitions to create ahead (default 3)')
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild plain tables as partitioned tables, copying their rows (locks the tables)')
+        parser.add_argument('--drop-empty', action='store_true',
+                            help='Drop empty partitions older than ORDER_ARCHIVE_AFTER_DAYS')
+
+    def handle(self, *args, **options):
+        aliases = [options['database']] if options['database'] else shard_aliases()
+
+        for alias in aliases:
+            connection = connections[alias]
+            if connection.vendor != 'postgresql':
+                raise CommandError(f"'{alias}' is not a PostgreSQL database; partitioning needs PostgreSQL")
+
+            for model in PARTITIONED_MODELS:
+                table = model._meta.db_table
+                if not self.is_partitioned(connection, table):
+                    if not options['convert']:
+                        self.stdout.write(f'{alias}.{table}: not partitioned, run with --convert')
+                        continue
+                    self.convert(connection, model, options['ahead'])
+
+                created = self.create_partitions(connection, table, options['ahead'])
+                self.stdout.write(f'{alias}.{table}: {created} new partition(s)')
+
+                if options['drop_empty']:
+                    dropped = self.drop_empty_partitions(connection, table)
+                    self.stdout.write(f'{alias}.{table}: dropped {dropped} empty partition(s)')
+
+        self.stdout.write(self.style.SUCCESS('Order partitions up to date'))
+
+    def is_partitioned(self, connection, table):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+            row = cursor.fetchone()
+        return row is not None and row[0] == 'p'
+
+    def create_partitions(self, connection, table, ahead, since=None):
+        """Monthly partitions from since (default: this month) to `ahead` months out"""
+        quote = connection.ops.quote_name
+        month = month_start(since or timezone.now())
+        last = month_start(timezone.now())
+        for _ in range(ahead):
+            last = next_month(last)
+
+        created = 0
+        with connection.cursor() as cursor:
+            while month <= last:
+                name = partition_name(table, month)
+                cursor.execute("SELECT to_regclass(%s)", [name])
+                if cursor.fetchone()[0] is None:
+                    cursor.execute(
+                        f'CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)',
+                        [month, next_month(month)],
+                    )
+                    created += 1
+                month = next_month(month)
+        return created
+
+    def drop_empty_partitions(self, connection, table):
+        quote = connection.ops.quote_name
+        cutoff = timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+        pattern = re.compile(rf'^{re.escape(table)}_p(\d{{4}})_(\d{{2}})$')
+
+        dropped = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass(%s)",
+                [table],
+            )
+            for (name,) in cursor.fetchall():
+                match = pattern.match(name)
+                if not match:
+                    continue
+                month = datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)
+                if next_month(month) > cutoff:
+                    continue
+                cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote(name)})')
+                if not cursor.fetchone()[0]:
+                    cursor.execute(f'DROP TABLE {quote(name)}')
+                    dropped += 1
+        return dropped
+
+    def convert(self, connection, model, ahead):
+        """Swap a plain table for a partitioned copy with the same columns, rows, indexes and foreign keys"""
+        quote = connection.ops.quote_name
+        table = model._meta.db_table
+        old_table = f'{table}_unpartitioned'
+        pk_column = model._meta.pk.column
+        sequence = f'{table}_{pk_column}_seq'
+
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE')
+
+            if model in BACKFILL_SQL:
+                cursor.execute(
+                    f'ALTER TABLE {quote(table)} ADD COLUMN IF NOT EXISTS {quote(PARTITION_KEY)} '
+                    f'timestamp with time zone'
+                )
+                cursor.execute(BACKFILL_SQL[model])
+                cursor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN {quote(PARTITION_KEY)} SET NOT NULL')
+
+            # Index and foreign key definitions to recreate once the old table is gone
+            cursor.execute(
+                "SELECT indexname, indexdef FROM pg_indexes "
+                "WHERE schemaname = current_schema() AND tablename = %s",
+                [table],
+            )
+            indexes = cursor.fetchall()
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(con.oid) FROM pg_constraint con "
+                "JOIN pg_class target ON target.oid = con.confrelid "
+                "WHERE con.conrelid = to_regclass(%s) AND con.contype = 'f' AND target.relkind <> 'p'",
+                [table],
+            )
+            foreign_keys = cursor.fetchall()
+            cursor.execute(f'SELECT min({quote(PARTITION_KEY)}) FROM {quote(table)}')
+            oldest = cursor.fetchone()[0]
+
+            cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}')
+            # Frees the identity sequence's name; the new table gets a plain owned sequence
+            cursor.execute(f'ALTER TABLE {quote(old_table)} ALTER COLUMN {quote(pk_column)} DROP IDENTITY IF EXISTS')
+            cursor.execute(
+                f'CREATE TABLE {quote(table)} (LIKE {quote(old_table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+                f'PARTITION BY RANGE ({quote(PARTITION_KEY)})'
+            )
+            cursor.execute(f'CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.{quote(pk_column)}')
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk_column)} SET DEFAULT nextval('{sequence}')"
+            )
+
+            self.create_partitions(connection, table, ahead, since=oldest)
+            cursor.execute(f'CREATE TABLE {quote(table + "_pdefault")} PARTITION OF {quote(table)} DEFAULT')
+            cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(old_table)}')
+            cursor.execute(
+                f"SELECT setval('{sequence}', COALESCE(max({quote(pk_column)}), 0) + 1, false) FROM {quote(table)}"
+            )
+
+            # CASCADE drops foreign keys pointing at the old table (order items and payments)
+            cursor.execute(f'DROP TABLE {quote(old_table)} CASCADE')
+
+            # Unique keys on a partitioned table must include the partition key; for orders
+            # the key table keeps ids and order numbers unique across partitions as well
+            if model is Order:
+                for sql in ORDER_KEY_SQL:
+                    cursor.execute(sql)
+            cursor.execute(
+                f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + "_pkey")} '
+                f'PRIMARY KEY ({quote(pk_column)}, {quote(PARTITION_KEY)})'
+            )
+            for name, definition in indexes:
+                if name == f'{table}_pkey':
+                    continue
+                if definition.startswith('CREATE UNIQUE') and PARTITION_KEY not in definition:
+                    definition = re.sub(r'\)( WHERE .*)?$', rf', {PARTITION_KEY})\1', definition, count=1)
+                cursor.execute(definition)
+            for name, definition in foreign_keys:
+                cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+
+        self.stdout.write(f'{connection.alias}.{table}: converted to monthly partitions')
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from dokans.models import Store
+from main.sharding import shard_aliases
+from main.utils.order_archive import archived_customer_stats, archived_store_ids
+from orders.models import Customer
+
+
+class Command(BaseCommand):
+    help = "Rebuild customers' order_count, lifetime_value and first/last order dates from their orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', help='Only recompute customers of the store with this subdomain')
+
+    def handle(self, *args, **options):
+        if options['store']:
+            try:
+                store = Store.objects.get(subdomain=options['store'])
+            except Store.DoesNotExist:
+                raise CommandError(f"Store '{options['store']}' does not exist")
+            updated = Customer.objects.using(store.db_shard).filter(store=store).recompute_stats()
+            stores = [store]
+        else:
+            updated = sum(Customer.objects.using(alias).recompute_stats() for alias in shard_aliases())
+            stores = Store.objects.filter(pk__in=archived_store_ids())
+
+        for store in stores:
+            self.add_archived_stats(store)
+        self.stdout.write(self.style.SUCCESS(f'Recomputed stats for {updated} customer(s)'))
+
+    def add_archived_stats(self, store):
+        """Count archived orders too; they are no longer in the order table"""
+        stats = archived_customer_stats(store)
+        if not stats:
+            return
+
+        customers = list(Customer.objects.using(store.db_shard).filter(store=store, pk__in=stats))
+        for customer in customers:
+            count, paid, first, last = stats[customer.pk]
+            customer.order_count += count
+            customer.lifetime_value += paid
+            customer.first_order_at = min(filter(None, [customer.first_order_at, first]))
+            customer.last_order_at = max(filter(None, [customer.last_order_at, last]))
+        Customer.objects.using(store.db_shard).bulk_update(
+            customers, ['order_count', 'lifetime_value', 'first_order_at', 'last_order_at'], batch_size=500
+        )
@@ -1,24 +1,82 @@
 from django.db import models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from dokans.models import Store
 from products.models import Product
+import copy
+import re
 import uuid
 
 
+def normalize_phone(phone):
+    """Reduce a Bangladeshi phone number to its 10 digit form (1XXXXXXXXX)"""
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('880'):
+        digits = digits[3:]
+    return digits.lstrip('0')
+
+
+class NullsLastIndex(models.Index):
+    """
+    An index whose descending fields sort NULLS LAST on PostgreSQL, to serve
+    ORDER BY ... DESC NULLS LAST. SQLite cannot index the modifier, but it
+    sorts NULLs first, so its plain DESC index already orders them last.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor == 'postgresql':
+            self = copy.copy(self)
+            self.fields_orders = [
+                (field, 'DESC NULLS LAST' if order == 'DESC' else order) for field, order in self.fields_orders
+            ]
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+class CustomerQuerySet(models.QuerySet):
+    def recompute_stats(self):
+        """Rebuild the denormalized order stats from the order table in one UPDATE"""
+        orders = Order.objects.filter(customer=OuterRef('pk')).order_by().values('customer')
+        paid_orders = orders.filter(payment_status='paid')
+        return self.update(
+            order_count=Coalesce(Subquery(orders.annotate(n=Count('id')).values('n')), 0),
+            lifetime_value=Coalesce(
+                Subquery(paid_orders.annotate(s=Sum('total')).values('s')),
+                Value(0), output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            first_order_at=Subquery(orders.order_by('created_at').values('created_at')[:1]),
+            last_order_at=Subquery(orders.order_by('-created_at').values('created_at')[:1]),
+        )
+
+
 class Customer(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='customers')
     name = models.CharField(max_length=200)
     email = models.EmailField()
     phone = models.CharField(max_length=20)
+
+    # Denormalized lifetime stats, kept current by record_order/record_payment
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    first_order_at = models.DateTimeField(null=True, blank=True)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CustomerQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         unique_together = ['store', 'email']
+        # The sort indexes end in -id to match customer_list's tie-breaker
         indexes = [
             models.Index(fields=['store', 'email']),
             models.Index(fields=['store', 'phone']),
+            models.Index(fields=['store', '-created_at', '-id']),
+            models.Index(fields=['store', '-order_count', '-id']),
+            models.Index(fields=['store', '-lifetime_value', '-id']),
+            NullsLastIndex(fields=['store', '-last_order_at', '-id'], name='customer_last_order_idx'),
         ]
 
     def __str__(self):
@@ -30,10 +88,37 @@ class Customer(models.Model):
 
     @property
     def total_spent(self):
-        from django.db.models import Sum
         total = self.orders.filter(payment_status='paid').aggregate(Sum('total'))['total__sum']
         return total or 0
 
+    def record_order(self, order):
+        """Count a newly placed order towards the customer's stats"""
+        Customer.objects.filter(pk=self.pk).update(
+            order_count=F('order_count') + 1,
+            first_order_at=Coalesce(F('first_order_at'), Value(order.created_at)),
+            last_order_at=order.created_at,
+            updated_at=timezone.now(),
+        )
+
+    def record_payment(self, amount):
+        """Add (or, with a negative amount, remove) a paid order total"""
+        Customer.objects.filter(pk=self.pk).update(
+            lifetime_value=F('lifetime_value') + amount, updated_at=timezone.now()
+        )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate item_quantity and item_subtotal with one correlated subquery each"""
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        return self.annotate(
+            item_quantity=Coalesce(Subquery(items.annotate(n=Sum('quantity')).values('n')), 0),
+            item_subtotal=Coalesce(
+                Subquery(items.annotate(s=Sum(F('quantity') * F('price'))).values('s')),
+                Value(0), output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
 
 class Cart(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='carts')
@@ -42,6 +127,8 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     class Meta:
         ordering = ['-updated_at']
         indexes = [
@@ -85,7 +172,7 @@ class Cart(models.Model):
         if quantity <= 0:
             self.remove_item(product)
         else:
-            CartItem.objects.filter(cart=self, product=product).update(quantity=quantity)
+            CartItem.objects.filter(cart=self, product=product).update(quantity=quantity, updated_at=timezone.now())
 
     def clear(self):
         """Clear all items from cart"""
@@ -134,6 +221,7 @@ class Order(models.Model):
 
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='orders')
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, related_name='orders')
+    # Partitioned tables keep this unique through orders_order_key (see partition_order_tables)
     order_number = models.CharField(max_length=20, unique=True, editable=False)
 
     # Order status
@@ -152,6 +240,7 @@ class Order(models.Model):
     shipping_name = models.CharField(max_length=200)
     shipping_email = models.EmailField()
     shipping_phone = models.CharField(max_length=20)
+    shipping_phone_normalized = models.CharField(max_length=20, blank=True, editable=False)
     shipping_address = models.TextField()
     shipping_division = models.CharField(max_length=100)
     shipping_district = models.CharField(max_length=100)
@@ -160,6 +249,9 @@ class Order(models.Model):
     # Additional info
     notes = models.TextField(blank=True)
 
+    # Denormalized number of line items, set at checkout
+    item_count = models.PositiveIntegerField(default=0)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -167,15 +259,23 @@ class Order(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['store', 'status']),
+            models.Index(fields=['store', '-created_at']),
+            models.Index(fields=['store', 'status', '-created_at']),
+            models.Index(fields=['store', 'payment_method', '-created_at']),
             models.Index(fields=['store', 'payment_status']),
-            models.Index(fields=['order_number']),
+            models.Index(fields=['customer', '-created_at']),
+            # Pattern opclasses let Postgres serve prefix (LIKE 'abc%') searches from the index
+            models.Index(fields=['store', 'order_number'], name='order_number_prefix_idx',
+                         opclasses=['int8_ops', 'varchar_pattern_ops']),
+            models.Index(fields=['store', 'shipping_phone_normalized'], name='order_phone_prefix_idx',
+                         opclasses=['int8_ops', 'varchar_pattern_ops']),
         ]
 
     def save(self, *args, **kwargs):
         if not self.order_number:
             # Generate unique order number
             self.order_number = self.generate_order_number()
+        self.shipping_phone_normalized = normalize_phone(self.shipping_phone)
         super().save(*args, **kwargs)
 
     def generate_order_number(self):
@@ -193,7 +293,8 @@ class Order(models.Model):
 
 
 class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    # No database constraint: a partitioned order table has no unique key on id alone
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_constraint=False)
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     product_name = models.CharField(max_length=300)  # Store name in case product is deleted
     product_sku = models.CharField(max_length=100, blank=True)
@@ -201,6 +302,9 @@ class OrderItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Price at time of purchase
     total = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # Partition key on PostgreSQL (see partition_order_tables)
+    created_at = models.DateTimeField(auto_now_add=True)
+
     def save(self, *args, **kwargs):
         # Calculate total
         self.total = self.quantity * self.price
@@ -228,7 +332,7 @@ class Payment(models.Model):
         ('failed', 'Failed'),
     ]
 
-    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='payment')
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='payment', db_constraint=False)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -261,14 +365,22 @@ class Payment(models.Model):
         self.save()
 
         # Update order payment status
+        was_paid = self.order.payment_status == 'paid'
         self.order.payment_status = 'paid'
         self.order.save()
 
+        if not was_paid and self.order.customer:
+            self.order.customer.record_payment(self.order.total)
+
     def mark_as_failed(self):
         """Mark payment as failed"""
         self.status = 'failed'
         self.save()
 
         # Update order payment status
+        was_paid = self.order.payment_status == 'paid'
         self.order.payment_status = 'failed'
         self.order.save()
+
+        if was_paid and self.order.customer:
+            self.order.customer.record_payment(-self.order.total)
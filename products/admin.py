@@ -1,4 +1,5 @@
 from django.contrib import admin
+from main.utils.admin_tools import LargeTableAdminMixin, StoreAutocompleteFilter
 from .models import Category, Product, ProductImage
 
 
@@ -9,9 +10,11 @@ class ProductImageInline(admin.TabularInline):
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'store', 'parent', 'is_active', 'order', 'created_at')
-    list_filter = ('is_active', 'store', 'created_at')
+    list_filter = ('is_active', StoreAutocompleteFilter, 'created_at')
+    list_select_related = ('store', 'parent__store')
+    autocomplete_fields = ('store', 'parent')
     search_fields = ('name', 'description', 'store__store_name')
     prepopulated_fields = {'slug': ('name',)}
     ordering = ('store', 'order', 'name')
@@ -30,9 +33,12 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'store', 'category', 'price', 'sale_price', 'stock_quantity', 'is_active', 'is_featured', 'created_at')
-    list_filter = ('is_active', 'is_featured', 'store', 'category', 'created_at')
+    # The category dropdown would list every store's categories, so filter by store instead
+    list_filter = ('is_active', 'is_featured', StoreAutocompleteFilter, 'created_at')
+    list_select_related = ('store', 'category__store')
+    autocomplete_fields = ('store', 'category')
     search_fields = ('name', 'description', 'sku', 'store__store_name')
     prepopulated_fields = {'slug': ('name',)}
     ordering = ('-created_at',)
@@ -61,15 +67,13 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related('store', 'category')
-
 
 @admin.register(ProductImage)
-class ProductImageAdmin(admin.ModelAdmin):
+class ProductImageAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('product', 'is_primary', 'order', 'created_at')
     list_filter = ('is_primary', 'created_at')
+    list_select_related = ('product__store',)
+    autocomplete_fields = ('product',)
     search_fields = ('product__name', 'alt_text')
     ordering = ('product', 'order', '-is_primary')
 
@@ -0,0 +1,86 @@
+"""
+Bulk price/stock editing.
+
+All affected products are loaded in one query, changes are validated in
+memory (including sale_price < price against the merged values) and the
+valid rows are written with bulk_update, touching only the edited columns.
+"""
+from django.db import transaction
+from django.utils import timezone
+from .importer import parse_decimal, parse_int
+from .models import Product
+
+BULK_UPDATE_BATCH_SIZE = 500
+EDITABLE_FIELDS = ('price', 'sale_price', 'stock_quantity', 'is_active')
+
+
+def parse_change(field, value):
+    if field == 'price':
+        return parse_decimal(str(value).strip(), 'Price')
+    if field == 'sale_price':
+        if value is None or str(value).strip() == '':
+            return None
+        return parse_decimal(str(value).strip(), 'Sale price')
+    if field == 'stock_quantity':
+        return parse_int(str(value).strip(), 'Stock')
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'on', 'yes')
+
+
+def apply_bulk_changes(store, changes):
+    """
+    Apply {product_id: {field: value}} to the store's products.
+
+    Returns (updated_count, errors) where errors maps product id to a message.
+    Products with an error are left untouched; the rest are saved.
+    """
+    errors = {}
+    products = Product.objects.filter(store=store, id__in=changes.keys()).only(
+        'id', 'store_id', 'name', *EDITABLE_FIELDS
+    )
+    found = {product.id: product for product in products}
+
+    now = timezone.now()
+    changed = []
+    changed_fields = set()
+
+    for product_id, fields in changes.items():
+        product = found.get(product_id)
+        if product is None:
+            errors[product_id] = 'Product not found'
+            continue
+
+        try:
+            updates = {
+                field: parse_change(field, value)
+                for field, value in fields.items()
+                if field in EDITABLE_FIELDS
+            }
+        except ValueError as e:
+            errors[product_id] = f'{product.name}: {e}'
+            continue
+
+        updates = {field: value for field, value in updates.items() if getattr(product, field) != value}
+        if not updates:
+            continue
+
+        price = updates.get('price', product.price)
+        sale_price = updates.get('sale_price', product.sale_price)
+        if sale_price is not None and sale_price >= price:
+            errors[product_id] = f'{product.name}: Sale price must be less than regular price'
+            continue
+
+        for field, value in updates.items():
+            setattr(product, field, value)
+        product.updated_at = now
+        changed.append(product)
+        changed_fields.update(updates)
+
+    if changed:
+        with transaction.atomic(using=store.db_shard):
+            Product.objects.bulk_update(
+                changed, [*sorted(changed_fields), 'updated_at'], batch_size=BULK_UPDATE_BATCH_SIZE
+            )
+
+    return len(changed), errors
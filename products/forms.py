@@ -20,7 +20,7 @@ class CategoryForm(forms.ModelForm):
 
         if store:
             # Filter parent categories to only show categories from same store
-            self.fields['parent'].queryset = Category.objects.filter(store=store)
+            self.fields['parent'].queryset = Category.objects.filter(store=store).select_related('store')
 
         # Make parent optional
         self.fields['parent'].required = False
@@ -61,7 +61,7 @@ class ProductForm(forms.ModelForm):
 
         if store:
             # Filter categories to only show categories from same store
-            self.fields['category'].queryset = Category.objects.filter(store=store, is_active=True)
+            self.fields['category'].queryset = Category.objects.filter(store=store, is_active=True).select_related('store')
 
         # Make some fields optional
         self.fields['sale_price'].required = False
@@ -96,3 +96,15 @@ class ProductImageForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['alt_text'].required = False
+
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+        help_text='CSV with a header row. Required columns: name, price',
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label='Only validate (do not create products)',
+    )
@@ -0,0 +1,234 @@
+"""
+CSV product import.
+
+The file is read row by row and validated against keys preloaded once per
+import (existing slugs and SKUs of the store, categories by name), so each
+row costs a few set/dict lookups instead of database queries. Valid rows are
+inserted with bulk_create in batches; invalid rows are collected into a
+per-row error report.
+
+bulk_create skips Product.save(), so the slug and SKU defaults it derives are
+applied here instead.
+"""
+import csv
+import io
+import uuid
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils.text import slugify
+from .models import Product, Category
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+
+# Accepted header spellings, including the columns of the product CSV export
+COLUMN_ALIASES = {
+    'stock': 'stock_quantity',
+    'quantity': 'stock_quantity',
+    'active': 'is_active',
+    'featured': 'is_featured',
+    'product_name': 'name',
+    'regular_price': 'price',
+}
+
+# Largest value the integer columns (stock, low stock threshold) hold on every database
+MAX_INTEGER = 2147483647
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n'}
+
+
+def normalize_header(name):
+    key = (name or '').strip().lower().replace(' ', '_').replace('-', '_')
+    return COLUMN_ALIASES.get(key, key)
+
+
+def parse_decimal(value, field):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{field} must be a number')
+    if not number.is_finite():
+        raise ValueError(f'{field} must be a number')
+    if number < 0:
+        raise ValueError(f'{field} must be zero or more')
+    if number >= Decimal('100000000'):
+        raise ValueError(f'{field} is too large')
+    return number.quantize(Decimal('0.01'))
+
+
+def parse_int(value, field):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{field} must be a whole number')
+    if number < 0:
+        raise ValueError(f'{field} must be zero or more')
+    if number > MAX_INTEGER:
+        raise ValueError(f'{field} is too large')
+    return number
+
+
+def parse_bool(value, field):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'{field} must be yes or no')
+
+
+class ProductImporter:
+    """Validates and inserts product rows for one store"""
+
+    def __init__(self, store, dry_run=False):
+        self.store = store
+        self.dry_run = dry_run
+
+        # Preload everything row validation needs: three queries per import
+        existing = Product.objects.filter(store=store).values_list('slug', 'sku')
+        self.slugs = set()
+        self.skus = set()
+        for slug, sku in existing:
+            self.slugs.add(slug)
+            if sku:
+                self.skus.add(sku)
+        self.categories = {
+            name.strip().lower(): pk
+            for pk, name in Category.objects.filter(store=store).values_list('id', 'name')
+        }
+
+        self.total_rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.pending = []
+
+    def build_product(self, row):
+        """Turn one CSV row into an unsaved Product, or raise ValueError"""
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise ValueError('Name is required')
+        if len(name) > 300:
+            raise ValueError('Name is longer than 300 characters')
+
+        price_value = (row.get('price') or '').strip()
+        if not price_value:
+            raise ValueError('Price is required')
+        price = parse_decimal(price_value, 'Price')
+
+        sale_price = None
+        if (row.get('sale_price') or '').strip():
+            sale_price = parse_decimal(row['sale_price'].strip(), 'Sale price')
+            if sale_price >= price:
+                raise ValueError('Sale price must be less than regular price')
+
+        sku = (row.get('sku') or '').strip()
+
+        # Names written only in Bangla slugify to nothing, so fall back to the SKU or a random key
+        slug = slugify((row.get('slug') or '').strip() or name)[:300]
+        if not slug:
+            slug = slugify(sku)[:300] or f'product-{uuid.uuid4().hex[:8]}'
+        if slug in self.slugs:
+            raise ValueError(f'A product with slug "{slug}" already exists')
+
+        if sku:
+            if len(sku) > 100:
+                raise ValueError('SKU is longer than 100 characters')
+            if sku in self.skus:
+                raise ValueError(f'SKU "{sku}" is already used')
+        else:
+            # Names sharing their first 20 slug characters would share the SKU, so number the repeats
+            base = sku = f"SKU-{self.store.id}-{slug[:20]}"
+            suffix = 2
+            while sku in self.skus:
+                sku = f"{base}-{suffix}"
+                suffix += 1
+
+        category_id = None
+        category_name = (row.get('category') or '').strip()
+        if category_name:
+            category_id = self.categories.get(category_name.lower())
+            if category_id is None:
+                raise ValueError(f'Unknown category "{category_name}"')
+
+        short_description = (row.get('short_description') or '').strip()
+        if len(short_description) > 500:
+            raise ValueError('Short description is longer than 500 characters')
+
+        product = Product(
+            store=self.store,
+            category_id=category_id,
+            name=name,
+            slug=slug,
+            sku=sku,
+            description=(row.get('description') or '').strip(),
+            short_description=short_description,
+            price=price,
+            sale_price=sale_price,
+        )
+
+        for field, parser, label in (
+            ('stock_quantity', parse_int, 'Stock'),
+            ('low_stock_threshold', parse_int, 'Low stock threshold'),
+            ('track_inventory', parse_bool, 'Track inventory'),
+            ('is_active', parse_bool, 'Active'),
+            ('is_featured', parse_bool, 'Featured'),
+        ):
+            value = (row.get(field) or '').strip()
+            if value:
+                setattr(product, field, parser(value, label))
+
+        # Reserve the keys so later rows in the same file are checked against them too
+        self.slugs.add(slug)
+        self.skus.add(sku)
+        return product
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def flush(self):
+        if self.pending and not self.dry_run:
+            Product.objects.bulk_create(self.pending, batch_size=IMPORT_BATCH_SIZE)
+        self.created += len(self.pending)
+        self.pending = []
+
+    def run(self, fileobj):
+        """Import an uploaded CSV file; returns self for the report"""
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+
+        try:
+            header = [normalize_header(column) for column in next(reader)]
+        except StopIteration:
+            self.add_error(1, 'The file is empty')
+            return self
+        except UnicodeDecodeError:
+            self.add_error(1, 'The file must be UTF-8 encoded CSV')
+            return self
+
+        missing = {'name', 'price'} - set(header)
+        if missing:
+            self.add_error(1, f"Missing required column(s): {', '.join(sorted(missing))}")
+            return self
+
+        with transaction.atomic(using=self.store.db_shard):
+            try:
+                for values in reader:
+                    if not any(value.strip() for value in values):
+                        continue
+                    self.total_rows += 1
+                    try:
+                        self.pending.append(self.build_product(dict(zip(header, values))))
+                    except ValueError as e:
+                        self.add_error(reader.line_num, str(e))
+
+                    if len(self.pending) >= IMPORT_BATCH_SIZE:
+                        self.flush()
+            except (UnicodeDecodeError, csv.Error) as e:
+                self.add_error(reader.line_num, f'Could not read the file: {e}')
+            self.flush()
+
+        return self
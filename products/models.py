@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 from django.utils.text import slugify
 from dokans.models import Store
 
@@ -18,6 +19,9 @@ class Category(models.Model):
         verbose_name_plural = 'Categories'
         ordering = ['order', 'name']
         unique_together = ['store', 'slug']
+        indexes = [
+            models.Index(fields=['store', 'order', 'name']),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -28,6 +32,16 @@ class Category(models.Model):
         return f"{self.name} ({self.store.store_name})"
 
 
+# Mirrors Product.is_low_stock so the check can run inside the database
+LOW_STOCK_Q = Q(track_inventory=True, stock_quantity__gt=0, stock_quantity__lte=F('low_stock_threshold'))
+
+
+class ProductQuerySet(models.QuerySet):
+    def low_stock(self):
+        """Products whose stock is at or below their low stock threshold"""
+        return self.filter(LOW_STOCK_Q)
+
+
 class Product(models.Model):
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='products')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
@@ -62,20 +76,32 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         unique_together = ['store', 'slug']
         indexes = [
-            models.Index(fields=['store', 'is_active']),
-            models.Index(fields=['store', 'category']),
+            # Listings filter and sort the same way: newest first
+            models.Index(fields=['store', '-created_at']),
+            models.Index(fields=['store', 'is_active', '-created_at']),
+            models.Index(fields=['category', '-created_at']),
+            models.Index(fields=['store', '-created_at'], condition=Q(is_active=True, is_featured=True),
+                         name='product_featured_idx'),
+            # Partial index: only low stock rows are indexed, so it stays small
+            models.Index(fields=['store', 'stock_quantity'], condition=LOW_STOCK_Q, name='product_low_stock_idx'),
         ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
         if not self.sku:
-            # Auto-generate SKU
-            self.sku = f"SKU-{self.store.id}-{slugify(self.name)[:20]}"
+            # Auto-generate SKU, numbered when another product of the store already has it
+            base = self.sku = f"SKU-{self.store.id}-{slugify(self.name)[:20]}"
+            suffix = 2
+            while Product.objects.filter(store=self.store, sku=self.sku).exclude(pk=self.pk).exists():
+                self.sku = f"{base}-{suffix}"
+                suffix += 1
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -111,6 +137,10 @@ class Product(models.Model):
 
     def get_primary_image(self):
         """Get the primary product image"""
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            # Listings prefetch images; pick from those instead of querying per product
+            images = self.images.all()
+            return next((image for image in images if image.is_primary), images[0] if images else None)
         primary = self.images.filter(is_primary=True).first()
         if primary:
             return primary
@@ -127,6 +157,9 @@ class ProductImage(models.Model):
 
     class Meta:
         ordering = ['order', '-is_primary', '-created_at']
+        indexes = [
+            models.Index(fields=['product', 'order', '-is_primary', '-created_at']),
+        ]
 
     def save(self, *args, **kwargs):
         # If this is set as primary, unset other primary images
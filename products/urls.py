@@ -5,6 +5,9 @@ urlpatterns = [
     # Product URLs
     path('', views.product_list, name='product_list'),
     path('add/', views.product_add, name='product_add'),
+    path('import/', views.product_import, name='product_import'),
+    path('bulk-edit/', views.product_bulk_edit, name='product_bulk_edit'),
+    path('api/bulk-update/', views.product_bulk_update_api, name='product_bulk_update_api'),
     path('<int:product_id>/edit/', views.product_edit, name='product_edit'),
     path('<int:product_id>/delete/', views.product_delete, name='product_delete'),
     path('<int:product_id>/upload-image/', views.product_image_upload, name='product_image_upload'),
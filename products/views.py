@@ -1,10 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
 from dokans.models import Store
 from .models import Product, Category, ProductImage
-from .forms import ProductForm, CategoryForm, ProductImageForm
+from .forms import ProductForm, CategoryForm, ProductImageForm, ProductImportForm
+from .importer import ProductImporter
+from .bulk_edit import apply_bulk_changes, EDITABLE_FIELDS
+import json
+
+PRODUCTS_PER_PAGE = 50
 
 
 @login_required
@@ -21,7 +30,7 @@ def product_list(request):
     status = request.GET.get('status', '')
 
     # Base queryset
-    products = Product.objects.filter(store=store).select_related('category')
+    products = Product.objects.filter(store=store).select_related('category').prefetch_related('images')
 
     # Apply filters
     if search:
@@ -41,7 +50,10 @@ def product_list(request):
     elif status == 'featured':
         products = products.filter(is_featured=True)
     elif status == 'low_stock':
-        products = [p for p in products if p.is_low_stock]
+        products = products.low_stock().order_by('stock_quantity')
+
+    paginator = Paginator(products, PRODUCTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
 
     # Get categories for filter
     categories = Category.objects.filter(store=store, is_active=True)
@@ -49,11 +61,13 @@ def product_list(request):
     # Statistics
     total_products = Product.objects.filter(store=store).count()
     active_products = Product.objects.filter(store=store, is_active=True).count()
-    low_stock_count = len([p for p in Product.objects.filter(store=store, track_inventory=True) if p.is_low_stock])
+    low_stock_count = Product.objects.filter(store=store).low_stock().count()
 
     context = {
         'store': store,
-        'products': products,
+        'products': page_obj,
+        'page_obj': page_obj,
+        'bulk_edit': request.GET.get('edit') == '1',
         'categories': categories,
         'search': search,
         'selected_category': category_id,
@@ -65,6 +79,67 @@ def product_list(request):
     return render(request, 'dashboard/products/list.html', context)
 
 
+@login_required
+@require_POST
+def product_bulk_edit(request):
+    """Save the spreadsheet-style edit form from product_list"""
+    store = request.user.store
+    changes = {}
+
+    for product_id in request.POST.getlist('product_ids'):
+        if not product_id.isdigit():
+            continue
+        fields = {
+            field: request.POST.get(f'{field}_{product_id}', '')
+            for field in ('price', 'sale_price', 'stock_quantity')
+        }
+        # Unchecked checkboxes are not submitted at all
+        fields['is_active'] = f'is_active_{product_id}' in request.POST
+        changes[int(product_id)] = fields
+
+    updated, errors = apply_bulk_changes(store, changes)
+
+    if updated:
+        messages.success(request, f'{updated} product(s) updated successfully!')
+    for error in errors.values():
+        messages.error(request, error)
+    if not updated and not errors:
+        messages.info(request, 'No changes to save.')
+
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = 'product_list'
+    return redirect(next_url)
+
+
+@login_required
+@require_POST
+def product_bulk_update_api(request):
+    """
+    JSON bulk update.
+
+    Body: {"products": [{"id": 1, "price": "120.00", "stock_quantity": 4}, ...]}
+    """
+    store = request.user.store
+
+    try:
+        data = json.loads(request.body)
+        changes = {
+            int(item['id']): {field: item[field] for field in EDITABLE_FIELDS if field in item}
+            for item in data.get('products', [])
+        }
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({'success': False, 'message': 'Invalid request body'}, status=400)
+
+    updated, errors = apply_bulk_changes(store, changes)
+
+    return JsonResponse({
+        'success': not errors,
+        'updated': updated,
+        'errors': {str(product_id): message for product_id, message in errors.items()},
+    })
+
+
 @login_required
 def product_add(request):
     store = request.user.store
@@ -90,6 +165,33 @@ def product_add(request):
     return render(request, 'dashboard/products/form.html', context)
 
 
+@login_required
+def product_import(request):
+    store = request.user.store
+    report = None
+
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+
+        if form.is_valid():
+            dry_run = form.cleaned_data['dry_run']
+            report = ProductImporter(store, dry_run=dry_run).run(form.cleaned_data['file'])
+
+            if report.created and not dry_run:
+                messages.success(request, f'{report.created} product(s) imported successfully!')
+            elif report.created:
+                messages.info(request, f'{report.created} row(s) are valid and ready to import.')
+    else:
+        form = ProductImportForm()
+
+    context = {
+        'store': store,
+        'form': form,
+        'report': report,
+    }
+    return render(request, 'dashboard/products/import.html', context)
+
+
 @login_required
 def product_edit(request, product_id):
     store = request.user.store
@@ -171,7 +273,7 @@ def product_image_delete(request, image_id):
 @login_required
 def category_list(request):
     store = request.user.store
-    categories = Category.objects.filter(store=store).select_related('parent')
+    categories = Category.objects.filter(store=store).select_related('parent').annotate(product_count=Count('products'))
 
     context = {
         'store': store,